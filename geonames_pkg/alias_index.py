@@ -0,0 +1,221 @@
+# файл с классом индекса альтернативных имен городов
+# базовые импорты
+import threading
+from bisect import bisect_left
+import numpy as np
+import pandas as pd
+
+# импорты для транслитерации
+from transliterate import translit
+
+# импорт нормализации названий
+from cache import normalize_name
+# импорт ключа сортировки городов одного названия
+from vector_index import sort_key
+
+# символ, который больше любого символа юникода, для поиска верхней границы префикса
+MAX_CHAR = "\U0010ffff"
+
+
+class AliasIndex:
+    """
+    Класс AliasIndex - предварительно построенный индекс альтернативных имен городов.
+    Используется методом advanced_spell_checker класса FindCity вместо
+    построения словаря и транслитерации альтернативных имен на каждый запрос.
+    """
+
+    def __init__(self, dataset=None):
+        """
+        Инициализация объекта класса AliasIndex.
+        Индекс строится один раз из датасета с городами:
+         - словарь точных совпадений: альтернативное имя -> множество имен городов,
+         - отсортированные массивы альтернативных имен и их транслитов для поиска
+           по префиксу методом bisect.
+
+         Параметры:
+              dataset (pd.DataFrame): датасет с полями name и alternatenames,
+                                      по умолчанию равно None.
+        """
+        # словарь, где ключ это значение из поля name, а значение это строка альтернативных имен,
+        # формируется так же, как и раньше в advanced_spell_checker, чтобы набор кандидатов не изменился
+        cities_dict = (
+            dataset.groupby("name")["alternatenames"]
+            .apply(lambda x: ",".join(map(str, x)))
+            .to_dict()
+        )
+        # список имен городов, в индексах хранятся позиции в этом списке
+        self.names = list(cities_dict.keys())
+        # словарь точных совпадений альтернативного имени
+        self.exact = {}
+        # пары (альтернативное имя, позиция имени города) и (транслит, позиция имени города)
+        aliases = []
+        aliases_t = []
+        # кэш транслитераций, т.к. одни и те же альтернативные имена встречаются у многих городов
+        translit_cache = {}
+        for pos, value in enumerate(cities_dict.values()):
+            for item in set(value.lower().split(", ")):
+                self.exact.setdefault(item, set()).add(pos)
+                item_t = translit_cache.get(item)
+                if item_t is None:
+                    item_t = translit(item, "ru", reversed=True)
+                    translit_cache[item] = item_t
+                aliases.append((item, pos))
+                aliases_t.append((item_t, pos))
+        # сортируем пары для поиска по префиксу
+        aliases.sort()
+        aliases_t.sort()
+        self.aliases = [item for item, _ in aliases]
+        self.alias_pos = [pos for _, pos in aliases]
+        self.aliases_t = [item for item, _ in aliases_t]
+        self.alias_t_pos = [pos for _, pos in aliases_t]
+
+    @staticmethod
+    def _prefix_positions(prefix, keys, positions):
+        """
+        Статический метод _prefix_positions класса AliasIndex.
+        Поиск позиций имен городов, у которых есть альтернативное имя, начинающееся с prefix.
+
+         Параметры:
+              prefix (str): искомый префикс,
+              keys (list): отсортированный список альтернативных имен,
+              positions (list): список позиций имен городов, соответствующих keys.
+         Возвращаемое значение:
+              (set): множество позиций имен городов.
+        """
+        lo = bisect_left(keys, prefix)
+        hi = bisect_left(keys, prefix + MAX_CHAR, lo)
+        return set(positions[lo:hi])
+
+    def candidates(self, city=None, city_t=None):
+        """
+        Метод candidates класса AliasIndex.
+        Поиск имен городов, у которых альтернативное имя совпадает с городом или его транслитом,
+        либо начинается с них.
+
+         Параметры:
+              city (str): название города для проверки, по умолчанию равно None,
+              city_t (str): транслитерация названия города, по умолчанию равно None.
+         Возвращаемое значение:
+              (list): список найденных имен городов без дублей.
+        """
+        # точное совпадение в исходном или транслитном значении
+        found = set(self.exact.get(city.lower(), ())) | set(self.exact.get(city_t.lower(), ()))
+        # альтернативное имя начинается с искомого слова в оригинале или транслите
+        found |= AliasIndex._prefix_positions(city, self.aliases, self.alias_pos)
+        found |= AliasIndex._prefix_positions(city_t, self.aliases_t, self.alias_t_pos)
+        return [self.names[pos] for pos in found]
+
+
+def exact_key(city=None):
+    """
+    Функция построения ключа точного совпадения: нормализация названия
+    и приведение к нижнему регистру без учета особенностей языка (casefold).
+    Параметр:
+            city (str): название города, по умолчанию равно None.
+    Возвращаемое значение:
+            (str): ключ для поиска в ExactIndex.
+    """
+    return normalize_name(city).casefold()
+
+
+class ExactIndex:
+    """
+    Класс ExactIndex - хэш-индекс точных совпадений названий городов.
+    Ключи - нормализованные значения полей name, asciiname и каждого элемента alternatenames,
+    значения - номера строк датасета. Позволяет вернуть результат для правильно
+    написанного названия без корректора опечаток и без создания вектора моделью.
+    """
+
+    def __init__(self, dataset=None, columns=("name", "asciiname", "alternatenames"), order_col="population",
+                 ascending=False):
+        """
+        Инициализация объекта класса ExactIndex.
+        Номера строк для всех ключей хранятся в одном массиве rows, словарь keys
+        хранит для ключа границы его отрезка в этом массиве.
+
+         Параметры:
+              dataset (pd.DataFrame): датасет с городами, по умолчанию равно None,
+              columns (tuple): поля с названиями, значения alternatenames разделены запятыми,
+                               по умолчанию равно ('name', 'asciiname', 'alternatenames'),
+              order_col (str): поле для упорядочивания строк одного ключа, если его нет в датасете,
+                               то строки идут в исходном порядке, по умолчанию равно 'population',
+              ascending (bool): флаг упорядочивания по возрастанию order_col, по умолчанию равно False.
+        """
+        positions = np.arange(len(dataset))
+        parts = []
+        for col in columns:
+            if col not in dataset.columns:
+                continue
+            values = pd.Series(dataset[col].to_numpy(dtype=object), index=positions).dropna().astype(str)
+            if col == "alternatenames":
+                values = values.str.split(",").explode()
+            parts.append(values)
+        aliases = pd.concat(parts) if parts else pd.Series([], dtype=object)
+        # нормализуем только уникальные значения, т.к. одни и те же имена встречаются у многих городов
+        codes, uniques = pd.factorize(aliases.to_numpy())
+        normalized = np.array([exact_key(value) for value in uniques], dtype=object)[codes]
+        # пустые после нормализации значения в индекс не попадают
+        filled = normalized != ""
+        codes, keys = pd.factorize(normalized[filled])
+        pairs = pd.DataFrame({"key": codes, "row": aliases.index.to_numpy(dtype=np.int64)[filled]})
+        pairs = pairs.drop_duplicates()
+        # внутри ключа строки упорядочены по order_col, затем по номеру строки
+        rows = pairs["row"].to_numpy()
+        if order_col in dataset.columns:
+            order = sort_key(dataset[order_col], ascending=ascending)[rows]
+        else:
+            order = np.zeros(len(rows))
+        pairs = pairs.iloc[np.lexsort((rows, order, pairs["key"].to_numpy()))]
+        self.rows = pairs["row"].to_numpy(dtype=np.int64)
+        bounds = np.searchsorted(pairs["key"].to_numpy(), np.arange(len(keys) + 1))
+        self.keys = {key: (int(bounds[code]), int(bounds[code + 1])) for code, key in enumerate(keys)}
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def lookup(self, city=None):
+        """
+        Метод lookup класса ExactIndex.
+        Поиск строк датасета, у которых название совпадает с city после нормализации.
+
+         Параметры:
+              city (str): название города, по умолчанию равно None.
+         Возвращаемое значение:
+              (np.ndarray): номера строк датасета или None, если совпадений нет.
+        """
+        bounds = self.keys.get(exact_key(city))
+        if bounds is None:
+            return None
+        return self.rows[bounds[0]:bounds[1]]
+
+    def record(self, hit=False):
+        """
+        Метод record класса ExactIndex.
+        Учет результата поиска запроса в индексе для статистики.
+
+         Параметры:
+              hit (bool): флаг найденного совпадения, по умолчанию равно False.
+        """
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def info(self):
+        """
+        Метод info класса ExactIndex.
+        Статистика индекса точных совпадений.
+
+         Возвращаемое значение:
+              (dict): словарь с количеством попаданий, промахов, долей попаданий
+                      (доля запросов без вызова модели) и количеством ключей.
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "keys": len(self.keys),
+            }
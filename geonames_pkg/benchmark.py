@@ -0,0 +1,753 @@
+# скрипт для замеров производительности методов поиска городов
+import os
+import time
+import tempfile
+import json
+import multiprocessing
+import subprocess
+import sys
+import numpy as np
+from config import CONN_STR_GEONAMES, QUERY, COUNTRIES_LST, POPULATION, MODEL_ID, DEVICE
+from database import DataFrameSQL
+from dataset import DatasetLoader
+from alias_index import AliasIndex
+from vector_index import NameGroups, make_index, normalize_rows
+from filters import RowFilter
+from spatial_index import SpatialIndex, to_xyz, chord_to_km
+from finder import FindCity
+from edit_distance import osa_distance, similarity, rapidfuzz_process
+from shared_store import publish_shared, attach_shared, unlink_shared
+from transliterate import translit
+from encoders import make_encoder
+from sqlalchemy import create_engine, text, ARRAY, REAL
+from sqlalchemy.pool import StaticPool
+from psycopg2.extensions import register_adapter
+from database import addapt_numpy_float32
+
+# названия городов для замеров: сокращения, опечатки, транслит и префиксы
+BENCH_CITIES = ["мск", "спб", "Моченгорск", "Ереван", "Almaty", "екб", "нск", "Kazan", "алма", "сочи"]
+
+
+def timeit(func, repeats=5):
+    """
+    Функция замера среднего времени выполнения функции.
+    Параметры:
+            func (callable): функция без аргументов для замера,
+            repeats (int): количество повторов, по умолчанию равно 5.
+    Возвращаемое значение:
+            (float): среднее время выполнения в миллисекундах.
+    """
+    start = time.perf_counter()
+    for _ in range(repeats):
+        func()
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+def legacy_alias_candidates(city=None, dataset=None):
+    """
+    Функция поиска кандидатов в альтернативных именах в том виде, в котором она
+    работала в advanced_spell_checker до появления AliasIndex.
+    Используется как эталон для сравнения результата и скорости.
+    Параметры:
+            city (str): название города для проверки, по умолчанию равно None,
+            dataset (pd.DataFrame): датасет с городами, по умолчанию равно None.
+    Возвращаемое значение:
+            (list): список найденных имен городов без дублей.
+    """
+    cities_dict = (
+        dataset.groupby("name")["alternatenames"]
+        .apply(lambda x: ",".join(map(str, x)))
+        .to_dict()
+    )
+    city_t = translit(city, "ru", reversed=True)
+    key_lst = []
+    for key, value in cities_dict.items():
+        if (city.lower() in value.lower().split(", ")) or (
+                city_t.lower() in value.lower().split(", ")
+        ):
+            key_lst.append(key)
+        else:
+            for item in value.lower().split(", "):
+                item_t = translit(item, "ru", reversed=True)
+                if item.startswith(city) or item_t.startswith(city_t):
+                    key_lst.append(key)
+    return list(set(key_lst))
+
+
+def bench_alias_index(dataset=None, cities=None, repeats=3):
+    """
+    Функция сравнения поиска кандидатов через AliasIndex с прежней реализацией.
+    Параметры:
+            dataset (pd.DataFrame): датасет с городами, по умолчанию равно None,
+            cities (list): список названий городов для замера, по умолчанию равно None,
+            repeats (int): количество повторов, по умолчанию равно 3.
+    """
+    cities = cities or BENCH_CITIES
+    start = time.perf_counter()
+    alias_index = AliasIndex(dataset=dataset)
+    build_ms = (time.perf_counter() - start) * 1000
+    print(f"Построение AliasIndex: {build_ms:.1f} мс")
+    for city in cities:
+        city_t = translit(city, "ru", reversed=True)
+        legacy = legacy_alias_candidates(city=city, dataset=dataset)
+        indexed = alias_index.candidates(city=city, city_t=city_t)
+        legacy_ms = timeit(lambda: legacy_alias_candidates(city=city, dataset=dataset), repeats)
+        indexed_ms = timeit(lambda: alias_index.candidates(city=city, city_t=city_t), repeats * 100)
+        print(
+            f"{city:>12}: прежний {legacy_ms:9.2f} мс, индекс {indexed_ms:7.4f} мс, "
+            f"кандидатов {len(indexed)}, совпадает: {set(legacy) == set(indexed)}"
+        )
+
+
+def make_queries(embeddings=None, n_queries=1000, noise=0.05, seed=12345):
+    """
+    Функция создания синтетических запросов: случайные векторы матрицы с гауссовым шумом.
+    Параметры:
+            embeddings (np.ndarray): нормализованная матрица векторов, по умолчанию равно None,
+            n_queries (int): количество запросов, по умолчанию равно 1000,
+            noise (float): стандартное отклонение шума, по умолчанию равно 0.05,
+            seed (int): зерно генератора случайных чисел, по умолчанию равно 12345.
+    Возвращаемое значение:
+            (np.ndarray): матрица нормализованных векторов запросов.
+    """
+    rng = np.random.default_rng(seed)
+    rows = np.asarray(embeddings[rng.choice(len(embeddings), size=n_queries)], dtype=np.float32)
+    return normalize_rows(rows + rng.normal(scale=noise, size=rows.shape).astype(np.float32))
+
+
+def bench_ann(embeddings=None, top_k=10, n_queries=1000, configs=None):
+    """
+    Функция сравнения приближенных индексов с точным поиском: полнота recall@k
+    относительно FlatIndex, время построения и время одного запроса.
+    Параметры:
+            embeddings (np.ndarray): нормализованная матрица векторов, по умолчанию равно None,
+            top_k (int): количество ближайших векторов, по умолчанию равно 10,
+            n_queries (int): количество запросов, по умолчанию равно 1000,
+            configs (list): список пар (тип индекса, параметры), по умолчанию IVF с разными n_probe.
+    """
+    configs = configs or [("ivf", {"n_probe": n_probe}) for n_probe in (1, 4, 8, 16, 32)]
+    queries = make_queries(embeddings=embeddings, n_queries=n_queries)
+    exact = make_index(kind="flat", embeddings=embeddings)
+    # время считается для одного запроса за вызов, как в get_city
+    exact_ms = timeit(lambda: [exact.search(vectors=q[None, :], top_k=top_k) for q in queries], 1) / n_queries
+    _, exact_idx = exact.search(vectors=queries, top_k=top_k)
+    print(f"flat: {exact_ms:.4f} мс/запрос, recall@{top_k} 1.0000")
+    for kind, params in configs:
+        start = time.perf_counter()
+        index = make_index(kind=kind, embeddings=embeddings, **params)
+        build_s = time.perf_counter() - start
+        search_ms = timeit(lambda: [index.search(vectors=q[None, :], top_k=top_k) for q in queries], 1) / n_queries
+        _, idx = index.search(vectors=queries, top_k=top_k)
+        recall = np.mean([len(set(a) & set(b)) / len(b) for a, b in zip(idx, exact_idx)])
+        print(f"{kind} {params}: построение {build_s:.2f} с, {search_ms:.4f} мс/запрос, recall@{top_k} {recall:.4f}")
+
+
+def bench_unique_names(dataset=None, embeddings=None, top_k=10, n_queries=300):
+    """
+    Функция сравнения поиска по матрице векторов всех строк датасета и по матрице
+    уникальных названий с раскрытием найденных названий в города: объем матрицы,
+    время одного запроса и количество различных названий в top_k.
+    Параметры:
+            dataset (pd.DataFrame): датасет с полями name и population, по умолчанию равно None,
+            embeddings (np.ndarray): нормализованная матрица векторов по строкам датасета,
+                                     по умолчанию равно None,
+            top_k (int): количество ближайших городов, по умолчанию равно 10,
+            n_queries (int): количество запросов, по умолчанию равно 300.
+    """
+    groups = NameGroups(names=dataset["name"], order=dataset["population"])
+    unique = groups.collapse(embeddings)
+    queries = make_queries(embeddings=unique, n_queries=n_queries)
+    full_index = make_index(kind="flat", embeddings=embeddings)
+    unique_index = make_index(kind="flat", embeddings=unique)
+
+    def unique_search(vectors):
+        scores, names = unique_index.search(vectors=vectors, top_k=top_k)
+        return groups.expand(scores=scores, indices=names, top_k=top_k)
+
+    for title, matrix, search in (
+            ("все строки", embeddings, lambda v: full_index.search(vectors=v, top_k=top_k)),
+            ("уникальные названия", unique, unique_search),
+    ):
+        search_ms = timeit(lambda: [search(q[None, :]) for q in queries], 1) / n_queries
+        _, idx = search(queries)
+        n_names = np.mean([len(set(groups.name_ids[row])) for row in idx])
+        print(f"{title}: матрица {matrix.shape[0]} x {matrix.shape[1]}, {matrix.nbytes / 1024 ** 2:.1f} MB, "
+              f"{search_ms:.4f} мс/запрос, различных названий в top-{top_k}: {n_names:.2f}")
+
+
+def bench_filters(dataset=None, embeddings=None, filters=None, top_k=10, n_queries=100):
+    """
+    Функция замера фильтров запроса: построение маски фильтрацией датафрейма и через
+    RowFilter (первый раз и из кэша), время поиска по точному индексу с маской и без нее.
+    Параметры:
+            dataset (pd.DataFrame): датасет с полями country, population, feature_code, latitude и longitude,
+                                    по умолчанию равно None,
+            embeddings (np.ndarray): нормализованная матрица векторов по строкам датасета, по умолчанию равно None,
+            filters (list): список словарей с фильтрами, по умолчанию одна страна, население и прямоугольник,
+            top_k (int): количество ближайших векторов, по умолчанию равно 10,
+            n_queries (int): количество запросов, по умолчанию равно 100.
+    """
+    country = dataset["country"].mode()[0]
+    filters = filters or [
+        {"countries": [country]},
+        {"min_population": 100000},
+        {"countries": [country], "feature_codes": ["PPLA", "PPLC"]},
+        {"bbox": (40.0, 20.0, 60.0, 60.0)},
+    ]
+    row_filter = RowFilter(dataset=dataset)
+    index = make_index(kind="flat", embeddings=embeddings)
+    queries = make_queries(embeddings=embeddings, n_queries=n_queries)
+    search_ms = timeit(lambda: [index.search(vectors=q[None, :], top_k=top_k) for q in queries], 1) / n_queries
+    print(f"без фильтра: {search_ms:.4f} мс/запрос")
+    for params in filters:
+        def dataframe_mask():
+            mask = np.ones(len(dataset), dtype=bool)
+            if "countries" in params:
+                mask &= dataset["country"].isin(params["countries"]).to_numpy()
+            if "min_population" in params:
+                mask &= (dataset["population"] >= params["min_population"]).to_numpy()
+            if "feature_codes" in params:
+                mask &= dataset["feature_code"].isin(params["feature_codes"]).to_numpy()
+            if "bbox" in params:
+                min_lat, min_lon, max_lat, max_lon = params["bbox"]
+                mask &= dataset["latitude"].between(min_lat, max_lat).to_numpy()
+                mask &= dataset["longitude"].between(min_lon, max_lon).to_numpy()
+            return mask
+
+        df_ms = timeit(dataframe_mask)
+        build_ms = timeit(lambda: row_filter._build(RowFilter.make_key(**params)))
+        mask = row_filter.mask(**params)
+        cached_ms = timeit(lambda: row_filter.mask(**params), 100)
+        search_ms = timeit(lambda: [index.search(vectors=q[None, :], top_k=top_k, mask=mask) for q in queries],
+                           1) / n_queries
+        print(f"{params}: строк {np.count_nonzero(mask)}, маска датафрейма {df_ms:.3f} мс, "
+              f"RowFilter {build_ms:.3f} мс, из кэша {cached_ms:.4f} мс, поиск {search_ms:.4f} мс/запрос")
+
+
+def make_clustered_points(n_points=100000, n_clusters=500, spread=1.0, seed=12345):
+    """
+    Функция создания синтетических координат городов: точки сгруппированы вокруг случайных
+    центров, как населенные пункты вокруг крупных городов.
+    Параметры:
+            n_points (int): количество точек, по умолчанию равно 100000,
+            n_clusters (int): количество центров, по умолчанию равно 500,
+            spread (float): стандартное отклонение точек от центра в градусах, по умолчанию равно 1.0,
+            seed (int): начальное значение генератора случайных чисел, по умолчанию равно 12345.
+    Возвращаемое значение:
+            latitude (np.ndarray): широты точек,
+            longitude (np.ndarray): долготы точек.
+    """
+    rng = np.random.default_rng(seed)
+    # центры равномерно по площади сферы между 60 градусами южной и 75 градусами северной широты
+    center_lat = np.degrees(np.arcsin(rng.uniform(np.sin(np.radians(-60)), np.sin(np.radians(75)), n_clusters)))
+    center_lon = rng.uniform(-180, 180, n_clusters)
+    clusters = rng.integers(0, n_clusters, n_points)
+    latitude = np.clip(center_lat[clusters] + rng.normal(0, spread, n_points), -90, 90)
+    longitude = (center_lon[clusters] + rng.normal(0, spread, n_points) + 180) % 360 - 180
+    return latitude, longitude
+
+
+def bench_reverse_geocode(latitude=None, longitude=None, n_queries=1000, top_k=10, radius_km=50, seed=12345):
+    """
+    Функция замера обратного геокодирования: построение SpatialIndex, время одного запроса
+    k ближайших и запроса по радиусу, пакетный запрос и полный перебор для сравнения.
+    Параметры:
+            latitude (np.ndarray): широты городов, по умолчанию равно None - 100000 синтетических
+                                   точек функции make_clustered_points,
+            longitude (np.ndarray): долготы городов, по умолчанию равно None,
+            n_queries (int): количество точек запросов, по умолчанию равно 1000,
+            top_k (int): количество ближайших городов, по умолчанию равно 10,
+            radius_km (float): радиус поиска в километрах, по умолчанию равно 50,
+            seed (int): начальное значение генератора случайных чисел, по умолчанию равно 12345.
+    """
+    if latitude is None:
+        latitude, longitude = make_clustered_points(seed=seed)
+    rng = np.random.default_rng(seed)
+    # точки запросов рядом со случайными городами
+    rows = rng.integers(0, len(latitude), n_queries)
+    lats = np.clip(np.asarray(latitude)[rows] + rng.normal(0, 0.2, n_queries), -90, 90)
+    lons = np.asarray(longitude)[rows] + rng.normal(0, 0.2, n_queries)
+    start = time.perf_counter()
+    index = SpatialIndex(latitude=latitude, longitude=longitude)
+    print(f"SpatialIndex: {len(index)} городов, построение {time.perf_counter() - start:.3f} с")
+    xyz = to_xyz(latitude, longitude)
+
+    def brute_force(lat, lon):
+        chords = np.linalg.norm(xyz - to_xyz(lat, lon), axis=1)
+        return chord_to_km(chords[np.argpartition(chords, top_k)[:top_k]])
+
+    for title, func in (
+            ("полный перебор, k=" + str(top_k), lambda lat, lon: brute_force(lat, lon)),
+            ("k=1", lambda lat, lon: index.nearest(lat, lon, k=1)),
+            (f"k={top_k}", lambda lat, lon: index.nearest(lat, lon, k=top_k)),
+            (f"радиус {radius_km} км", lambda lat, lon: index.within(lat, lon, radius_km=radius_km)),
+    ):
+        query_ms = timeit(lambda: [func(lat, lon) for lat, lon in zip(lats, lons)], 1) / n_queries
+        print(f"{title}: {query_ms:.4f} мс/запрос")
+    batch_ms = timeit(lambda: index.nearest(lats, lons, k=top_k), 3)
+    print(f"пакет {n_queries} точек, k={top_k}: {batch_ms:.2f} мс, {batch_ms / n_queries:.4f} мс/точку")
+
+
+def make_typos(names=None, n_queries=300, seed=12345):
+    """
+    Функция создания тестового набора названий с опечатками: в каждое название вносится
+    одна случайная правка - удаление, вставка, замена или перестановка соседних символов.
+    Параметры:
+            names (list): список названий городов, по умолчанию равно None,
+            n_queries (int): количество названий в наборе, по умолчанию равно 300,
+            seed (int): начальное значение генератора случайных чисел, по умолчанию равно 12345.
+    Возвращаемое значение:
+            typos (list): названия с опечатками,
+            targets (list): исходные названия.
+    """
+    rng = np.random.default_rng(seed)
+    names = [name for name in dict.fromkeys(names) if len(name) >= 4]
+    targets = [names[pos] for pos in rng.choice(len(names), size=min(n_queries, len(names)), replace=False)]
+    typos = []
+    for name in targets:
+        pos = int(rng.integers(1, len(name) - 1))
+        char = name[int(rng.integers(0, len(name)))]
+        edit = rng.integers(0, 4)
+        if edit == 0:
+            typo = name[:pos] + name[pos + 1:]
+        elif edit == 1:
+            typo = name[:pos] + char + name[pos:]
+        elif edit == 2:
+            typo = name[:pos] + char + name[pos + 1:]
+        else:
+            typo = name[:pos - 1] + name[pos] + name[pos - 1] + name[pos + 1:]
+        typos.append(typo)
+    return typos, targets
+
+
+def bench_hybrid(dataset=None, model_id=None, device="cpu", weights=None, top_k=10, n_queries=300):
+    """
+    Функция сравнения векторного и гибридного поиска (векторы + символьные 3-граммы) на наборе
+    названий с опечатками: доля запросов, для которых первый найденный город имеет исходное название
+    (accuracy@1), доля запросов с исходным названием среди top_k и время поиска без векторизации.
+    Параметры:
+            dataset (pd.DataFrame): датасет с городами и столбцом embeddings, по умолчанию равно None,
+            model_id (str): имя модели для векторизации, по умолчанию равно None,
+            device (str): акселератор для создания векторов, по умолчанию равно 'cpu',
+            weights (list): список пар (lexical_weight, semantic_weight), по умолчанию
+                            [(0.3, 0.7), (0.5, 0.5), (1.0, 0.0)],
+            top_k (int): количество найденных городов, по умолчанию равно 10,
+            n_queries (int): количество запросов, по умолчанию равно 300.
+    """
+    weights = weights or [(0.3, 0.7), (0.5, 0.5), (1.0, 0.0)]
+    start = time.perf_counter()
+    finder = FindCity(model_id=model_id, device=device, dataset=dataset, emb_col="embeddings",
+                      cols_output=["name"], exact_match=False, lexical_weight=weights[0][0],
+                      semantic_weight=weights[0][1])
+    print(f"построение FindCity с лексическим индексом: {time.perf_counter() - start:.2f} с, "
+          f"значений в индексе {len(finder.lexical_index.variants)}")
+    typos, targets = make_typos(names=dataset["name"].tolist(), n_queries=n_queries)
+    vectors = finder.encode(cities=typos)
+    names = dataset["name"].to_numpy()
+
+    def report(title, cities=None):
+        _, indices = finder.search(vectors=vectors, top_k=top_k, cities=cities)
+        found = names[indices]
+        top_1 = np.mean(found[:, 0] == np.array(targets))
+        top_k_acc = np.mean([target in row for target, row in zip(targets, found)])
+        batch_ms = timeit(lambda: finder.search(vectors=vectors, top_k=top_k, cities=cities), 3) / len(typos)
+        single_ms = timeit(lambda: [
+            finder.search(vectors=vectors[pos], top_k=top_k, cities=None if cities is None else [cities[pos]])
+            for pos in range(len(typos))
+        ], 1) / len(typos)
+        print(f"{title}: accuracy@1 {top_1:.3f}, accuracy@{top_k} {top_k_acc:.3f}, "
+              f"пакет {batch_ms:.3f} мс/запрос, по одному {single_ms:.3f} мс/запрос")
+
+    report("векторный поиск")
+    for lexical_weight, semantic_weight in weights:
+        finder.set_weights(lexical_weight=lexical_weight, semantic_weight=semantic_weight)
+        report(f"гибридный поиск lexical_weight={lexical_weight}, semantic_weight={semantic_weight}", cities=typos)
+
+
+def bench_edit_distance(names=None, sizes=(100, 300), n_queries=200, seed=12345):
+    """
+    Функция замера расчета расстояния редактирования между названием с опечаткой и списком кандидатов:
+    fuzzywuzzy process.extractOne (если пакет установлен), битово-параллельный алгоритм на numpy
+    и rapidfuzz (если пакет установлен), а также доля совпадений лучшего кандидата с исходным названием.
+    Параметры:
+            names (list): список названий городов, по умолчанию равно None,
+            sizes (tuple): количества кандидатов для одного названия, по умолчанию равно (100, 300),
+            n_queries (int): количество названий, по умолчанию равно 200,
+            seed (int): начальное значение генератора случайных чисел, по умолчанию равно 12345.
+    """
+    try:
+        from fuzzywuzzy import process as fuzzy_process
+    except ImportError:
+        fuzzy_process = None
+    rng = np.random.default_rng(seed)
+    typos, targets = make_typos(names=names, n_queries=n_queries, seed=seed)
+    pool = list(dict.fromkeys(names))
+    for size in sizes:
+        # кандидаты - случайные названия и исходное название
+        candidates = [
+            list(dict.fromkeys([target] + [pool[pos] for pos in rng.integers(0, len(pool), size - 1)]))
+            for target in targets
+        ]
+        backends = [("numpy", lambda typo, cands: cands[int(np.argmax(similarity(typo, cands, backend="numpy")))])]
+        if rapidfuzz_process is not None:
+            backends.append(
+                ("rapidfuzz", lambda typo, cands: cands[int(np.argmax(similarity(typo, cands, backend="rapidfuzz")))])
+            )
+        if fuzzy_process is not None:
+            backends.append(("fuzzywuzzy", lambda typo, cands: fuzzy_process.extractOne(typo, cands)[0]))
+        for title, best in backends:
+            found = [best(typo, cands) for typo, cands in zip(typos, candidates)]
+            accuracy = np.mean([value == target for value, target in zip(found, targets)])
+            query_ms = timeit(lambda: [best(typo, cands) for typo, cands in zip(typos, candidates)], 1) / len(typos)
+            print(f"{title}, кандидатов {size}: точность {accuracy:.3f}, {query_ms:.3f} мс/запрос")
+    # проверка битово-параллельного алгоритма по расстоянию, посчитанному rapidfuzz
+    if rapidfuzz_process is not None:
+        from rapidfuzz.distance import OSA
+        same = all(
+            (osa_distance(typo, cands) == [OSA.distance(typo, cand) for cand in cands]).all()
+            for typo, cands in zip(typos, candidates)
+        )
+        print(f"расстояния numpy и rapidfuzz совпадают: {same}")
+
+
+def bench_rerank(dataset=None, model_id=None, device="cpu", weights=(0.2, 0.5), top_k=10, n_queries=300):
+    """
+    Функция сравнения поиска без переупорядочивания и с переупорядочиванием лучших кандидатов
+    по расстоянию Дамерау-Левенштейна на наборе названий с опечатками: accuracy@1 и время поиска.
+    Параметры:
+            dataset (pd.DataFrame): датасет с городами и столбцом embeddings, по умолчанию равно None,
+            model_id (str): имя модели для векторизации, по умолчанию равно None,
+            device (str): акселератор для создания векторов, по умолчанию равно 'cpu',
+            weights (tuple): веса rerank_weight, по умолчанию равно (0.2, 0.5),
+            top_k (int): количество найденных городов, по умолчанию равно 10,
+            n_queries (int): количество запросов, по умолчанию равно 300.
+    """
+    finder = FindCity(model_id=model_id, device=device, dataset=dataset, emb_col="embeddings",
+                      cols_output=["name"], exact_match=False, rerank_weight=weights[0])
+    typos, targets = make_typos(names=dataset["name"].tolist(), n_queries=n_queries)
+    vectors = finder.encode(cities=typos)
+    names = dataset["name"].to_numpy()
+    for weight in (0.0,) + tuple(weights):
+        finder.rerank_weight = weight
+        cities = typos if weight > 0 else None
+        _, indices = finder.search(vectors=vectors, top_k=top_k, cities=cities)
+        top_1 = np.mean(names[indices[:, 0]] == np.array(targets))
+        query_ms = timeit(lambda: finder.search(vectors=vectors, top_k=top_k, cities=cities), 3) / len(typos)
+        print(f"rerank_weight={weight}: accuracy@1 {top_1:.3f}, {query_ms:.3f} мс/запрос")
+
+
+def bench_quantization(embeddings=None, top_k=10, n_queries=300):
+    """
+    Функция сравнения хранения матрицы в float32, float16 и int8: объем памяти,
+    время одного запроса и совпадение top_k с точным поиском по float32.
+    Параметры:
+            embeddings (np.ndarray): нормализованная матрица векторов, по умолчанию равно None,
+            top_k (int): количество ближайших векторов, по умолчанию равно 10,
+            n_queries (int): количество запросов, по умолчанию равно 300.
+    """
+    queries = make_queries(embeddings=embeddings, n_queries=n_queries)
+    exact = make_index(kind="flat", embeddings=embeddings)
+    exact_scores, exact_idx = exact.search(vectors=queries, top_k=top_k)
+    configs = [
+        ("float32", exact),
+        ("float16", make_index(kind="quantized", embeddings=embeddings, dtype="float16")),
+        ("int8", make_index(kind="quantized", embeddings=embeddings, dtype="int8")),
+        ("int8 + float32 rescore", make_index(kind="quantized", embeddings=embeddings, dtype="int8",
+                                              exact=embeddings)),
+    ]
+    for name, index in configs:
+        search_ms = timeit(lambda: [index.search(vectors=q[None, :], top_k=top_k) for q in queries], 1) / n_queries
+        scores, idx = index.search(vectors=queries, top_k=top_k)
+        recall = np.mean([len(set(a) & set(b)) / len(b) for a, b in zip(idx, exact_idx)])
+        top1 = np.mean(idx[:, 0] == exact_idx[:, 0])
+        max_err = np.abs(scores - exact_scores).max()
+        print(
+            f"{name:>24}: {index.nbytes / 1024 ** 2:8.1f} MB, {search_ms:.4f} мс/запрос, "
+            f"совпадение top-{top_k} {recall:.4f}, top-1 {top1:.4f}, макс. ошибка score {max_err:.5f}"
+        )
+
+
+def process_memory():
+    """
+    Функция получения памяти текущего процесса из /proc/self/smaps_rollup (Linux).
+    PSS делит общие страницы между процессами, поэтому сумма PSS рабочих процессов
+    показывает реальный расход памяти.
+    Возвращаемое значение:
+            (dict): RSS и PSS процесса в мегабайтах.
+    """
+    memory = {}
+    with open("/proc/self/smaps_rollup") as fp:
+        for line in fp:
+            key, _, value = line.partition(":")
+            if key in ("Rss", "Pss"):
+                memory[key.lower()] = int(value.split()[0]) / 1024
+    return memory
+
+
+def _memory_worker(mode, metadata, embeddings, results, done):
+    """
+    Функция рабочего процесса для замера памяти: получает данные копированием
+    или подключением к общей памяти, читает всю матрицу и сообщает свою память.
+    """
+    if mode == "shared":
+        metadata, embeddings, segments = attach_shared()
+    else:
+        metadata, embeddings = metadata.copy(deep=True), np.array(embeddings)
+    float(embeddings.sum())
+    results.put(process_memory())
+    done.wait()
+
+
+def bench_shared_memory(metadata=None, embeddings=None, workers=(1, 4)):
+    """
+    Функция сравнения суммарной памяти рабочих процессов при копировании данных в
+    каждый процесс и при подключении к общей памяти.
+    Параметры:
+            metadata (pd.DataFrame): метаданные городов, по умолчанию равно None,
+            embeddings (np.ndarray): нормализованная матрица векторов, по умолчанию равно None,
+            workers (tuple): количества рабочих процессов для сравнения, по умолчанию равно (1, 4).
+    """
+    context = multiprocessing.get_context("fork")
+    publish_shared(metadata=metadata, embeddings=embeddings)
+    try:
+        for mode in ("copy", "shared"):
+            for n_workers in workers:
+                results, done = context.Queue(), context.Event()
+                procs = [context.Process(target=_memory_worker, args=(mode, metadata, embeddings, results, done))
+                         for _ in range(n_workers)]
+                for proc in procs:
+                    proc.start()
+                memory = [results.get() for _ in procs]
+                done.set()
+                for proc in procs:
+                    proc.join()
+                print(
+                    f"{mode:>6}, рабочих процессов {n_workers}: сумма RSS {sum(m['rss'] for m in memory):8.1f} MB, "
+                    f"сумма PSS {sum(m['pss'] for m in memory):8.1f} MB"
+                )
+    finally:
+        unlink_shared()
+
+
+def bench_embeddings(names=None, model_id=None, device="cpu", processes=(0,)):
+    """
+    Функция сравнения скорости векторизации названий прежним способом (батч 8,
+    порядок множества) и методом DatasetLoader.load_city_embeddings с сортировкой
+    по длине и подбором размера батча.
+    Параметры:
+            names (list): список названий для векторизации, по умолчанию равно None,
+            model_id (str): имя модели для векторизации, по умолчанию равно None,
+            device (str): акселератор для создания векторов CPU или GPU, по умолчанию равно 'cpu',
+            processes (tuple): количества процессов для сравнения, по умолчанию равно (0,).
+    """
+    names = list(set(names))
+    model = make_encoder(kind="sentence_transformers", model_id=model_id, device=device)
+    model.encode(texts=names[:8], batch_size=8)
+    start = time.perf_counter()
+    legacy = model.encode(texts=names, batch_size=8)
+    legacy_s = time.perf_counter() - start
+    print(f"прежний способ: {len(names) / legacy_s:.1f} названий/с")
+    legacy = dict(zip(names, legacy))
+    loader = DatasetLoader()
+    for n_processes in processes:
+        start = time.perf_counter()
+        dataset = loader.load_city_embeddings(device=device, model_id=model_id, batch_size=None,
+                                              id_emb_col=names, processes=n_processes)
+        pipeline_s = time.perf_counter() - start
+        max_err = max(np.abs(emb - legacy[name]).max() for name, emb in zip(dataset["name"], dataset["embeddings"]))
+        print(
+            f"конвейер, процессов {n_processes}: {len(names) / pipeline_s:.1f} названий/с "
+            f"(с подбором батча и загрузкой модели), макс. отличие векторов {max_err:.2e}"
+        )
+
+
+# код замера кодировщика в отдельном процессе: время запуска считается с импорта модуля encoders,
+# память - пиковый RSS процесса
+ENCODER_WORKER = """
+import json, resource, sys, time
+start = time.perf_counter()
+import numpy as np
+from encoders import make_encoder
+kind, model_id, params, names_file, out_file = sys.argv[1:6]
+encoder = make_encoder(kind=kind, model_id=model_id, device="cpu", **json.loads(params))
+startup_s = time.perf_counter() - start
+names = json.load(open(names_file))
+encoder.encode(texts=names[:8], batch_size=8)
+times = []
+for name in names[:200]:
+    begin = time.perf_counter()
+    encoder.encode(texts=[name], batch_size=1)
+    times.append(time.perf_counter() - begin)
+begin = time.perf_counter()
+vectors = encoder.encode(texts=names, batch_size=64)
+batch_s = time.perf_counter() - begin
+np.save(out_file, vectors)
+print(json.dumps({"startup_s": startup_s, "query_ms": float(np.median(times)) * 1000,
+                  "batch_per_s": len(names) / batch_s, "dim": int(vectors.shape[1]),
+                  "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}))
+"""
+
+
+def bench_encoders(names=None, model_id=None, configs=None, n_names=2000):
+    """
+    Функция сравнения кодировщиков названий: время запуска (импорт и загрузка модели), пиковый RSS,
+    медианное время векторизации одного названия и скорость векторизации батчами. Каждый кодировщик
+    запускается в отдельном процессе, чтобы импорт torch и загрузка модели учитывались полностью.
+    Для квантованной модели выводится косинусное сходство ее векторов с векторами исходной модели.
+    Параметры:
+            names (list): список названий, по умолчанию равно None,
+            model_id (str): имя модели или путь к локально сохраненной модели, по умолчанию равно None,
+            configs (list): список пар (тип кодировщика, параметры), по умолчанию
+                            sentence_transformers, quantized и hashing,
+            n_names (int): количество названий для замера, по умолчанию равно 2000.
+    """
+    configs = configs or [("sentence_transformers", {}), ("quantized", {}), ("hashing", {})]
+    names = list(dict.fromkeys(names))[:n_names]
+    vectors = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        names_file = os.path.join(tmp_dir, "names.json")
+        with open(names_file, "w") as fp:
+            json.dump(names, fp)
+        for kind, params in configs:
+            out_file = os.path.join(tmp_dir, f"{kind}.npy")
+            result = subprocess.run(
+                [sys.executable, "-c", ENCODER_WORKER, kind, str(model_id), json.dumps(params), names_file, out_file],
+                cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, check=True,
+            )
+            stats = json.loads(result.stdout.strip().splitlines()[-1])
+            vectors[kind] = normalize_rows(np.load(out_file))
+            print(f"{kind} {params}: запуск {stats['startup_s']:.2f} с, RSS {stats['rss_mb']:.0f} MB, "
+                  f"одно название {stats['query_ms']:.2f} мс, батчи {stats['batch_per_s']:.0f} названий/с, "
+                  f"размерность {stats['dim']}")
+    if "sentence_transformers" in vectors and "quantized" in vectors:
+        cos_sim = (vectors["sentence_transformers"] * vectors["quantized"]).sum(axis=1)
+        print(f"сходство векторов quantized и sentence_transformers: среднее {cos_sim.mean():.4f}, "
+              f"минимальное {cos_sim.min():.4f}")
+
+
+def bench_copy(engine=None, dataset=None, table_name="embeddings", methods=("multi", "copy", "copy_binary")):
+    """
+    Функция сравнения скорости загрузки датафрейма в БД методом to_sql pandas (INSERT)
+    и через COPY FROM STDIN в текстовом и бинарном формате. Загрузка идет во временную
+    таблицу (CREATE TEMP TABLE) со структурой таблицы table_name: она видна только в сеансе
+    замера и удаляется после него, даже если замер прерван.
+    Параметры:
+            engine (sqlalchemy.engine): подключение к БД, по умолчанию равно None,
+            dataset (pd.DataFrame): датафрейм для загрузки, по умолчанию равно None,
+            table_name (str): таблица-образец, по умолчанию равно 'embeddings',
+            methods (tuple): методы загрузки для сравнения, по умолчанию равно ('multi', 'copy', 'copy_binary').
+    """
+    register_adapter(np.float32, addapt_numpy_float32)
+    # временная таблица существует только в своем сеансе, поэтому все загрузки идут через одно соединение
+    bench_engine = create_engine(engine.url, poolclass=StaticPool)
+    data_sql = DataFrameSQL(engine=bench_engine)
+    bench_table = f"{table_name}_bench"
+    try:
+        with bench_engine.connect() as conn:
+            conn.execute(text(f"CREATE TEMP TABLE {bench_table} (LIKE {table_name} INCLUDING ALL)"))
+            conn.commit()
+        for method in methods:
+            with bench_engine.connect() as conn:
+                conn.execute(text(f"TRUNCATE {bench_table}"))
+                conn.commit()
+            dtype = {"embeddings": ARRAY(REAL)} if "embeddings" in dataset.columns else None
+            start = time.perf_counter()
+            data_sql.to_sql(dataset, bench_table, method=method, dtype=dtype)
+            load_s = time.perf_counter() - start
+            print(f"{method:>12}: {load_s:8.2f} с, {len(dataset) / load_s:10.0f} строк/с")
+    finally:
+        with bench_engine.connect() as conn:
+            conn.execute(text(f"DROP TABLE IF EXISTS pg_temp.{bench_table}"))
+            conn.commit()
+        bench_engine.dispose()
+
+
+def _files_size(paths):
+    """
+    Функция подсчета суммарного размера существующих файлов в мегабайтах.
+    """
+    return sum(os.path.getsize(path) for path in paths if os.path.exists(path)) / 1024 ** 2
+
+
+def bench_dataset_formats(cities=None, embeddings=None, columns=None, countries=None):
+    """
+    Функция сравнения форматов сохранения датасетов: zip pickle и parquet (+ .npy для векторов).
+    Выводит размеры файлов, время полной загрузки, загрузки части столбцов и стран
+    и время отображения матрицы векторов в память.
+    Параметры:
+            cities (pd.DataFrame): датасет с городами, по умолчанию равно None,
+            embeddings (pd.DataFrame): датасет с векторами названий, по умолчанию равно None,
+            columns (list): столбцы городов для частичной загрузки, по умолчанию name, country_code_iso,
+                            population,
+            countries (list): ISO коды стран для частичной загрузки, по умолчанию равно ['RU'].
+    """
+    columns = columns or ["name", "country_code_iso", "population"]
+    countries = countries or ["RU"]
+    loader = DatasetLoader()
+    with tempfile.TemporaryDirectory() as work_dir:
+        for file_name, dataset in (("cities", cities), ("embeddings", embeddings)):
+            path = os.path.join(work_dir, file_name)
+            for file_format in ("pickle", "parquet"):
+                start = time.perf_counter()
+                loader.save_dataset_to_file(dataset=dataset, file_name=file_name, dir_to_save=work_dir,
+                                            file_format=file_format)
+                save_s = time.perf_counter() - start
+                files = [path] if file_format == "pickle" else [path + ".parquet", path + ".npy"]
+                load_s = timeit(lambda: loader.load_dataset_from_file(file_name=file_name, dir_to_load=work_dir,
+                                                                      mmap=False), 1) / 1000
+                line = (f"{file_name:>10} {file_format:>8}: {_files_size(files):8.1f} MB, сохранение {save_s:6.2f} с, "
+                        f"полная загрузка {load_s:6.2f} с")
+                if file_name == "cities":
+                    part_s = timeit(lambda: loader.load_dataset_from_file(
+                        file_name=file_name, dir_to_load=work_dir, columns=columns, countries=countries), 1) / 1000
+                    line += f", столбцы {columns} стран {countries} {part_s:6.3f} с"
+                else:
+                    mmap_s = timeit(lambda: loader.load_dataset_from_file(file_name=file_name, dir_to_load=work_dir,
+                                                                          mmap=True), 1) / 1000
+                    line += f", с отображением в память {mmap_s:6.3f} с"
+                print(line)
+                # следующий формат читается из своего файла
+                for file in files:
+                    if os.path.exists(file):
+                        os.remove(file)
+
+
+def main():
+    # создаем подключение и загружаем датасет согласно config файлу
+    engine = create_engine(CONN_STR_GEONAMES)
+    data_loader = DataFrameSQL(engine=engine)
+    dataset = data_loader.from_sql(query=QUERY, countries=COUNTRIES_LST, population=POPULATION)
+    # замер загрузки векторов в БД
+    bench_copy(engine=engine, dataset=dataset[["name", "embeddings"]].drop_duplicates("name"))
+    # сравнение форматов сохранения датасетов городов и векторов
+    bench_dataset_formats(cities=dataset.drop(columns=["embeddings"]),
+                          embeddings=dataset[["name", "embeddings"]].drop_duplicates("name"))
+    # замер поиска кандидатов расширенной проверки
+    bench_alias_index(dataset=dataset)
+    # замер векторизации названий городов
+    bench_embeddings(names=dataset["name"].tolist(), model_id=MODEL_ID, device=DEVICE)
+    # сравнение кодировщиков: запуск, память и время векторизации
+    bench_encoders(names=dataset["name"].tolist(), model_id=MODEL_ID)
+    # замер приближенного поиска по векторам городов
+    embeddings = normalize_rows(np.array(list(dataset["embeddings"]), dtype=np.float32))
+    bench_ann(embeddings=embeddings)
+    # замер поиска по матрице уникальных названий
+    bench_unique_names(dataset=dataset, embeddings=embeddings)
+    # замер фильтров запроса
+    bench_filters(dataset=dataset, embeddings=embeddings)
+    # замер обратного геокодирования на 100000 синтетических точек и на координатах датасета
+    bench_reverse_geocode()
+    bench_reverse_geocode(latitude=dataset["latitude"], longitude=dataset["longitude"])
+    # сравнение векторного и гибридного поиска на названиях с опечатками
+    bench_hybrid(dataset=dataset, model_id=MODEL_ID, device=DEVICE)
+    # замер расстояния редактирования и переупорядочивания кандидатов
+    bench_edit_distance(names=dataset["name"].tolist())
+    bench_rerank(dataset=dataset, model_id=MODEL_ID, device=DEVICE)
+    # замер квантованного хранения матрицы
+    bench_quantization(embeddings=embeddings)
+    # замер памяти рабочих процессов с общей памятью и без нее
+    bench_shared_memory(metadata=dataset.drop(columns=["embeddings"]), embeddings=embeddings)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+# файл с классом кэша векторов запросов
+# базовые импорты
+import threading
+import unicodedata
+from collections import OrderedDict
+
+
+def normalize_name(city=None):
+    """
+    Функция нормализации названия города перед созданием вектора и поиском в кэше:
+    приведение юникода к форме NFC и схлопывание пробелов.
+    Параметр:
+            city (str): название города, по умолчанию равно None.
+    Возвращаемое значение:
+            city (str): нормализованное название города.
+    """
+    return " ".join(unicodedata.normalize("NFC", city).split())
+
+
+class EmbeddingCache:
+    """
+    Класс EmbeddingCache - потокобезопасный кэш векторов запросов с ограничением
+    количества записей и вытеснением давно не использованных записей (LRU).
+    """
+
+    def __init__(self, max_entries=10000):
+        """
+        Инициализация объекта класса EmbeddingCache.
+
+         Параметры:
+              max_entries (int): максимальное количество записей в кэше, если равно 0,
+                                 то кэш отключен, по умолчанию равно 10000.
+        """
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Метод get класса EmbeddingCache.
+        Получение вектора по ключу с переносом записи в конец очереди вытеснения.
+
+         Параметры:
+              key (tuple): ключ записи (идентификатор модели, нормализованное название).
+         Возвращаемое значение:
+              vector (np.ndarray): вектор или None, если записи нет в кэше.
+        """
+        with self._lock:
+            vector = self._data.get(key)
+            if vector is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._data.move_to_end(key)
+            return vector
+
+    def put(self, key, vector):
+        """
+        Метод put класса EmbeddingCache.
+        Сохранение вектора в кэш с вытеснением самых давно использованных записей.
+
+         Параметры:
+              key (tuple): ключ записи (идентификатор модели, нормализованное название),
+              vector (np.ndarray): вектор запроса.
+        """
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._data[key] = vector
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        """
+        Метод clear класса EmbeddingCache.
+        Очистка кэша и счетчиков попаданий и промахов.
+        """
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def info(self):
+        """
+        Метод info класса EmbeddingCache.
+        Статистика кэша.
+
+         Возвращаемое значение:
+              (dict): словарь с количеством попаданий, промахов, долей попаданий,
+                      текущим и максимальным размером кэша.
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "size": len(self._data),
+                "max_entries": self.max_entries,
+            }
@@ -1,6 +1,5 @@
 # файл для конфигурации переменных
 import os
-import torch
 # Переменные для датасетов
 # рабочая директория проекта
 WORK_DIR = os.path.abspath(os.curdir)
@@ -8,8 +7,13 @@ WORK_DIR = os.path.abspath(os.curdir)
 SRC_DIR = os.path.join(WORK_DIR, 'source')
 # директория для сохранения датасетов
 DATA_DIR = os.path.join(WORK_DIR, 'datasets')
+# формат сохранения датасетов: 'pickle' - zip pickle, 'parquet' - колоночный формат с матрицей векторов в .npy
+# (чтение части столбцов и стран, отображение векторов в память); загрузка определяет формат по файлам
+DATASET_FORMAT = 'pickle'
 # директория для сохранения json файлов с результатом
 OUT_DIR = os.path.join(WORK_DIR, 'output')
+# директория со снимками данных для быстрого запуска FindCity (создаются скриптом make_snapshot.py)
+SNAPSHOT_DIR = os.path.join(WORK_DIR, 'snapshot')
 
 # Нижеперечисленные переменные будут использованы при загрузке в методе load_dataset класса DatasetLoader
 CITY_FILE = "cities500.txt"  # файл с городами
@@ -54,6 +58,15 @@ USE_CITY_COLS = [
 ]
 # типы данных для некоторых столбцов, заданные по умолчанию при загрузке
 COL_TYPES = {"country_code_iso": str, "admin_1_code": str}
+# хранение строковых столбцов с большим количеством уникальных значений (alternatenames) в типе string[pyarrow]
+# при оптимизации памяти функцией reduce_mem_usage, по умолчанию столбцы остаются типа object
+ARROW_STRINGS = False
+# фильтры, применяемые при чтении файла с городами методом load_dataset_filtered, None - без фильтра.
+# Для allCountries.txt (или allCountries.zip), например: {"countries": ["RU", "KZ"], "feature_classes": ["P"],
+# "min_population": 500}
+CITY_FILTERS = {"countries": None, "feature_classes": None, "feature_codes": None, "min_population": None}
+# количество процессов для разбора файла с городами, 0 - в текущем процессе
+PARSE_PROCESSES = 0
 # названия столбцов для датасета со странами
 COUNTRY_COLS = [
     "iso",
@@ -127,6 +140,7 @@ CONN_STR_DEFAULT = "postgresql://{}:{}@{}:{}/{}".format(
 # по умолчанию взяты Россия и Казахстан,
 # но можно составить список с изначальным условием, правильное написание стран в файле countryInfo.txt
 # ["Russia", "Kazakhstan", "Belarus", "Armenia", "Azerbaijan", "Georgia", "Serbia", Turkey"]
+# None - загружаются все страны, тогда один процесс обслуживает любой набор стран через фильтр countries запроса
 COUNTRIES_LST = ["Russia", "Kazakhstan"]
 # численность населения
 POPULATION = 15000
@@ -134,6 +148,7 @@ POPULATION = 15000
 QUERY = """
   SELECT ci.city_geoname_id as geoname_id,
         ci.name,
+        ci.asciiname,
         ci.alternatenames,
         ad.name as oblast,
         co.country,
@@ -142,6 +157,9 @@ QUERY = """
         ci.timezone,
         ci.latitude,
         ci.longitude,
+        ci.population,
+        ci.country_code_iso,
+        ci.feature_code,
         em.embeddings
   FROM city AS ci
   JOIN country AS co ON ci.country_code_iso = co.iso
@@ -152,10 +170,76 @@ QUERY = """
          """
 
 # Переменные для моделирования эмбеддингов и вывода результата
-# проверяем наличие gpu
-DEVICE = torch.device("cuda:0") if torch.cuda.is_available() else torch.device("cpu")
+# акселератор для модели: 'auto' - GPU, если он есть, иначе CPU (проверяется при загрузке модели,
+# поэтому config не импортирует torch), или явно 'cpu', 'cuda:0'
+DEVICE = "auto"
 # имя модели sentence-transformers
 MODEL_ID = "sentence-transformers/LaBSE"
+# кодировщик названий для векторизации городов и запросов:
+# 'sentence_transformers' - модель MODEL_ID, 'quantized' - модель MODEL_ID с квантованием линейных слоев в int8 на CPU
+# (векторы совместимы с векторами исходной модели), 'hashing' - хэширование символьных n-грамм без torch
+# (векторы городов создаются этим же кодировщиком), ENCODER_PARAMS - параметры, например {"n_features": 1024}
+ENCODER = "sentence_transformers"
+ENCODER_PARAMS = {}
+# параметры векторизации названий городов: размер батча (None - подбирается автоматически),
+# количество процессов для векторизации на CPU (0 - в текущем процессе)
+# и директория для сохранения готовых частей, с которой векторизация продолжается после сбоя
+EMB_BATCH_SIZE = None
+EMB_PROCESSES = 0
+EMB_CHECKPOINT_DIR = os.path.join(DATA_DIR, 'emb_checkpoint')
+# инкрементальное обновление векторов в make_datasets.py: векторы создаются только для новых названий,
+# векторы остальных названий берутся из сохраненного ранее датасета embeddings;
+# по умолчанию все векторы создаются заново, как и раньше
+EMB_INCREMENTAL = False
+# максимальное количество векторов запросов в LRU кэше FindCity, 0 - кэш отключен
+EMB_CACHE_SIZE = 10000
+# корректор опечаток для первичной проверки названия города:
+# 'yandex' - Яндекс Спеллер (нужен доступ в интернет), 'local' - локальный корректор по данным geonames
+SPELLER = "yandex"
+# индекс для поиска по векторам городов: 'flat' - точный поиск, 'ivf' - приближенный поиск
+# по инвертированным спискам, 'faiss' - граф HNSW (нужен пакет faiss-cpu)
+INDEX_TYPE = "flat"
+# параметры индекса, например {"n_lists": 256, "n_probe": 8} для 'ivf' или {"ef_search": 64} для 'faiss'
+INDEX_PARAMS = {}
+# путь к файлу индекса, None - индекс строится при каждом запуске
+# (при UNIQUE_NAMES=True индекс строится по матрице уникальных названий)
+INDEX_PATH = None
+# тип хранения матрицы векторов городов для индекса 'flat': 'float32', 'float16' или 'int8',
+# при квантовании лучшие кандидаты пересчитываются по матрице float32 на диске (матрица снимка
+# или файл .npy по пути INDEX_PATH), если ее нет, то сходство приближенное
+EMB_DTYPE = "float32"
+# поиск точных совпадений с name, asciiname и alternatenames до корректора опечаток и модели,
+# найденные города возвращаются со сходством 1.0
+EXACT_MATCH = True
+# поиск по матрице уникальных названий: найденное название раскрывается во все города с этим названием,
+# города с одинаковым сходством упорядочиваются по столбцу TIE_BREAK (по убыванию, если TIE_BREAK_ASCENDING=False)
+UNIQUE_NAMES = True
+TIE_BREAK = "population"
+TIE_BREAK_ASCENDING = False
+# гибридный поиск: итоговая оценка города - SEMANTIC_WEIGHT * косинусное сходство векторов +
+# LEXICAL_WEIGHT * сходство по символьным 3-граммам названий, транслитераций и alternatenames,
+# LEXICAL_CANDIDATES - количество кандидатов каждого вида поиска, LEXICAL_WEIGHT=0 - только векторный поиск;
+# веса нормализуются к сумме 1, итоговая оценка выводится в столбце score, косинусное сходство - в cos_sim_score
+LEXICAL_WEIGHT = 0.0
+SEMANTIC_WEIGHT = 1.0
+LEXICAL_CANDIDATES = 50
+# переупорядочивание RERANK_CANDIDATES лучших кандидатов поиска с учетом расстояния Дамерау-Левенштейна
+# между названием запроса и названием города с весом RERANK_WEIGHT (0 - отключено),
+# итоговая оценка выводится в столбце score, EDIT_BACKEND - способ расчета расстояния: 'numpy',
+# 'rapidfuzz' (нужен пакет rapidfuzz) или 'auto'
+RERANK_WEIGHT = 0.0
+RERANK_CANDIDATES = 100
+EDIT_BACKEND = "auto"
+# параметры планировщика пакетной обработки запросов веб-приложения:
+# максимальное время ожидания пакета в миллисекундах и максимальный размер пакета,
+# BATCH_TIMEOUT_S - максимальное время ожидания результата запроса в секундах, после него ответ 503
+BATCH_MAX_WAIT_MS = 5
+BATCH_MAX_SIZE = 64
+BATCH_TIMEOUT_S = 30
+# параметры JSON API: максимальное количество названий в одном запросе
+# и минимальный размер ответа в байтах, начиная с которого ответ сжимается gzip
+API_MAX_NAMES = 10000
+API_GZIP_MIN_SIZE = 1024
 # список выводимых столбцов для результирующей таблицы.
 COLS_OUTPUT = [
     "geoname_id",
@@ -168,3 +252,25 @@ COLS_OUTPUT = [
     "latitude",
     "longitude",
 ]
+# параметры FindCity из config файла, общие для веб-приложения (main.py) и пакетного сопоставления (geocode.py)
+FINDER_PARAMS = dict(
+    model_id=MODEL_ID,
+    cols_output=COLS_OUTPUT,
+    cache_size=EMB_CACHE_SIZE,
+    index=INDEX_TYPE,
+    index_params=INDEX_PARAMS,
+    index_path=INDEX_PATH,
+    emb_dtype=EMB_DTYPE,
+    exact_match=EXACT_MATCH,
+    unique_names=UNIQUE_NAMES,
+    tie_break=TIE_BREAK,
+    tie_break_ascending=TIE_BREAK_ASCENDING,
+    lexical_weight=LEXICAL_WEIGHT,
+    semantic_weight=SEMANTIC_WEIGHT,
+    lexical_candidates=LEXICAL_CANDIDATES,
+    rerank_weight=RERANK_WEIGHT,
+    rerank_candidates=RERANK_CANDIDATES,
+    edit_backend=EDIT_BACKEND,
+    encoder=ENCODER,
+    encoder_params=ENCODER_PARAMS,
+)
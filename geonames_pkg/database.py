@@ -1,12 +1,35 @@
 # файл с классами для работы с БД
 # базовые импорты
+import io
+import struct
+import numpy as np
 import pandas as pd
 # импорты для работы с БД
 from sqlalchemy import (
     create_engine,
+    inspect,
     text,
 )
 from psycopg2.extensions import AsIs
+from psycopg2.extras import execute_values
+from tables import VectorsInfo
+
+# ограничения, которые снимаются на время загрузки таблицы при fk_restriction=True:
+# таблица - (внешний ключ таблицы city, первичный ключ таблицы, столбец внешнего ключа в city)
+FK_RESTRICTIONS = {
+    "embeddings": ("fk_name", "name", "name"),
+    "country": ("fk_country_code_iso", "iso", "country_code_iso"),
+    "admincode": ("fk_admin_code", "admin_code", "admin_code"),
+}
+# заголовок и признак конца данных бинарного формата COPY
+PG_BINARY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack(">ii", 0, 0)
+PG_BINARY_TRAILER = struct.pack(">h", -1)
+# форматы numpy для скалярных типов Postgres в бинарном формате COPY
+PG_BINARY_SCALARS = {"int2": ">i2", "int4": ">i4", "int8": ">i8", "float4": ">f4", "float8": ">f8", "bool": "?"}
+# OID типа элемента и формат numpy для массивов
+PG_BINARY_ARRAYS = {"_float4": (700, ">f4"), "_float8": (701, ">f8")}
+# текстовые типы Postgres
+PG_TEXT_TYPES = ("text", "varchar", "bpchar")
 
 
 class CreateDatabase:
@@ -84,76 +107,118 @@ class DataFrameSQL:
                chunksize (int): количество строк для записи за один запрос к базе данных, по умолчанию
                                 равно 10000,
                method (str): метод вставки данных в базу данных, по умолчанию равно 'multi',
+                             'copy' и 'copy_binary' - загрузка в существующую таблицу через
+                             COPY FROM STDIN в текстовом или бинарном формате (метод copy_from_df),
                index (boll): опция для включения индекса в базу данных, по умолчанию равно False,
                dtype (dict): словарь для указания типов данных столбцов при сохранении в базу данных,
                              по умолчанию равно None,
                fk_restriction (bool): опция для управления ограничениями внешнего ключа при сохранении
-                                      данных, по умолчанию равно False.
+                                      данных, по умолчанию равно False. Если True, на время загрузки
+                                      снимаются внешний ключ таблицы city и первичный ключ таблицы,
+                                      после загрузки они создаются заново.
         """
+        if fk_restriction and table_name not in FK_RESTRICTIONS:
+            raise ValueError(
+                f"Для таблицы {table_name} нет ограничений внешнего ключа, допустимые таблицы: "
+                f"{list(FK_RESTRICTIONS)}."
+            )
         # если True
         if fk_restriction:
-            # снятие ограничения внешнего ключа в зависимости от имени таблицы
-            with self.engine.connect() as conn:
-                if table_name == "embeddings":
-                    conn.execute(text("ALTER TABLE city DROP CONSTRAINT fk_name"))
-                    conn.commit()
-                elif table_name == "country":
-                    conn.execute(
-                        text("ALTER TABLE city DROP CONSTRAINT fk_country_code_iso")
-                    )
-                    conn.commit()
-                else:
-                    conn.execute(text("ALTER TABLE city DROP CONSTRAINT fk_admin_code"))
-                    conn.commit()
-            conn.close()
-
-        # загрузка данных из DataFrame в базу данных
-        print(f"Загружаем датафрейм в таблицу {table_name} базы данных geonames ...")
-        df.to_sql(
-            table_name,
-            con=self.engine,
-            if_exists=if_exists,
-            chunksize=chunksize,
-            method=method,
-            index=index,
-            dtype=dtype,
-        )
-        print(f"Загружено {len(df)} записей!")
-        # если True
-        if fk_restriction:
-            # восстановление первичного ключа и ограничений внешнего ключа после загрузки данных
+            fk_name, pk_col, fk_col = FK_RESTRICTIONS[table_name]
+            # снятие ограничения внешнего ключа и первичного ключа таблицы
             with self.engine.connect() as conn:
-                if table_name == "embeddings":
-                    conn.execute(text("ALTER TABLE embeddings ADD PRIMARY KEY (name)"))
-                    conn.commit()
+                conn.execute(text(f"ALTER TABLE city DROP CONSTRAINT IF EXISTS {fk_name}"))
+                conn.execute(text(f"ALTER TABLE {table_name} DROP CONSTRAINT IF EXISTS {table_name}_pkey"))
+                conn.commit()
+        try:
+            # загрузка данных из DataFrame в базу данных
+            print(f"Загружаем датафрейм в таблицу {table_name} базы данных geonames ...")
+            if method in ("copy", "copy_binary"):
+                if if_exists != "append":
+                    raise ValueError("Загрузка через COPY возможна только в существующую таблицу, if_exists='append'.")
+                self.copy_from_df(df, table_name, binary=method == "copy_binary", chunksize=chunksize)
+            else:
+                df.to_sql(
+                    table_name,
+                    con=self.engine,
+                    if_exists=if_exists,
+                    chunksize=chunksize,
+                    method=method,
+                    index=index,
+                    dtype=dtype,
+                )
+            print(f"Загружено {len(df)} записей!")
+        finally:
+            # если True
+            if fk_restriction:
+                # восстановление первичного ключа и ограничений внешнего ключа, в том числе после ошибки загрузки
+                with self.engine.connect() as conn:
+                    conn.execute(text(f"ALTER TABLE {table_name} ADD PRIMARY KEY ({pk_col})"))
                     conn.execute(
                         text(
-                            "ALTER TABLE city ADD CONSTRAINT fk_name FOREIGN KEY (name) REFERENCES embeddings(name)"
-                        )
-                    )
-                    conn.commit()
-                elif table_name == "country":
-                    conn.execute(text("ALTER TABLE iso ADD PRIMARY KEY (country)"))
-                    conn.commit()
-                    conn.execute(
-                        text(
-                            "ALTER TABLE city ADD CONSTRAINT fk_country_code_iso FOREIGN KEY (country_code_iso) "
-                            "REFERENCES country(iso)"
-                        )
-                    )
-                    conn.commit()
-                else:
-                    conn.execute(
-                        text("ALTER TABLE admincode ADD PRIMARY KEY (admin_code)")
-                    )
-                    conn.commit()
-                    conn.execute(
-                        text(
-                            "ALTER TABLE city ADD CONSTRAINT fk_admin_code FOREIGN KEY (admin_code) REFERENCES "
-                            "admincode(admin_code)"
+                            f"ALTER TABLE city ADD CONSTRAINT {fk_name} FOREIGN KEY ({fk_col}) "
+                            f"REFERENCES {table_name}({pk_col}) ON UPDATE CASCADE ON DELETE CASCADE"
                         )
                     )
                     conn.commit()
+
+    def column_types(self, table_name):
+        """
+        Метод column_types.
+        Возвращает типы столбцов таблицы в БД.
+
+         Параметры:
+               table_name (str): наименование таблицы в базе данных.
+         Возвращаемое значение:
+               (dict): словарь столбец - имя типа Postgres (udt_name), например 'int4', 'text', '_float4'.
+        """
+        # временные таблицы находятся в схеме pg_temp_N сеанса и перекрывают таблицы текущей схемы
+        query = text(
+            "SELECT column_name, udt_name FROM information_schema.columns "
+            "WHERE table_name = :table_name AND (table_schema = current_schema() "
+            "OR table_schema = pg_my_temp_schema()::regnamespace::text) "
+            "ORDER BY table_schema = current_schema() DESC, ordinal_position"
+        )
+        with self.engine.connect() as conn:
+            return dict(conn.execute(query, {"table_name": table_name}).fetchall())
+
+    def copy_from_df(self, df, table_name, binary=False, chunksize=10000):
+        """
+        Метод copy_from_df.
+        Загружает DataFrame в существующую таблицу через COPY FROM STDIN (copy_expert psycopg2).
+        Строки кодируются частями по chunksize и передаются потоком, поэтому в памяти
+        находится только одна часть. Столбцы-массивы (например, векторы float32) кодируются
+        из матрицы numpy целиком, без преобразования каждого числа в объект Python.
+
+         Параметры:
+               df (pd.DataFrame): датафрейм со столбцами, совпадающими со столбцами таблицы,
+               table_name (str): наименование таблицы в базе данных,
+               binary (bool): флаг бинарного формата COPY, по умолчанию равно False - текстовый формат,
+               chunksize (int): количество строк в одной части, по умолчанию равно 10000.
+        """
+        types = self.column_types(table_name)
+        missing = [col for col in df.columns if col not in types]
+        if missing:
+            raise ValueError(f"В таблице {table_name} нет столбцов {missing}.")
+        udt_names = [types[col] for col in df.columns]
+        encode = _binary_copy_chunk if binary else _text_copy_chunk
+        columns = ", ".join(f'"{col}"' for col in df.columns)
+        query = f"COPY {table_name} ({columns}) FROM STDIN WITH (FORMAT {'binary' if binary else 'text'})"
+
+        def chunks():
+            if binary:
+                yield PG_BINARY_HEADER
+            for first in range(0, len(df), chunksize):
+                yield encode(df.iloc[first:first + chunksize], udt_names)
+            if binary:
+                yield PG_BINARY_TRAILER
+
+        conn = self.engine.raw_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.copy_expert(query, _ChunkStream(chunks()), size=1 << 20)
+            conn.commit()
+        finally:
             conn.close()
 
     @staticmethod
@@ -165,11 +230,15 @@ class DataFrameSQL:
         Например, сначала список ["Russia", "Kazakhstan"] преобразовывается в вид
         ["'Russia'", "'Kazakhstan'"], т.е. добавляются кавычки и затем список преобразовывается в строку.
         Это необходимо для передачи в конструкцию WHERE ... IN () ... SQL запроса.
+         Если countries равно None, то возвращается подзапрос со всеми странами, чтобы загрузить
+         данные по всему миру и ограничивать страны фильтрами при поиске.
          Параметры:
-               countries(str): страна или список стран.
+               countries(str): страна, список стран или None - все страны.
          Возвращаемое значение:
                countries (str): переработанная переменная для запроса query.
          """
+        if countries is None:
+            return "SELECT country FROM country"
         # проверка на соответствие переменной countries на тип str или list
         if not isinstance(countries, (str, list)):
             raise TypeError(
@@ -214,6 +283,342 @@ class DataFrameSQL:
         # возвращаемый датасет
         return dataset
 
+    def from_sql_stream(self, query=None, countries=None, population=15000, emb_col="embeddings",
+                        chunksize=10000, binary=True, normalize=True):
+        """
+        Метод from_sql_stream.
+        Загружает данные из БД Postgres по частям через именованный (серверный) курсор.
+        Векторы записываются сразу в заранее выделенную матрицу float32, а остальные
+        столбцы возвращаются отдельным датафреймом, поэтому в памяти нет промежуточных
+        списков Python со всеми векторами.
+
+         Параметры:
+               query (str): SQL запрос к БД, по умолчанию равно None,
+               countries (str or list): страна или список стран для ограничения в запросе по странам,
+                                        по умолчанию равно None,
+               population (int): население в городах, по умолчанию равно 15000,
+               emb_col (str): наименование столбца с векторами, по умолчанию равно 'embeddings',
+               chunksize (int): количество строк, получаемых с сервера за один раз, по умолчанию равно 10000,
+               binary (bool): флаг передачи векторов в бинарном формате массива Postgres (array_send)
+                              без разбора текста, по умолчанию равно True,
+               normalize (bool): флаг нормализации векторов к единичной длине по мере загрузки,
+                                 по умолчанию равно True.
+         Возвращаемое значение:
+               metadata (pd.DataFrame): датафрейм без столбца с векторами,
+               embeddings (np.ndarray): матрица векторов float32 в порядке строк metadata.
+        """
+        countries = DataFrameSQL.check_country(countries)
+        query = query.format(countries, population).strip().rstrip(";")
+        conn = self.engine.raw_connection()
+        try:
+            # количество строк и список столбцов запроса нужны для выделения матрицы
+            with conn.cursor() as cursor:
+                cursor.execute(f"SELECT count(*) FROM ({query}) AS q")
+                n_rows = cursor.fetchone()[0]
+                cursor.execute(f"SELECT * FROM ({query}) AS q LIMIT 0")
+                columns = [desc[0] for desc in cursor.description]
+            if emb_col not in columns:
+                raise ValueError(f"В запросе нет столбца {emb_col}.")
+            meta_cols = [col for col in columns if col != emb_col]
+            emb_expr = f'array_send(q."{emb_col}")' if binary else f'q."{emb_col}"'
+            select = ", ".join([f'q."{col}"' for col in meta_cols] + [emb_expr])
+            embeddings = None
+            parts = []
+            position = 0
+            # именованный курсор держит результат на сервере и отдает его частями
+            with conn.cursor(name="geonames_stream") as cursor:
+                cursor.itersize = chunksize
+                cursor.execute(f"SELECT {select} FROM ({query}) AS q")
+                while True:
+                    rows = cursor.fetchmany(chunksize)
+                    if not rows:
+                        break
+                    values = [row[-1] for row in rows]
+                    chunk = _decode_binary_arrays(values) if binary else _decode_arrays(values)
+                    if embeddings is None:
+                        embeddings = np.zeros((n_rows, chunk.shape[1]), dtype=np.float32)
+                    target = embeddings[position:position + len(rows)]
+                    target[:] = chunk
+                    if normalize:
+                        target /= np.maximum(np.linalg.norm(target, axis=1, keepdims=True), 1e-12)
+                    parts.append(pd.DataFrame([row[:-1] for row in rows], columns=meta_cols))
+                    position += len(rows)
+            conn.commit()
+        finally:
+            conn.close()
+        if embeddings is None:
+            embeddings = np.zeros((0, 0), dtype=np.float32)
+        metadata = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=meta_cols)
+        # строки могли добавиться между подсчетом и чтением
+        return metadata, embeddings[:len(metadata)]
+
+    def get_embedding_names(self, table_name="embeddings"):
+        """
+        Метод get_embedding_names.
+        Загружает из БД векторизованные названия и размерность их векторов без самих векторов.
+
+         Параметры:
+               table_name (str): наименование таблицы с векторами, по умолчанию равно 'embeddings'.
+         Возвращаемое значение:
+               dataset (pd.DataFrame): датафрейм со столбцами name и dim.
+        """
+        query = f"SELECT name, array_length(embeddings, 1) AS dim FROM {table_name}"
+        return pd.read_sql(query, con=self.engine)
+
+    def get_embedding_info(self):
+        """
+        Метод get_embedding_info.
+        Загружает из таблицы embeddings_info описание векторов таблицы embeddings: кодировщик, модель и размерность.
+
+         Возвращаемое значение:
+               info (dict): описание векторов или None, если таблицы или описания нет.
+        """
+        table_name = VectorsInfo.__tablename__
+        if not inspect(self.engine).has_table(table_name):
+            return None
+        info = pd.read_sql(f"SELECT encoder, encoder_name, model_id, dim FROM {table_name}", con=self.engine)
+        if info.empty:
+            return None
+        info = info.iloc[0].to_dict()
+        info["dim"] = None if pd.isna(info["dim"]) else int(info["dim"])
+        return info
+
+    def set_embedding_info(self, info):
+        """
+        Метод set_embedding_info.
+        Сохраняет описание векторов таблицы embeddings в таблицу embeddings_info, таблица создается, если ее нет.
+
+         Параметры:
+               info (dict): описание векторов (функция embedding_info модуля encoders).
+        """
+        table_name = VectorsInfo.__tablename__
+        VectorsInfo.__table__.create(self.engine, checkfirst=True)
+        with self.engine.connect() as conn:
+            conn.execute(text(f"DELETE FROM {table_name}"))
+            conn.execute(
+                text(f"INSERT INTO {table_name} (id, encoder, encoder_name, model_id, dim) "
+                     f"VALUES (1, :encoder, :encoder_name, :model_id, :dim)"),
+                {key: info.get(key) for key in ("encoder", "encoder_name", "model_id", "dim")},
+            )
+            conn.commit()
+
+    def upsert_embeddings(self, df, table_name="embeddings", chunksize=10000):
+        """
+        Метод upsert_embeddings.
+        Добавляет новые векторы и заменяет существующие векторы с тем же названием
+        (INSERT ... ON CONFLICT (name) DO UPDATE).
+
+         Параметры:
+               df (pd.DataFrame): датафрейм со столбцами name и embeddings,
+               table_name (str): наименование таблицы с векторами, по умолчанию равно 'embeddings',
+               chunksize (int): количество строк для записи за один запрос к базе данных, по умолчанию
+                                равно 10000.
+        """
+        query = (
+            f"INSERT INTO {table_name} (name, embeddings) VALUES %s "
+            f"ON CONFLICT (name) DO UPDATE SET embeddings = EXCLUDED.embeddings"
+        )
+        # векторы передаются списками float, которые psycopg2 преобразует в ARRAY
+        rows = [(name, np.asarray(emb, dtype=np.float32).tolist()) for name, emb in zip(df["name"], df["embeddings"])]
+        conn = self.engine.raw_connection()
+        try:
+            with conn.cursor() as cursor:
+                execute_values(cursor, query, rows, template="(%s, %s::real[])", page_size=chunksize)
+            conn.commit()
+        finally:
+            conn.close()
+        print(f"Добавлено или обновлено {len(rows)} векторов в таблице {table_name}!")
+
+    def delete_embeddings(self, names, table_name="embeddings"):
+        """
+        Метод delete_embeddings.
+        Удаляет векторы названий, которых больше нет в данных geonames.
+        Города с этими названиями удаляются из таблицы city каскадно по внешнему ключу fk_name.
+
+         Параметры:
+               names (list): список названий для удаления,
+               table_name (str): наименование таблицы с векторами, по умолчанию равно 'embeddings'.
+        """
+        if len(names) == 0:
+            return
+        with self.engine.connect() as conn:
+            conn.execute(text(f"DELETE FROM {table_name} WHERE name = ANY(:names)"), {"names": list(names)})
+            conn.commit()
+        print(f"Удалено {len(names)} векторов из таблицы {table_name}!")
+
+
+class _ChunkStream(io.RawIOBase):
+    """
+    Файлоподобный объект для copy_expert, читающий байты из генератора частей.
+    """
+
+    def __init__(self, chunks):
+        self._chunks = chunks
+        self._buffer = b""
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._buffer:
+            try:
+                self._buffer = next(self._chunks)
+            except StopIteration:
+                return 0
+        size = min(len(buffer), len(self._buffer))
+        buffer[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+
+def _is_array_column(series):
+    """
+    Функция проверки, что столбец содержит массивы (векторы).
+    """
+    values = series.dropna()
+    return len(values) > 0 and isinstance(values.iloc[0], (np.ndarray, list, tuple))
+
+
+def _stack_arrays(series):
+    """
+    Функция сборки столбца с векторами одной длины в матрицу numpy.
+    Возвращает None, если в столбце есть пропуски или векторы разной длины.
+    """
+    if series.isna().any():
+        return None
+    try:
+        return np.stack([np.asarray(value) for value in series])
+    except ValueError:
+        return None
+
+
+def _text_field(series, udt_name):
+    """
+    Функция кодирования столбца в текстовый формат COPY.
+    Возвращаемое значение:
+            (list): список строковых значений, пропуск кодируется как \\N.
+    """
+    if udt_name in PG_BINARY_ARRAYS:
+        matrix = _stack_arrays(series)
+        if matrix is not None:
+            buffer = io.StringIO()
+            np.savetxt(buffer, matrix.reshape(len(matrix), -1), fmt="%.9g", delimiter=",")
+            return ["{" + line + "}" for line in buffer.getvalue().splitlines()]
+        return [
+            "\\N" if value is None else "{" + ",".join(f"{x:.9g}" for x in value) + "}"
+            for value in series
+        ]
+    mask = series.isna().to_numpy()
+    if udt_name in ("int2", "int4", "int8") and series.dtype.kind == "f":
+        # целые числа в столбце float из-за пропусков
+        values = series.fillna(0).astype(np.int64).astype(str)
+    else:
+        values = series.astype(object).where(~mask, "").astype(str)
+    if udt_name in PG_TEXT_TYPES:
+        values = (
+            values.str.replace("\\", "\\\\", regex=False)
+            .str.replace("\t", "\\t", regex=False)
+            .str.replace("\n", "\\n", regex=False)
+            .str.replace("\r", "\\r", regex=False)
+        )
+    values = values.tolist()
+    for position in np.flatnonzero(mask):
+        values[position] = "\\N"
+    return values
+
+
+def _text_copy_chunk(df, udt_names):
+    """
+    Функция кодирования части датафрейма в текстовый формат COPY.
+    """
+    fields = [_text_field(df[col], udt_name) for col, udt_name in zip(df.columns, udt_names)]
+    return "".join("\t".join(row) + "\n" for row in zip(*fields)).encode("utf-8")
+
+
+def _binary_field(series, udt_name):
+    """
+    Функция кодирования столбца в бинарный формат COPY.
+    Каждое значение - длина int32 и байты значения, пропуск - длина -1 без байтов значения.
+    Возвращаемое значение:
+            (list): список байтовых строк.
+    """
+    null = struct.pack(">i", -1)
+    if udt_name in PG_BINARY_ARRAYS:
+        oid, fmt = PG_BINARY_ARRAYS[udt_name]
+        matrix = _stack_arrays(series)
+        if matrix is None:
+            return [null if value is None else _binary_field(pd.Series([value]), udt_name)[0] for value in series]
+        n_rows, dim = matrix.shape
+        item_size = np.dtype(fmt).itemsize
+        # заголовок массива: длина поля, размерность, флаг пропусков, OID элемента, длина, нижняя граница
+        header = np.empty((n_rows, 6), dtype=">i4")
+        header[:] = [20 + dim * (4 + item_size), 1, 0, oid, dim, 1]
+        items = np.empty((n_rows, dim), dtype=[("size", ">i4"), ("value", fmt)])
+        items["size"] = item_size
+        items["value"] = matrix
+        rows = np.concatenate([header.view(np.uint8), items.view(np.uint8).reshape(n_rows, -1)], axis=1)
+        return [row.tobytes() for row in rows]
+    mask = series.isna().to_numpy()
+    if udt_name in PG_BINARY_SCALARS:
+        fmt = PG_BINARY_SCALARS[udt_name]
+        items = np.empty(len(series), dtype=[("size", ">i4"), ("value", fmt)])
+        items["size"] = np.dtype(fmt).itemsize
+        items["value"] = series.fillna(0).to_numpy()
+        raw = items.tobytes()
+        step = items.dtype.itemsize
+        values = [raw[i:i + step] for i in range(0, len(raw), step)]
+    elif udt_name in PG_TEXT_TYPES:
+        values = []
+        for value in series.astype(object).where(~mask, "").astype(str):
+            value = value.encode("utf-8")
+            values.append(struct.pack(">i", len(value)) + value)
+    else:
+        raise ValueError(f"Тип {udt_name} не поддерживается бинарным форматом COPY, используйте method='copy'.")
+    for position in np.flatnonzero(mask):
+        values[position] = null
+    return values
+
+
+def _binary_copy_chunk(df, udt_names):
+    """
+    Функция кодирования части датафрейма в бинарный формат COPY (без заголовка и признака конца).
+    """
+    fields = [_binary_field(df[col], udt_name) for col, udt_name in zip(df.columns, udt_names)]
+    n_fields = struct.pack(">h", len(fields))
+    return b"".join(n_fields + b"".join(row) for row in zip(*fields))
+
+
+def _decode_arrays(values):
+    """
+    Функция сборки векторов, полученных psycopg2 списками, в матрицу float32.
+    Пустой вектор (NULL) заменяется нулями.
+    """
+    dim = next((len(value) for value in values if value is not None), 0)
+    return np.array([value if value is not None else [0.0] * dim for value in values], dtype=np.float32)
+
+
+def _decode_binary_arrays(values):
+    """
+    Функция декодирования векторов в бинарном формате массива Postgres (результат array_send).
+    Формат: заголовок из пяти int32 (размерность, флаг пропусков, OID элемента, длина,
+    нижняя граница), затем для каждого элемента длина int32 и значение float4 или float8.
+    Векторы одной длины декодируются одним вызовом np.frombuffer.
+    """
+    sizes = {len(value) for value in values if value is not None}
+    first = next((bytes(value) for value in values if value is not None), None)
+    if first is None:
+        return np.zeros((len(values), 0), dtype=np.float32)
+    ndim, _, oid, dim, _ = struct.unpack(">5i", first[:20])
+    # элементы NULL внутри массива не имеют значения, и шаг элементов перестает быть постоянным
+    has_null = any(bytes(value[4:8]) != b"\0\0\0\0" for value in values if value is not None)
+    if ndim != 1 or len(sizes) != 1 or has_null:
+        raise ValueError("Векторы должны быть одномерными массивами одной длины без пропусков.")
+    fmt = ">f4" if oid == 700 else ">f8"
+    item = np.dtype([("size", ">i4"), ("value", fmt)])
+    buffer = b"".join(bytes(value[20:]) if value is not None else b"\0" * (dim * item.itemsize) for value in values)
+    items = np.frombuffer(buffer, dtype=item).reshape(len(values), dim)
+    return items["value"].astype(np.float32)
+
 
 def addapt_numpy_float32(numpy_float32):
     """
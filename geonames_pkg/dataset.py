@@ -2,12 +2,18 @@
 import os
 import pandas as pd
 import numpy as np
+import csv
 import gc
-import torch
-from sentence_transformers import SentenceTransformer
+import hashlib
+import io
+import json
+import multiprocessing
+import shutil
+import time
+import zipfile
+from encoders import encoder_name, make_encoder
 
 RANDOM = 12345
-torch.manual_seed(RANDOM)
 np.random.seed(RANDOM)
 
 
@@ -19,8 +25,13 @@ class DatasetLoader:
 
     Методы класса:
         load_dataset: метод загрузчик датасета из файла txt или csv,
+        load_dataset_filtered: метод потоковой загрузки дампа txt или zip с фильтрами,
         load_city_embeddings: метод для создания датасета с векторами слов,
+        refresh_city_embeddings: метод для создания векторов только новых и измененных слов,
         save_dataset_to_file: сохраняет датасет в файл,
+        load_dataset_from_file: загружает сохраненный датасет с выбором столбцов и стран,
+        save_embedding_info: сохраняет описание векторов (кодировщик и размерность) рядом с датасетом,
+        load_embedding_info: загружает описание векторов,
         is_accessible (staticmethod): статический метод для проверки доступности файлов в режиме чтения.
     """
 
@@ -99,23 +110,161 @@ class DatasetLoader:
             # в случае отсутствия файла возврат ValueError
             raise ValueError(f"Файл {file} на найден в директории {self.work_dir}.")
 
+    @staticmethod
+    def select_batch_size(model=None, names=None, candidates=(8, 16, 32, 64, 128, 256), sample_size=512):
+        """
+        Статический метод select_batch_size класса DatasetLoader.
+        Подбор размера батча по скорости векторизации на выборке названий.
+        Выборка берется равномерно из отсортированного по длине списка, чтобы длины
+        названий были как во всем датасете. Перебор останавливается, когда скорость
+        падает или не хватает памяти акселератора.
+        Параметры:
+            model (Encoder): кодировщик названий (модуль encoders), по умолчанию равно None,
+            names (list): отсортированный по длине список названий, по умолчанию равно None,
+            candidates (tuple): размеры батча для проверки по возрастанию,
+                                по умолчанию равно (8, 16, 32, 64, 128, 256),
+            sample_size (int): размер выборки названий, по умолчанию равно 512.
+        Возвращаемое значение:
+            best_size (int): размер батча с наибольшей скоростью.
+        """
+        sample = names[::max(len(names) // sample_size, 1)][:sample_size]
+        # прогрев модели, первый вызов медленнее остальных
+        model.encode(texts=sample[:candidates[0]], batch_size=candidates[0])
+        best_size, best_speed = candidates[0], 0.0
+        for size in candidates:
+            try:
+                start = time.perf_counter()
+                model.encode(texts=sample, batch_size=size)
+                speed = len(sample) / (time.perf_counter() - start)
+            except RuntimeError:
+                # нехватка памяти GPU
+                break
+            print(f"Размер батча {size}: {speed:.1f} названий/с")
+            if speed <= best_speed:
+                break
+            best_size, best_speed = size, speed
+        return best_size
+
+    def load_dataset_filtered(
+            self,
+            file=None,
+            df_cols=None,
+            use_cols=None,
+            col_types=None,
+            countries=None,
+            feature_classes=None,
+            feature_codes=None,
+            min_population=None,
+            block_size=64 * 1024 ** 2,
+            processes=0,
+    ):
+        """
+        Метод load_dataset_filtered для потоковой загрузки больших дампов geonames
+        (например, allCountries.txt) с фильтрацией во время чтения.
+        Файл читается блоками по block_size байт, каждый блок разбирается и сразу
+        фильтруется, поэтому в памяти хранятся только подходящие строки. Архив zip
+        читается без распаковки на диск. Блоки можно разбирать в нескольких процессах.
+        Параметры:
+            file (str): файл txt или zip с данными для датасета, по умолчанию None,
+            df_cols (list): полный список с названиями колонок в датасете, по умолчанию равно None,
+            use_cols (list): список с названиями колонок, которые будут отображены в датасете,
+                             по умолчанию равно None,
+            col_types (dict): словарь с колонками и типами, например {"col_name": str},
+                              по умолчанию равно None,
+            countries (list): ISO коды стран (столбец country_code_iso), по умолчанию равно None - все,
+            feature_classes (list): классы объектов (столбец feature_class), например ['P'],
+                                    по умолчанию равно None - все,
+            feature_codes (list): коды объектов (столбец feature_code), например ['PPL', 'PPLA'],
+                                  по умолчанию равно None - все,
+            min_population (int): минимальное население (столбец population), по умолчанию равно None,
+            block_size (int): размер блока файла в байтах, по умолчанию равно 64 MB,
+            processes (int): количество процессов для разбора блоков, по умолчанию равно 0 -
+                             разбор в текущем процессе.
+        Возвращаемое значение:
+            dataset (pd. Dataframe): созданный датафрейм Pandas.
+        """
+        # проверка типа переменной file на строковое значение
+        if not isinstance(file, str) or len(file) == 0:
+            raise TypeError(
+                f"Не соответствует тип переменной file, должен быть тип str. Датасет не будет создан."
+            )
+        if not DatasetLoader.is_accessible(file, self.work_dir):
+            raise ValueError(f"Файл {file} на найден в директории {self.work_dir}.")
+        filters = {
+            "country_code_iso": countries,
+            "feature_class": feature_classes,
+            "feature_code": feature_codes,
+            "population": min_population,
+        }
+        filters = {col: value for col, value in filters.items() if value is not None}
+        use_cols = use_cols or df_cols
+        # столбцы для фильтров читаются, даже если их нет в use_cols
+        read_cols = list(use_cols) + [col for col in filters if col not in use_cols]
+        params = (df_cols, read_cols, col_types, filters, use_cols)
+        print(f"Создаем датасет из файла {file} с фильтрами {filters} ...")
+        path = os.path.join(self.work_dir, file)
+        parts = []
+        total = 0
+        with _open_dump(path) as fp:
+            blocks = _iter_blocks(fp, block_size)
+            if processes > 0:
+                with multiprocessing.Pool(processes) as pool:
+                    # в очереди не больше двух блоков на процесс, чтобы не читать весь файл в память
+                    pending = []
+                    for block in blocks:
+                        pending.append(pool.apply_async(_parse_block, (block, params)))
+                        if len(pending) >= 2 * processes:
+                            rows, part = pending.pop(0).get()
+                            total += rows
+                            parts.append(part)
+                    for result in pending:
+                        rows, part = result.get()
+                        total += rows
+                        parts.append(part)
+            else:
+                for block in blocks:
+                    rows, part = _parse_block(block, params)
+                    total += rows
+                    parts.append(part)
+        dataset = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=use_cols)
+        print(f"Датасет создан! Прочитано строк: {total}, оставлено: {len(dataset)}.")
+        return dataset
+
     def load_city_embeddings(
             self,
             device="cpu",
             model_id=None,
             batch_size=8,
             id_emb_col=None,
+            processes=0,
+            checkpoint_dir=None,
+            checkpoint_size=50000,
+            encoder="sentence_transformers",
+            encoder_params=None,
     ):
         """
         Метод load_city_embeddings для создания датасета и векторов слов из колонки датасета.
+        Названия сортируются по длине, поэтому в батч попадают названия близкой длины
+        и на выравнивание токенов тратится меньше вычислений. Векторизация идет частями
+        по checkpoint_size названий, и каждая часть сохраняется в checkpoint_dir: после
+        сбоя повторный запуск с теми же названиями и моделью продолжается с первой
+        несохраненной части.
         Параметры:
-            device (str): акселератор для создания векторов CPU или GPU, по умолчанию равно 'cpu',
+            device (str): акселератор для создания векторов 'cpu', 'cuda:0' или 'auto',
+                          по умолчанию равно 'cpu',
             model_id (str): имя модели для векторизации, по умолчанию равно None,
             batch_size (int): размер батча для создания векторов слов, по умолчанию равно 8,
+                              None - размер подбирается методом select_batch_size,
             id_emb_col (pd.Series или list): столбец с текстом для векторизации, по умолчанию равно None,
-            save_to_file (bool): флаг, указывающий, нужно ли сохранять датасет в файл, по умолчанию равно False,
-            file_name (str): имя файла для сохранения датасета, по умолчанию равно 'embeddings',
-            dir_to_save (str): директория для сохранения датасета.
+            processes (int): количество процессов для векторизации на CPU, по умолчанию равно 0 -
+                             векторизация в текущем процессе,
+            checkpoint_dir (str): директория для сохранения готовых частей, по умолчанию равно None -
+                                  части не сохраняются,
+            checkpoint_size (int): количество названий в одной части, по умолчанию равно 50000,
+            encoder (str или Encoder): тип кодировщика названий 'sentence_transformers', 'quantized' или
+                                       'hashing' (функция make_encoder модуля encoders) или готовый кодировщик,
+                                       по умолчанию равно 'sentence_transformers',
+            encoder_params (dict): параметры кодировщика, по умолчанию равно None.
         Возвращаемое значение:
             dataset (pd.Dataframe): созданный датафрейм Pandas.
         """
@@ -134,71 +283,375 @@ class DatasetLoader:
         else:
             # создаём пустой датасет
             dataset = pd.DataFrame()
-            # в список берем только уникальные названия городов
-            id_emb_col = list(set(id_emb_col))
+            # в список берем только уникальные названия городов, отсортированные по длине
+            id_emb_col = sorted(set(id_emb_col), key=lambda name: (len(name), name))
             # создаем столбец с названиями городов
             dataset["name"] = id_emb_col
             # загрузка модели для создания векторов
             print(f"Загружаем модель для создания эмбеддингов ...")
-            model = SentenceTransformer(model_id)
+            model = make_encoder(kind=encoder, model_id=model_id, device=device, **(encoder_params or {}))
+            if batch_size is None:
+                batch_size = DatasetLoader.select_batch_size(model=model, names=id_emb_col)
+            # пул процессов для векторизации на CPU, если кодировщик его поддерживает
+            pool = model.start_pool(processes=processes)
             # создание векторов
             print(
-                f"Создание эмбеддингов...  Размер батча --> {batch_size}, CPU или GPU --> {device} ..."
-            )
-            embeddings = model.encode(
-                id_emb_col, show_progress_bar=True, device=device, batch_size=batch_size
+                f"Создание эмбеддингов...  Размер батча --> {batch_size}, CPU или GPU --> {model.device}, "
+                f"процессов --> {processes if pool is not None else 1} ..."
             )
+            if checkpoint_dir is not None:
+                checkpoint_dir = _prepare_checkpoint(checkpoint_dir, model.name, id_emb_col, checkpoint_size)
+            start = time.perf_counter()
+            parts = []
+            try:
+                for number, first in enumerate(range(0, len(id_emb_col), checkpoint_size)):
+                    part_file = None if checkpoint_dir is None else os.path.join(
+                        checkpoint_dir, f"part_{number:05d}.npy"
+                    )
+                    if part_file is not None and os.path.exists(part_file):
+                        parts.append(np.load(part_file))
+                        start = time.perf_counter()
+                        continue
+                    names = id_emb_col[first:first + checkpoint_size]
+                    if pool is not None:
+                        part = model.encode_pool(texts=names, pool=pool, batch_size=batch_size)
+                    else:
+                        part = model.encode(texts=names, batch_size=batch_size, show_progress_bar=True)
+                    part = np.asarray(part, dtype=np.float32)
+                    if part_file is not None:
+                        # часть записывается во временный файл и переименовывается после записи
+                        np.save(part_file + ".tmp.npy", part)
+                        os.replace(part_file + ".tmp.npy", part_file)
+                    parts.append(part)
+                    done = first + len(names)
+                    print(f"Векторизовано {done} из {len(id_emb_col)}, "
+                          f"{len(names) / (time.perf_counter() - start):.1f} названий/с")
+                    start = time.perf_counter()
+            finally:
+                model.stop_pool(pool=pool)
+            embeddings = np.concatenate(parts)
             # добавление в датасет столбца с векторами слов
             dataset["embeddings"] = list(embeddings)
             print(f"Датасет создан!")
+            # все части собраны, контрольные точки больше не нужны
+            if checkpoint_dir is not None:
+                shutil.rmtree(checkpoint_dir, ignore_errors=True)
             # удаление переменных и очистка памяти CUDA
+            model.release()
             del model
             del embeddings
             del id_emb_col
             gc.collect()
-            torch.cuda.empty_cache()
-            torch.cuda.reset_peak_memory_stats()
             # возвращаемый датасет
             return dataset
 
-    def save_dataset_to_file(self, dataset=None, file_name=None, dir_to_save=None):
+    def refresh_city_embeddings(
+            self,
+            device="cpu",
+            model_id=None,
+            batch_size=8,
+            id_emb_col=None,
+            existing=None,
+            processes=0,
+            checkpoint_dir=None,
+            encoder="sentence_transformers",
+            encoder_params=None,
+            existing_info=None,
+    ):
+        """
+        Метод refresh_city_embeddings для инкрементального обновления векторов слов.
+        Названия из id_emb_col сравниваются с уже векторизованными названиями из existing,
+        векторы создаются только для новых названий и для названий с испорченным вектором
+        (пустой вектор или размерность, отличная от размерности остальных векторов).
+        Если векторы existing созданы другим кодировщиком или моделью (по описанию existing_info)
+        или описания нет, то векторизуются заново все названия.
+        Параметры:
+            device (str): акселератор для создания векторов CPU или GPU, по умолчанию равно 'cpu',
+            model_id (str): имя модели для векторизации, по умолчанию равно None,
+            batch_size (int): размер батча для создания векторов слов, по умолчанию равно 8,
+            id_emb_col (pd.Series или list): столбец с текстом для векторизации, по умолчанию равно None,
+            existing (pd.DataFrame): уже векторизованные названия со столбцом name и столбцом embeddings
+                                     или dim (размерность вектора), например, из таблицы embeddings
+                                     или сохраненного ранее датасета, по умолчанию равно None,
+            processes (int): количество процессов для векторизации на CPU, по умолчанию равно 0,
+            checkpoint_dir (str): директория для сохранения готовых частей, по умолчанию равно None,
+            encoder (str или Encoder): тип кодировщика названий или готовый кодировщик,
+                                       по умолчанию равно 'sentence_transformers',
+            encoder_params (dict): параметры кодировщика, по умолчанию равно None,
+            existing_info (dict): описание векторов existing (функция embedding_info модуля encoders),
+                                  по умолчанию равно None - описание неизвестно.
+        Возвращаемое значение:
+            dataset (pd.Dataframe): датафрейм с векторами новых и измененных названий,
+            orphans (list): названия, которых больше нет в id_emb_col, их векторы нужно удалить.
+        """
+        # проверка типа переменной id_emb_col на тип list или pd.Series
+        if not isinstance(id_emb_col, (list, pd.Series)):
+            raise TypeError(
+                f"Не соответствует тип переменной id_emb_col, должен быть тип list или pd.Series. Датасет не будет "
+                f"создан."
+            )
+        names = set(id_emb_col)
+        if existing is None or len(existing) == 0:
+            existing = pd.DataFrame({"name": [], "dim": []})
+        # размерность существующих векторов, пустой вектор имеет размерность 0
+        if "dim" in existing.columns:
+            dims = existing["dim"].fillna(0).astype(int)
+        else:
+            dims = existing["embeddings"].map(lambda x: 0 if x is None else len(x))
+        dim = dims[dims > 0].mode().iloc[0] if (dims > 0).any() else 0
+        valid = set(existing.loc[(dims == dim).to_numpy() & (dims > 0).to_numpy(), "name"])
+        # векторы другого кодировщика (или неизвестного) несовместимы с новыми, векторизуем все названия
+        current = encoder_name(encoder, model_id=model_id, **(encoder_params or {}))
+        if valid and (existing_info is None or existing_info.get("encoder_name") != current
+                      or existing_info.get("dim") not in (None, dim)):
+            print(f"Векторы созданы кодировщиком {(existing_info or {}).get('encoder_name')}, "
+                  f"текущий кодировщик {current}: векторизуем все названия заново.")
+            valid = set()
+        to_encode = sorted(names - valid)
+        orphans = sorted(set(existing["name"]) - names)
+        print(
+            f"Векторизованных названий: {len(valid)}, новых и измененных: {len(to_encode)}, "
+            f"удаленных: {len(orphans)}."
+        )
+        if not to_encode:
+            return pd.DataFrame({"name": [], "embeddings": []}), orphans
+        dataset = self.load_city_embeddings(
+            device=device, model_id=model_id, batch_size=batch_size, id_emb_col=to_encode,
+            processes=processes, checkpoint_dir=checkpoint_dir, encoder=encoder, encoder_params=encoder_params,
+        )
+        new_dim = len(dataset["embeddings"].iloc[0])
+        if valid and new_dim != dim:
+            raise ValueError(f"Размерность новых векторов {new_dim} не совпадает с размерностью сохраненных {dim}.")
+        return dataset, orphans
+
+    def save_dataset_to_file(self, dataset=None, file_name=None, dir_to_save=None, file_format="pickle",
+                             emb_col="embeddings", row_group_size=50000):
         """
         Метод save_dataset_to_file для сохранения датасета в файл на диске.
+        В формате 'parquet' датасет сохраняется в колоночном виде:
+         - <file_name>.parquet - столбцы датасета, датасет с городами сортируется по
+           country_code_iso, чтобы статистика групп строк позволяла читать только нужные страны,
+         - <file_name>.npy - матрица векторов float32 из столбца emb_col, если он есть,
+           которую можно отобразить в память без чтения.
         Параметры:
             dataset (pd.Dataframe): датафрейм Pandas для сохранения на диск.
             file_name (str): имя файла для сохранения датасета, по умолчанию равно'embeddings',
-            dir_to_save (str): директория для сохранения датасета.
+            dir_to_save (str): директория для сохранения датасета,
+            file_format (str): формат файла 'pickle' (zip) или 'parquet', по умолчанию равно 'pickle',
+            emb_col (str): наименование столбца с векторами, по умолчанию равно 'embeddings',
+            row_group_size (int): количество строк в группе строк parquet, по умолчанию равно 50000.
         Возвращаемое значение:
             Остсутствует.
         """
-        # сохраняем датасет в файл методом to_pickle с zip компрессией для оптимизации места на диске
         print(f"Сохраняем датасет в файл {file_name} ...")
-        dataset.to_pickle(os.path.join(dir_to_save, file_name), compression="zip")
+        if file_format == "pickle":
+            # сохраняем датасет в файл методом to_pickle с zip компрессией для оптимизации места на диске
+            dataset.to_pickle(os.path.join(dir_to_save, file_name), compression="zip")
+        elif file_format == "parquet":
+            if "country_code_iso" in dataset.columns:
+                dataset = dataset.sort_values("country_code_iso", kind="stable")
+            if emb_col in dataset.columns:
+                np.save(os.path.join(dir_to_save, file_name + ".npy"),
+                        np.array(list(dataset[emb_col]), dtype=np.float32))
+                dataset = dataset.drop(columns=[emb_col])
+            # float16 не поддерживается parquet, такие столбцы сохраняются как float32
+            dataset = dataset.astype({col: np.float32 for col in dataset.columns if dataset[col].dtype == np.float16})
+            dataset.to_parquet(os.path.join(dir_to_save, file_name + ".parquet"), index=False,
+                               row_group_size=row_group_size)
+        else:
+            raise ValueError(f"Неизвестный формат {file_format}, допустимые форматы: 'pickle', 'parquet'.")
+
+    def load_dataset_from_file(self, file_name=None, dir_to_load=None, columns=None, countries=None,
+                               emb_col="embeddings", mmap=True):
+        """
+        Метод load_dataset_from_file для загрузки датасета, сохраненного методом save_dataset_to_file.
+        Если есть файл <file_name>.parquet, то читаются только выбранные столбцы и группы строк
+        с выбранными странами, а матрица векторов отображается в память. Иначе загружается
+        файл pickle целиком и фильтруется после загрузки.
+        Параметры:
+            file_name (str): имя файла датасета, по умолчанию равно None,
+            dir_to_load (str): директория с датасетами, по умолчанию равно None,
+            columns (list): список загружаемых столбцов, по умолчанию равно None - все столбцы,
+            countries (list): список ISO кодов стран для фильтра по столбцу country_code_iso,
+                              по умолчанию равно None - без фильтра,
+            emb_col (str): наименование столбца с векторами, по умолчанию равно 'embeddings',
+            mmap (bool): флаг отображения матрицы векторов в память, по умолчанию равно True.
+        Возвращаемое значение:
+            dataset (pd.Dataframe): загруженный датафрейм, в столбце emb_col - строки матрицы векторов.
+        """
+        path = os.path.join(dir_to_load, file_name)
+        filters = None if countries is None else [("country_code_iso", "in", list(countries))]
+        if not os.path.exists(path + ".parquet"):
+            dataset = pd.read_pickle(path, compression="zip")
+            if filters is not None:
+                dataset = dataset[dataset["country_code_iso"].isin(countries)]
+            return dataset if columns is None else dataset[columns]
+        read_emb = os.path.exists(path + ".npy") and (columns is None or emb_col in columns)
+        meta_cols = None if columns is None else [col for col in columns if col != emb_col]
+        dataset = pd.read_parquet(path + ".parquet", columns=meta_cols, filters=filters)
+        if read_emb:
+            # np.asarray убирает подкласс np.memmap, строки матрицы - обычные представления без копирования
+            embeddings = np.asarray(np.load(path + ".npy", mmap_mode="r" if mmap else None))
+            if filters is not None:
+                # строки parquet и матрицы векторов хранятся в одном порядке: номера строк выбранных стран
+                # находятся по одному столбцу country_code_iso, из матрицы читаются только эти строки
+                codes = pd.read_parquet(path + ".parquet", columns=["country_code_iso"])["country_code_iso"]
+                embeddings = embeddings[np.flatnonzero(codes.isin(list(countries)).to_numpy())]
+            dataset[emb_col] = list(embeddings)
+        return dataset
 
+    def save_embedding_info(self, info=None, file_name=None, dir_to_save=None):
+        """
+        Метод save_embedding_info для сохранения описания векторов в файл <file_name>.info.json
+        рядом с датасетом векторов.
+        Параметры:
+            info (dict): описание векторов (функция embedding_info модуля encoders), по умолчанию равно None,
+            file_name (str): имя файла датасета векторов, по умолчанию равно None,
+            dir_to_save (str): директория с датасетами, по умолчанию равно None.
+        """
+        path = os.path.join(dir_to_save, file_name + ".info.json")
+        with open(path + ".tmp", "w") as fp:
+            json.dump(info, fp, ensure_ascii=False, indent=2)
+        os.replace(path + ".tmp", path)
 
-def reduce_mem_usage(df):
+    def load_embedding_info(self, file_name=None, dir_to_load=None):
+        """
+        Метод load_embedding_info для загрузки описания векторов, сохраненного методом save_embedding_info.
+        Параметры:
+            file_name (str): имя файла датасета векторов, по умолчанию равно None,
+            dir_to_load (str): директория с датасетами, по умолчанию равно None.
+        Возвращаемое значение:
+            info (dict): описание векторов или None, если описания нет.
+        """
+        path = os.path.join(dir_to_load, file_name + ".info.json")
+        if not os.path.exists(path):
+            return None
+        with open(path) as fp:
+            return json.load(fp)
+
+def _open_dump(path=None):
     """
-    Функция перебирает все столбцы датафрейма и изменяеет тип данных, чтобы
-    уменьшить использование памяти
+    Функция открытия дампа geonames в бинарном режиме: файл txt открывается напрямую,
+    из архива zip читается файл txt с тем же именем или первый файл txt архива.
     Параметр:
-            df (pd.Dataframe): исходный датасет.
+            path (str): путь к файлу txt или zip.
+    Возвращаемое значение:
+            файловый объект для чтения.
+    """
+    if not path.lower().endswith(".zip"):
+        return open(path, "rb")
+    archive = zipfile.ZipFile(path)
+    members = [name for name in archive.namelist() if name.lower().endswith(".txt")]
+    expected = os.path.splitext(os.path.basename(path))[0] + ".txt"
+    member = expected if expected in members else members[0]
+    return archive.open(member)
+
+
+def _iter_blocks(fp=None, block_size=64 * 1024 ** 2):
+    """
+    Функция чтения файла блоками примерно по block_size байт, каждый блок заканчивается
+    концом строки, поэтому блоки разбираются независимо.
+    """
+    while True:
+        block = fp.read(block_size)
+        if not block:
+            break
+        block += fp.readline()
+        yield block
+
+
+def _parse_block(block=None, params=None):
+    """
+    Функция разбора блока дампа geonames и фильтрации строк.
+    Вызывается в текущем процессе или в процессах пула, поэтому находится на уровне модуля.
+    Параметры:
+            block (bytes): блок файла из целых строк,
+            params (tuple): столбцы файла, читаемые столбцы, типы, фильтры и выводимые столбцы.
+    Возвращаемое значение:
+            (int, pd.DataFrame): количество строк в блоке и отфильтрованный датафрейм.
+    """
+    df_cols, read_cols, col_types, filters, use_cols = params
+    # в названиях geonames встречаются кавычки, поэтому кавычки не обрабатываются
+    part = pd.read_csv(io.BytesIO(block), header=None, names=df_cols, usecols=read_cols, dtype=col_types,
+                       delimiter="\t", quoting=csv.QUOTE_NONE, low_memory=False)
+    rows = len(part)
+    mask = np.ones(rows, dtype=bool)
+    for col, value in filters.items():
+        if col == "population":
+            mask &= (part[col] >= value).to_numpy()
+        else:
+            mask &= part[col].isin(value).to_numpy()
+    return rows, part.loc[mask, use_cols].reset_index(drop=True)
+
+
+def _prepare_checkpoint(checkpoint_dir=None, model_id=None, names=None, checkpoint_size=50000):
+    """
+    Функция подготовки директории контрольных точек векторизации.
+    В файле manifest.json хранятся модель, размер части и хэш списка названий:
+    если они не совпадают с текущим запуском, сохраненные части удаляются.
+    Параметры:
+            checkpoint_dir (str): директория контрольных точек, по умолчанию равно None,
+            model_id (str): имя модели для векторизации, по умолчанию равно None,
+            names (list): отсортированный список названий, по умолчанию равно None,
+            checkpoint_size (int): количество названий в одной части, по умолчанию равно 50000.
+    Возвращаемое значение:
+            checkpoint_dir (str): директория контрольных точек.
+    """
+    manifest = {
+        "model_id": model_id,
+        "checkpoint_size": checkpoint_size,
+        "names": hashlib.sha1("\n".join(names).encode("utf-8")).hexdigest(),
+    }
+    manifest_file = os.path.join(checkpoint_dir, "manifest.json")
+    if os.path.exists(manifest_file):
+        with open(manifest_file) as fp:
+            if json.load(fp) == manifest:
+                print(f"Продолжаем векторизацию с контрольной точки в {checkpoint_dir} ...")
+                return checkpoint_dir
+    shutil.rmtree(checkpoint_dir, ignore_errors=True)
+    os.makedirs(checkpoint_dir)
+    with open(manifest_file, "w") as fp:
+        json.dump(manifest, fp)
+    return checkpoint_dir
+
+
+def reduce_mem_usage(df, category_ratio=0.1, float32_cols=("latitude", "longitude"), arrow_strings=False):
+    """
+    Функция перебирает все столбцы датафрейма и изменяеет тип данных, чтобы
+    уменьшить использование памяти:
+     - целые и дробные числа приводятся к наименьшему подходящему типу, столбцы из
+       float32_cols (координаты) не опускаются ниже float32, т.к. в float16 теряется около 1 км,
+     - строковые столбцы с долей уникальных значений не больше category_ratio
+       (коды стран, часовые пояса, классы и коды объектов) становятся category,
+     - остальные строковые столбцы (например, alternatenames) хранятся строками Arrow,
+       если arrow_strings=True, иначе как object.
+    Для каждого столбца выводится тип и занимаемая память до и после обработки.
+    Параметры:
+            df (pd.Dataframe): исходный датасет,
+            category_ratio (float): максимальная доля уникальных значений для типа category,
+                                    по умолчанию равно 0.1,
+            float32_cols (tuple): столбцы, которые хранятся не менее чем в float32,
+                                  по умолчанию равно ('latitude', 'longitude'),
+            arrow_strings (bool): флаг хранения строк с большим количеством уникальных значений
+                                  в типе string[pyarrow], по умолчанию равно False.
     Возвращаемое значение:
             df (pd.Dataframe): оптимизированный датасет.
     """
-    start_mem = df.memory_usage().sum() / 1024 ** 2
+    # deep=True учитывает память строк, а не только указателей на объекты
+    start_usage = df.memory_usage(deep=True, index=False)
+    start_types = df.dtypes.astype(str)
+    start_mem = start_usage.sum() / 1024 ** 2
     print('Память занимаемая датасетом в ОП до обработки: {:.4f} MB'.format(start_mem))
 
     for col in df.columns:
         col_type = df[col].dtype
 
-        if (
-                col_type != object
-                and col_type.name != "category"
-                and "datetime" not in col_type.name
-        ):
+        if pd.api.types.is_bool_dtype(col_type) or "datetime" in col_type.name:
+            continue
+        if pd.api.types.is_integer_dtype(col_type) or pd.api.types.is_float_dtype(col_type):
             c_min = df[col].min()
             c_max = df[col].max()
-            if str(col_type)[:3] == "int":
+            if pd.api.types.is_integer_dtype(col_type):
                 if c_min > np.iinfo(np.int8).min and c_max < np.iinfo(np.int8).max:
                     df[col] = df[col].astype(np.int8)
                 elif c_min > np.iinfo(np.int16).min and c_max < np.iinfo(np.int16).max:
@@ -209,7 +662,8 @@ def reduce_mem_usage(df):
                     df[col] = df[col].astype(np.int64)
             else:
                 if (
-                        c_min > np.finfo(np.float16).min
+                        col not in float32_cols
+                        and c_min > np.finfo(np.float16).min
                         and c_max < np.finfo(np.float16).max
                 ):
                     df[col] = df[col].astype(np.float16)
@@ -220,10 +674,21 @@ def reduce_mem_usage(df):
                     df[col] = df[col].astype(np.float32)
                 else:
                     df[col] = df[col].astype(np.float64)
-        elif "datetime" not in col_type.name:
-            df[col] = df[col].astype("object")
+        elif col_type.name != "category":
+            n_values = df[col].count()
+            if n_values and df[col].nunique() / n_values <= category_ratio:
+                df[col] = df[col].astype("category")
+            elif arrow_strings:
+                df[col] = df[col].astype("string[pyarrow]")
+            else:
+                df[col] = df[col].astype("object")
 
-    end_mem = df.memory_usage().sum() / 1024 ** 2
+    end_usage = df.memory_usage(deep=True, index=False)
+    for col in df.columns:
+        print('  {:<20} {:>10} -> {:<16} {:10.4f} MB -> {:10.4f} MB'.format(
+            col, start_types[col], str(df[col].dtype), start_usage[col] / 1024 ** 2, end_usage[col] / 1024 ** 2
+        ))
+    end_mem = end_usage.sum() / 1024 ** 2
     print('Память занимаемая датасетом в ОП после обработки: {:.4f} MB'.format(end_mem))
     print('Экономия {:.2f}%'.format(100 * (start_mem - end_mem) / start_mem))
 
@@ -250,10 +715,11 @@ def preprocess_data(dataset=None, city_or_country=None):
         dataset["alternatenames"] = dataset["alternatenames"].str.replace(",", ", ")
         # удаляем строки с попусками в стобцах admin_1_code, name, country_code_iso
         dataset = dataset.dropna(subset=["admin_1_code", "name", "country_code_iso"])
-        # создаём новый столбец admin_code в виде суммы через точку столбцов country_code_iso и admin_1_code
-        dataset.loc[:, "admin_code"] = (
-                dataset["country_code_iso"] + "." + dataset["admin_1_code"]
-        )
+        # создаём новый столбец admin_code в виде суммы через точку столбцов country_code_iso и admin_1_code,
+        # столбцы приводятся к строкам, т.к. после reduce_mem_usage они могут иметь тип category
+        dataset["admin_code"] = (
+                dataset["country_code_iso"].astype(str) + "." + dataset["admin_1_code"].astype(str)
+        ).astype("category")
         # удаляем столбец admin_1_code
         dataset = dataset.drop(["admin_1_code"], axis=1)
         # заполняем пропуски в столбце asciiname на основе столбца names
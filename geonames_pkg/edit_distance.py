@@ -0,0 +1,193 @@
+# файл с функциями расстояния редактирования между названием и списком кандидатов
+# базовые импорты
+import numpy as np
+
+# rapidfuzz - необязательная зависимость, без нее расстояние считается битово-параллельным алгоритмом на numpy
+try:
+    from rapidfuzz import process as rapidfuzz_process
+    from rapidfuzz.distance import OSA as rapidfuzz_osa
+except ImportError:
+    rapidfuzz_process = None
+    rapidfuzz_osa = None
+
+# максимальная длина названия для битово-параллельного алгоритма (одно 64-битное слово)
+WORD_BITS = 64
+
+
+def to_codes(strings=None):
+    """
+    Функция перевода списка строк в матрицу кодов символов через массив строк фиксированной длины.
+    Параметр:
+            strings (list): список строк, по умолчанию равно None.
+    Возвращаемое значение:
+            codes (np.ndarray): коды символов uint32 размером (длина самой длинной строки, количество строк),
+                                позиции после конца строки заполнены 0,
+            lengths (np.ndarray): длины строк.
+    """
+    if len(strings) == 0:
+        return np.zeros((0, 0), dtype=np.uint32), np.zeros(0, dtype=np.int64)
+    values = np.array(strings, dtype=str)
+    lengths = np.char.str_len(values).astype(np.int64)
+    width = values.dtype.itemsize // 4
+    codes = values.view(np.uint32).reshape(len(strings), width)
+    return codes.T, lengths
+
+
+def osa_distance(query=None, candidates=None, max_distance=None):
+    """
+    Функция расчета расстояния Дамерау-Левенштейна (optimal string alignment: вставка, удаление,
+    замена и перестановка соседних символов) между названием и всеми кандидатами сразу.
+    Используется битово-параллельный алгоритм Hyyrö: столбец матрицы расстояний каждого кандидата
+    хранится битами одного 64-битного числа, состояния всех кандидатов обновляются одной
+    операцией numpy, поэтому цикл идет только по символам названия.
+    Расстояние для кандидатов длиннее 64 символов считается построчно функцией _osa_distance_rows.
+    Параметры:
+            query (str): название, по умолчанию равно None,
+            candidates (list): список кандидатов, по умолчанию равно None,
+            max_distance (int): порог расстояния: кандидаты, длина которых отличается от длины названия
+                                больше порога, не проверяются, по умолчанию равно None - без порога.
+    Возвращаемое значение:
+            (np.ndarray): расстояния до кандидатов, с порогом - не больше max_distance + 1.
+    """
+    if max_distance is not None:
+        distances = np.full(len(candidates), max_distance + 1, dtype=np.int64)
+        near = [pos for pos, candidate in enumerate(candidates) if abs(len(candidate) - len(query)) <= max_distance]
+        if near:
+            found = osa_distance(query=query, candidates=[candidates[pos] for pos in near])
+            distances[near] = np.minimum(found, max_distance + 1)
+        return distances
+    codes, lengths = to_codes(candidates)
+    size = len(query)
+    if size == 0 or len(candidates) == 0:
+        return lengths
+    # расстояние симметрично, поэтому битовый шаблон строится по кандидату, а перебираются символы названия
+    short = lengths <= WORD_BITS
+    chars, slots = np.unique(np.array([ord(char) for char in query], dtype=np.uint32), return_inverse=True)
+    # битовые маски позиций каждого символа названия в каждом кандидате: (символ, кандидат)
+    packed = np.packbits(codes[:WORD_BITS][None, :, :] == chars[:, None, None], axis=1, bitorder="little")
+    buffer = np.zeros((len(chars), len(candidates), WORD_BITS // 8), dtype=np.uint8)
+    buffer[:, :, :packed.shape[1]] = packed.transpose(0, 2, 1)
+    peq = buffer.view("<u8")[:, :, 0].astype(np.uint64)
+    one = np.uint64(1)
+    width = np.maximum(np.minimum(lengths, WORD_BITS), 1).astype(np.uint64)
+    vp = np.full(len(candidates), 2 ** WORD_BITS - 1, dtype=np.uint64) >> (np.uint64(WORD_BITS) - width)
+    vn = np.zeros(len(candidates), dtype=np.uint64)
+    d0 = np.zeros(len(candidates), dtype=np.uint64)
+    tmp = np.empty(len(candidates), dtype=np.uint64)
+    pm_prev = vn.copy()
+    # горизонтальные разности по символам названия, расстояние считается по ним после цикла
+    hp_all = np.empty((size, len(candidates)), dtype=np.uint64)
+    hn_all = np.empty((size, len(candidates)), dtype=np.uint64)
+    # операции выполняются на месте, чтобы не создавать временные массивы
+    for pos, slot in enumerate(slots):
+        pm, hp, hn = peq[slot], hp_all[pos], hn_all[pos]
+        # перестановка соседних символов (по значению d0 с предыдущего символа)
+        np.invert(d0, out=tmp)
+        tmp &= pm
+        tmp <<= one
+        tmp &= pm_prev
+        np.bitwise_and(pm, vp, out=d0)
+        d0 += vp
+        d0 ^= vp
+        d0 |= pm
+        d0 |= vn
+        d0 |= tmp
+        np.bitwise_or(d0, vp, out=hp)
+        np.invert(hp, out=hp)
+        hp |= vn
+        np.bitwise_and(d0, vp, out=hn)
+        np.left_shift(hp, one, out=tmp)
+        tmp |= one
+        np.bitwise_and(tmp, d0, out=vn)
+        np.bitwise_or(d0, tmp, out=vp)
+        np.invert(vp, out=vp)
+        np.left_shift(hn, one, out=tmp)
+        vp |= tmp
+        pm_prev = pm
+    # изменение расстояния - старший бит шаблона кандидата в разностях
+    last = one << (width - one)
+    distances = (lengths + np.count_nonzero(hp_all & last, axis=0) - np.count_nonzero(hn_all & last, axis=0))
+    distances[lengths == 0] = size
+    if not short.all():
+        distances[~short] = _osa_distance_rows(query, codes[:, ~short], lengths[~short])
+    return distances
+
+
+def _osa_distance_rows(query, codes, lengths):
+    """
+    Функция построчного расчета матрицы расстояний optimal string alignment для длинных названий,
+    строки матрицы всех кандидатов считаются одной операцией numpy.
+    Параметры:
+            query (str): название,
+            codes (np.ndarray): коды символов кандидатов, результат to_codes,
+            lengths (np.ndarray): длины кандидатов.
+    Возвращаемое значение:
+            (np.ndarray): расстояния до кандидатов.
+    """
+    width, count = codes.shape
+    query_codes = [ord(char) for char in query]
+    codes = codes.astype(np.int64)
+    prev_prev = None
+    prev = np.broadcast_to(np.arange(width + 1)[:, None], (width + 1, count)).copy()
+    for i, char in enumerate(query_codes, start=1):
+        cost = (codes != char).astype(np.int64)
+        row = np.empty_like(prev)
+        row[0] = i
+        for j in range(1, width + 1):
+            row[j] = np.minimum(np.minimum(prev[j] + 1, row[j - 1] + 1), prev[j - 1] + cost[j - 1])
+            if prev_prev is not None and j > 1:
+                swap = (codes[j - 1] == query_codes[i - 2]) & (codes[j - 2] == char)
+                row[j] = np.where(swap, np.minimum(row[j], prev_prev[j - 2] + 1), row[j])
+        prev_prev, prev = prev, row
+    return prev[lengths, np.arange(count)]
+
+
+def similarity(query=None, candidates=None, backend="auto"):
+    """
+    Функция нормализованного сходства названия с кандидатами: 1 - расстояние / длина более длинной строки.
+    Параметры:
+            query (str): название, по умолчанию равно None,
+            candidates (list): список кандидатов, по умолчанию равно None,
+            backend (str): способ расчета расстояния:
+                           - 'numpy' - битово-параллельный алгоритм osa_distance,
+                           - 'rapidfuzz' - функция cdist пакета rapidfuzz,
+                           - 'auto' - rapidfuzz, если пакет установлен, иначе numpy,
+                           по умолчанию равно 'auto'.
+    Возвращаемое значение:
+            (np.ndarray): сходство float32 от 0 до 1.
+    """
+    candidates = list(candidates)
+    if backend == "auto":
+        backend = "rapidfuzz" if rapidfuzz_process is not None else "numpy"
+    if backend == "rapidfuzz":
+        if rapidfuzz_process is None:
+            raise ImportError("Для backend='rapidfuzz' нужен пакет rapidfuzz.")
+        distances = rapidfuzz_process.cdist([query], candidates, scorer=rapidfuzz_osa.distance, dtype=np.int32)[0]
+    elif backend == "numpy":
+        distances = osa_distance(query=query, candidates=candidates)
+    else:
+        raise ValueError(f"Неизвестный backend={backend}, допустимые значения: 'numpy', 'rapidfuzz', 'auto'.")
+    lengths = np.fromiter((len(value) for value in candidates), dtype=np.int64, count=len(candidates))
+    longest = np.maximum(np.maximum(lengths, len(query)), 1)
+    return (1 - distances / longest).astype(np.float32)
+
+
+def rerank(query=None, candidates=None, scores=None, weight=1.0, backend="auto"):
+    """
+    Функция переупорядочивания кандидатов по итоговой оценке
+    (1 - weight) * scores + weight * сходство по расстоянию редактирования.
+    Параметры:
+            query (str): название, по умолчанию равно None,
+            candidates (list): список кандидатов, по умолчанию равно None,
+            scores (np.ndarray): исходные оценки кандидатов, по умолчанию равно None - только сходство,
+            weight (float): вес сходства по расстоянию редактирования, по умолчанию равно 1.0,
+            backend (str): способ расчета расстояния 'numpy', 'rapidfuzz' или 'auto', по умолчанию равно 'auto'.
+    Возвращаемое значение:
+            order (np.ndarray): позиции кандидатов по убыванию итоговой оценки,
+            scores (np.ndarray): итоговые оценки в порядке order.
+    """
+    fused = weight * similarity(query=query, candidates=candidates, backend=backend)
+    if scores is not None:
+        fused += (1 - weight) * np.asarray(scores, dtype=np.float32)
+    order = np.argsort(-fused, kind="stable")
+    return order, fused[order]
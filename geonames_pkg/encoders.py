@@ -0,0 +1,274 @@
+# файл с классами векторизации названий городов
+# базовые импорты
+import numpy as np
+
+RANDOM = 12345
+
+
+def default_device():
+    """
+    Функция выбора акселератора для модели: GPU, если torch установлен и видит CUDA, иначе CPU.
+    torch импортируется только при вызове, поэтому модуль можно использовать без него.
+    Возвращаемое значение:
+            (str): 'cuda:0' или 'cpu'.
+    """
+    try:
+        import torch
+    except ImportError:
+        return "cpu"
+    return "cuda:0" if torch.cuda.is_available() else "cpu"
+
+
+class Encoder:
+    """
+    Базовый класс Encoder - интерфейс векторизации названий городов для FindCity и DatasetLoader.
+    Наследники реализуют метод encode, остальные методы имеют реализации по умолчанию.
+    Атрибут name - идентификатор векторов: векторы городов и запросов должны быть созданы
+    кодировщиками с одинаковым name. Атрибут dim - размерность векторов, None - неизвестна.
+    """
+
+    name = None
+    dim = None
+    device = "cpu"
+
+    def encode(self, texts=None, batch_size=64, show_progress_bar=False):
+        """
+        Метод encode класса Encoder.
+        Векторизация списка названий.
+
+         Параметры:
+              texts (list): список названий, по умолчанию равно None,
+              batch_size (int): размер батча, по умолчанию равно 64,
+              show_progress_bar (bool): флаг вывода прогресса, по умолчанию равно False.
+         Возвращаемое значение:
+              (np.ndarray): матрица векторов float32 размером (количество названий, размерность).
+        """
+        raise NotImplementedError
+
+    def start_pool(self, processes=0):
+        """
+        Метод start_pool класса Encoder.
+        Запуск пула процессов для векторизации на CPU, по умолчанию пул не поддерживается.
+
+         Параметры:
+              processes (int): количество процессов, по умолчанию равно 0.
+         Возвращаемое значение:
+              pool: пул процессов или None, если векторизация идет в текущем процессе.
+        """
+        return None
+
+    def encode_pool(self, texts=None, pool=None, batch_size=64):
+        """
+        Метод encode_pool класса Encoder.
+        Векторизация списка названий в пуле процессов, запущенном методом start_pool.
+        """
+        return self.encode(texts=texts, batch_size=batch_size)
+
+    def stop_pool(self, pool=None):
+        """
+        Метод stop_pool класса Encoder.
+        Остановка пула процессов, запущенного методом start_pool.
+        """
+
+    def release(self):
+        """
+        Метод release класса Encoder.
+        Освобождение памяти акселератора после векторизации.
+        """
+
+
+class SentenceTransformerEncoder(Encoder):
+    """
+    Класс SentenceTransformerEncoder - векторизация моделью sentence-transformers (например, LaBSE).
+    torch и sentence_transformers импортируются при создании объекта.
+    """
+
+    def __init__(self, model_id=None, device="auto"):
+        """
+        Инициализация объекта класса SentenceTransformerEncoder.
+
+         Параметры:
+              model_id (str): имя модели или путь к локально сохраненной модели, по умолчанию равно None,
+              device (str): акселератор 'cpu', 'cuda:0' или 'auto' - выбирается функцией default_device,
+                            по умолчанию равно 'auto'.
+        """
+        import torch
+        from sentence_transformers import SentenceTransformer
+        torch.manual_seed(RANDOM)
+        self.name = model_id
+        self.device = default_device() if device in (None, "auto") else str(device)
+        self.model = SentenceTransformer(model_id, device=self.device)
+        self.dim = self.model.get_sentence_embedding_dimension()
+
+    def encode(self, texts=None, batch_size=64, show_progress_bar=False):
+        vectors = self.model.encode(list(texts), device=self.device, batch_size=batch_size,
+                                    show_progress_bar=show_progress_bar)
+        return np.asarray(vectors, dtype=np.float32)
+
+    def start_pool(self, processes=0):
+        return self.model.start_multi_process_pool(target_devices=["cpu"] * processes) if processes > 0 else None
+
+    def encode_pool(self, texts=None, pool=None, batch_size=64):
+        if pool is None:
+            return self.encode(texts=texts, batch_size=batch_size)
+        return np.asarray(self.model.encode_multi_process(list(texts), pool, batch_size=batch_size), dtype=np.float32)
+
+    def stop_pool(self, pool=None):
+        if pool is not None:
+            self.model.stop_multi_process_pool(pool)
+
+    def release(self):
+        import torch
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+            torch.cuda.reset_peak_memory_stats()
+
+
+class QuantizedEncoder(SentenceTransformerEncoder):
+    """
+    Класс QuantizedEncoder - модель sentence-transformers на CPU с динамическим квантованием
+    линейных слоев в int8 (torch.quantization.quantize_dynamic). Веса линейных слоев занимают
+    в 4 раза меньше памяти, векторизация на CPU быстрее, а векторы близки к векторам исходной
+    модели, поэтому name совпадает с model_id и готовые векторы городов используются без пересчета.
+    """
+
+    def __init__(self, model_id=None, device="cpu"):
+        """
+        Инициализация объекта класса QuantizedEncoder.
+
+         Параметры:
+              model_id (str): имя модели или путь к локально сохраненной модели, по умолчанию равно None,
+              device (str): акселератор, поддерживается только 'cpu', по умолчанию равно 'cpu'.
+        """
+        if device not in (None, "auto", "cpu"):
+            raise ValueError(f"Квантованная модель работает только на CPU, указан device={device}.")
+        super().__init__(model_id=model_id, device="cpu")
+        import torch
+        self.model = torch.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
+
+    def start_pool(self, processes=0):
+        # квантованная модель не передается в процессы пула sentence-transformers
+        return None
+
+
+class HashingEncoder(Encoder):
+    """
+    Класс HashingEncoder - векторизация без нейросетевой модели: символьные n-граммы названия
+    (в исходном виде и в транслитерации) хэшируются в вектор фиксированной размерности
+    (sklearn HashingVectorizer). Нужны только numpy, scikit-learn и transliterate, запуск
+    занимает доли секунды, поэтому кодировщик подходит для окружений без torch и GPU.
+    Векторы несовместимы с векторами моделей, датасет векторов создается этим же кодировщиком.
+    """
+
+    def __init__(self, n_features=1024, ngram_range=(2, 3), transliterate=True):
+        """
+        Инициализация объекта класса HashingEncoder.
+
+         Параметры:
+              n_features (int): размерность векторов, по умолчанию равно 1024,
+              ngram_range (tuple): минимальная и максимальная длина n-грамм, по умолчанию равно (2, 3),
+              transliterate (bool): флаг добавления n-грамм транслитерации кириллицы в латиницу,
+                                    по умолчанию равно True.
+        """
+        from sklearn.feature_extraction.text import HashingVectorizer
+        self.name = HashingEncoder.make_name(n_features=n_features, ngram_range=ngram_range, transliterate=transliterate)
+        self.dim = n_features
+        self.transliterate = transliterate
+        self.vectorizer = HashingVectorizer(analyzer="char_wb", ngram_range=tuple(ngram_range), n_features=n_features,
+                                            alternate_sign=False, norm="l2", dtype=np.float32)
+
+    @staticmethod
+    def make_name(n_features=1024, ngram_range=(2, 3), transliterate=True):
+        """
+        Статический метод make_name класса HashingEncoder.
+        Идентификатор векторов кодировщика с заданными параметрами без создания объекта.
+
+         Параметры:
+              n_features (int): размерность векторов, по умолчанию равно 1024,
+              ngram_range (tuple): минимальная и максимальная длина n-грамм, по умолчанию равно (2, 3),
+              transliterate (bool): флаг добавления n-грамм транслитерации, по умолчанию равно True.
+         Возвращаемое значение:
+              (str): идентификатор векторов.
+        """
+        return f"hashing-char-{ngram_range[0]}-{ngram_range[1]}-{n_features}" + ("-translit" if transliterate else "")
+
+    def encode(self, texts=None, batch_size=64, show_progress_bar=False):
+        texts = [str(text).lower() for text in texts]
+        if self.transliterate:
+            from transliterate import translit
+            # n-граммы названия и его латинской транслитерации в одном документе
+            texts = [f"{text} {translit(text, 'ru', reversed=True)}" for text in texts]
+        vectors = self.vectorizer.transform(texts).toarray()
+        # нормализация после объединения, чтобы косинусное сходство считалось скалярным произведением
+        return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+def make_encoder(kind="sentence_transformers", model_id=None, device="auto", **params):
+    """
+    Функция создания кодировщика названий по типу.
+    Параметры:
+            kind (str): тип кодировщика:
+                        - 'sentence_transformers' - модель sentence-transformers,
+                        - 'quantized' - модель sentence-transformers с квантованием int8 на CPU,
+                        - 'hashing' - хэширование символьных n-грамм без torch,
+                        по умолчанию равно 'sentence_transformers',
+            model_id (str): имя модели или путь к модели, по умолчанию равно None,
+            device (str): акселератор 'cpu', 'cuda:0' или 'auto', по умолчанию равно 'auto',
+            **params: параметры кодировщика, например n_features для 'hashing'.
+    Возвращаемое значение:
+            (Encoder): объект кодировщика.
+    """
+    if isinstance(kind, Encoder):
+        return kind
+    if kind == "sentence_transformers":
+        return SentenceTransformerEncoder(model_id=model_id, device=device, **params)
+    if kind == "quantized":
+        return QuantizedEncoder(model_id=model_id, device=device, **params)
+    if kind == "hashing":
+        return HashingEncoder(**params)
+    raise ValueError(f"Неизвестный тип кодировщика {kind}, допустимые значения: "
+                     f"'sentence_transformers', 'quantized', 'hashing'.")
+
+
+def encoder_name(kind="sentence_transformers", model_id=None, **params):
+    """
+    Функция получения идентификатора векторов (атрибут name) кодировщика без загрузки модели.
+    Векторы, созданные кодировщиками с разными идентификаторами, несовместимы.
+    Параметры:
+            kind (str или Encoder): тип кодировщика 'sentence_transformers', 'quantized', 'hashing'
+                                    или готовый кодировщик, по умолчанию равно 'sentence_transformers',
+            model_id (str): имя модели или путь к модели, по умолчанию равно None,
+            **params: параметры кодировщика, например n_features для 'hashing'.
+    Возвращаемое значение:
+            (str): идентификатор векторов.
+    """
+    if isinstance(kind, Encoder):
+        return kind.name
+    if kind in ("sentence_transformers", "quantized"):
+        # квантованная модель создает векторы, совместимые с векторами исходной модели
+        return model_id
+    if kind == "hashing":
+        return HashingEncoder.make_name(**params)
+    raise ValueError(f"Неизвестный тип кодировщика {kind}, допустимые значения: "
+                     f"'sentence_transformers', 'quantized', 'hashing'.")
+
+
+def embedding_info(kind="sentence_transformers", model_id=None, dim=None, **params):
+    """
+    Функция формирования описания векторов, которое сохраняется рядом с ними: тип и идентификатор
+    кодировщика, модель и размерность. По описанию проверяется, что векторы можно дополнять
+    и использовать с текущим кодировщиком.
+    Параметры:
+            kind (str или Encoder): тип кодировщика или готовый кодировщик, по умолчанию равно 'sentence_transformers',
+            model_id (str): имя модели или путь к модели, по умолчанию равно None,
+            dim (int): размерность векторов, по умолчанию равно None,
+            **params: параметры кодировщика.
+    Возвращаемое значение:
+            (dict): описание векторов с ключами encoder, encoder_name, model_id и dim.
+    """
+    return {
+        "encoder": kind if isinstance(kind, str) else type(kind).__name__,
+        "encoder_name": encoder_name(kind, model_id=model_id, **params),
+        "model_id": model_id,
+        "dim": None if dim is None else int(dim),
+    }
@@ -1,20 +1,19 @@
 # скрипт для заполнения таблиц базы данных
 from config import CONN_STR_GEONAMES, DATA_DIR
-from database import DataFrameSQL, addapt_numpy_float32
-import os
+from database import DataFrameSQL
+from dataset import DatasetLoader
 import gc
-import pandas as pd
-import numpy as np
-from sqlalchemy import create_engine, ARRAY, REAL
-from psycopg2.extensions import register_adapter
+from sqlalchemy import create_engine
 
 
 def main():
     # создаем словарь, в котором будем хранить загруженные DataFrame
     dataframes = {}
-    # загружаем DataFrame и сохраняем его в словаре
+    # загружаем DataFrame (parquet или zip pickle) и сохраняем его в словаре,
+    # матрица векторов отображается в память и читается при загрузке в БД
+    loader = DatasetLoader(work_dir=DATA_DIR)
     for file_name in ["cities", "countries", "admin_codes", "embeddings"]:
-        dataset = pd.read_pickle(os.path.join(DATA_DIR, file_name), compression="zip")
+        dataset = loader.load_dataset_from_file(file_name=file_name, dir_to_load=DATA_DIR)
         dataframes[file_name] = dataset
     # датафрейм с городами
     cities = dataframes["cities"]
@@ -24,20 +23,24 @@ def main():
     admin_codes = dataframes["admin_codes"]
     # датафрейм с веторами
     embeddings = dataframes["embeddings"]
-    # применение register_adapter
-    register_adapter(np.float32, addapt_numpy_float32)
     # создание подключения к БД
     engine = create_engine(CONN_STR_GEONAMES)
     # создаём экземпляра класса DataFrameSQL
     data_sql = DataFrameSQL(engine)
+    # таблицы созданы скриптом create_database.py, поэтому данные загружаются через COPY в бинарном формате,
+    # векторы кодируются из матрицы numpy без преобразования каждого числа
     # cохраняем данные в таблицу 'admincode'
-    data_sql.to_sql(admin_codes, "admincode")
-    # cохраняем данные в таблицу 'embeddings' с использованием параметра dtype для столбца 'embeddings'
-    data_sql.to_sql(embeddings, "embeddings", dtype={"embeddings": ARRAY(REAL)})
+    data_sql.to_sql(admin_codes, "admincode", method="copy_binary")
+    # cохраняем данные в таблицу 'embeddings'
+    data_sql.to_sql(embeddings, "embeddings", method="copy_binary")
+    # cохраняем описание кодировщика векторов, если оно есть рядом с датасетом
+    info = loader.load_embedding_info(file_name="embeddings", dir_to_load=DATA_DIR)
+    if info is not None:
+        data_sql.set_embedding_info(info)
     # cохраняем данные в таблицу 'country'
-    data_sql.to_sql(countries, "country")
+    data_sql.to_sql(countries, "country", method="copy_binary")
     # cохраняем данные в таблицу 'city'
-    data_sql.to_sql(cities, "city")
+    data_sql.to_sql(cities, "city", method="copy_binary")
     # очистка памяти
     del cities, countries, admin_codes, embeddings
     gc.collect()
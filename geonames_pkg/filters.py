@@ -0,0 +1,196 @@
+# файл с классом фильтров строк датасета для поиска городов
+# базовые импорты
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+
+class RowGroups:
+    """
+    Класс RowGroups - строки датасета, сгруппированные по значению столбца.
+    Строки упорядочены по значению, поэтому строки одного значения занимают
+    непрерывный диапазон, границы которого хранятся в словаре ranges.
+    """
+
+    def __init__(self, values=None):
+        """
+        Инициализация объекта класса RowGroups.
+
+         Параметры:
+              values (pd.Series): значения столбца по строкам датасета, по умолчанию равно None.
+        """
+        codes, uniques = pd.factorize(np.asarray(values, dtype=object))
+        # строки с пропусками (код -1) оказываются в начале и ни в один диапазон не попадают
+        self.rows = np.argsort(codes, kind="stable")
+        bounds = np.searchsorted(codes[self.rows], np.arange(len(uniques) + 1))
+        self.ranges = {value: (int(bounds[code]), int(bounds[code + 1])) for code, value in enumerate(uniques)}
+
+    def mark(self, mask=None, values=None):
+        """
+        Метод mark класса RowGroups.
+        Отметка в маске строк с любым из значений values, значения, которых нет в датасете, пропускаются.
+
+         Параметры:
+              mask (np.ndarray): булева маска строк датасета, изменяется на месте, по умолчанию равно None,
+              values (list): список значений, по умолчанию равно None.
+        """
+        for value in values:
+            bounds = self.ranges.get(value)
+            if bounds is not None:
+                mask[self.rows[bounds[0]:bounds[1]]] = True
+
+
+class RowFilter:
+    """
+    Класс RowFilter - построение масок строк датасета для фильтров запроса без
+    фильтрации датафрейма: по странам, кодам объектов, населению и прямоугольнику координат.
+    Все нужные массивы строятся один раз, а готовые маски хранятся в LRU кэше,
+    поэтому повторный запрос с теми же фильтрами не требует вычислений.
+    """
+
+    def __init__(self, dataset=None, cache_size=256):
+        """
+        Инициализация объекта класса RowFilter.
+         - для стран и кодов объектов строки упорядочиваются по значению (RowGroups),
+         - для населения и широты строки упорядочиваются по значению, порог или диапазон
+           находится бинарным поиском.
+        Массивы строятся только для столбцов, которые есть в датасете, фильтр по отсутствующему
+        столбцу вызывает ошибку при запросе.
+
+         Параметры:
+              dataset (pd.DataFrame): датасет с городами, по умолчанию равно None,
+              cache_size (int): максимальное количество масок в кэше, по умолчанию равно 256.
+        """
+        self.n_rows = len(dataset)
+        # страну можно указать названием (country) или ISO кодом (country_code_iso)
+        self.countries = [RowGroups(dataset[col]) for col in ("country", "country_code_iso") if col in dataset.columns]
+        self.feature_codes = RowGroups(dataset["feature_code"]) if "feature_code" in dataset.columns else None
+        # строки по убыванию населения
+        self.population_rows = None
+        if "population" in dataset.columns:
+            population = dataset["population"].to_numpy(dtype=np.float64, na_value=-np.inf)
+            self.population_rows = np.argsort(-population, kind="stable")
+            self.population_desc = -population[self.population_rows]
+        # строки по возрастанию широты и долгота по строкам
+        self.latitude_rows = None
+        if "latitude" in dataset.columns and "longitude" in dataset.columns:
+            latitude = dataset["latitude"].to_numpy(dtype=np.float64, na_value=np.nan)
+            self.longitude = dataset["longitude"].to_numpy(dtype=np.float64, na_value=np.nan)
+            self.latitude_rows = np.argsort(latitude, kind="stable")
+            self.latitude_sorted = latitude[self.latitude_rows]
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(countries=None, min_population=None, feature_codes=None, bbox=None):
+        """
+        Статический метод make_key класса RowFilter.
+        Приведение фильтров к хэшируемому виду, одинаковому для одинаковых наборов значений.
+
+         Параметры:
+              countries (str или list): страна или список стран, по умолчанию равно None,
+              min_population (int): минимальное население города, по умолчанию равно None,
+              feature_codes (str или list): код или список кодов объектов geonames, по умолчанию равно None,
+              bbox (list): прямоугольник (min_lat, min_lon, max_lat, max_lon), по умолчанию равно None.
+         Возвращаемое значение:
+              (tuple): ключ фильтров или None, если фильтры не заданы.
+        """
+        if countries is None and min_population is None and feature_codes is None and bbox is None:
+            return None
+        if isinstance(countries, str):
+            countries = [countries]
+        if isinstance(feature_codes, str):
+            feature_codes = [feature_codes]
+        if bbox is not None:
+            if len(bbox) != 4:
+                raise ValueError("Параметр bbox должен содержать 4 значения: min_lat, min_lon, max_lat, max_lon.")
+            bbox = tuple(float(value) for value in bbox)
+        return (
+            tuple(sorted(set(countries))) if countries is not None else None,
+            min_population,
+            tuple(sorted(set(feature_codes))) if feature_codes is not None else None,
+            bbox,
+        )
+
+    def _build(self, key):
+        """
+        Метод _build класса RowFilter.
+        Построение маски строк для ключа фильтров.
+
+         Параметры:
+              key (tuple): ключ фильтров, построенный методом make_key.
+         Возвращаемое значение:
+              mask (np.ndarray): булева маска строк датасета.
+        """
+        countries, min_population, feature_codes, bbox = key
+        mask = np.ones(self.n_rows, dtype=bool)
+        if countries is not None:
+            allowed = np.zeros(self.n_rows, dtype=bool)
+            for groups in self.countries:
+                groups.mark(mask=allowed, values=countries)
+            mask &= allowed
+        if feature_codes is not None:
+            if self.feature_codes is None:
+                raise ValueError("В датасете нет столбца feature_code для фильтра feature_codes.")
+            allowed = np.zeros(self.n_rows, dtype=bool)
+            self.feature_codes.mark(mask=allowed, values=feature_codes)
+            mask &= allowed
+        if min_population is not None:
+            if self.population_rows is None:
+                raise ValueError("В датасете нет столбца population для фильтра min_population.")
+            allowed = np.zeros(self.n_rows, dtype=bool)
+            allowed[self.population_rows[:np.searchsorted(self.population_desc, -min_population, side="right")]] = True
+            mask &= allowed
+        if bbox is not None:
+            if self.latitude_rows is None:
+                raise ValueError("В датасете нет столбцов latitude и longitude для фильтра bbox.")
+            min_lat, min_lon, max_lat, max_lon = bbox
+            # диапазон широт находится бинарным поиском, долгота проверяется только внутри него
+            lo = np.searchsorted(self.latitude_sorted, min_lat, side="left")
+            hi = np.searchsorted(self.latitude_sorted, max_lat, side="right")
+            rows = self.latitude_rows[lo:hi]
+            longitude = self.longitude[rows]
+            # если min_lon > max_lon, то прямоугольник пересекает 180-й меридиан
+            if min_lon <= max_lon:
+                rows = rows[(longitude >= min_lon) & (longitude <= max_lon)]
+            else:
+                rows = rows[(longitude >= min_lon) | (longitude <= max_lon)]
+            allowed = np.zeros(self.n_rows, dtype=bool)
+            allowed[rows] = True
+            mask &= allowed
+        mask.setflags(write=False)
+        return mask
+
+    def mask(self, countries=None, min_population=None, feature_codes=None, bbox=None):
+        """
+        Метод mask класса RowFilter.
+        Булева маска строк датасета, удовлетворяющих всем заданным фильтрам.
+
+         Параметры:
+              countries (str или list): страна или список стран (значения country или country_code_iso),
+                                        по умолчанию равно None - без фильтра,
+              min_population (int): минимальное население города, по умолчанию равно None - без фильтра,
+              feature_codes (str или list): код или список кодов объектов geonames (PPLC, PPLA и т.д.),
+                                            по умолчанию равно None - без фильтра,
+              bbox (list): прямоугольник (min_lat, min_lon, max_lat, max_lon), по умолчанию равно None - без фильтра.
+         Возвращаемое значение:
+              mask (np.ndarray): булева маска только для чтения или None, если фильтры не заданы.
+        """
+        key = RowFilter.make_key(countries=countries, min_population=min_population,
+                                 feature_codes=feature_codes, bbox=bbox)
+        if key is None:
+            return None
+        with self._lock:
+            mask = self._cache.get(key)
+            if mask is not None:
+                self._cache.move_to_end(key)
+                return mask
+        mask = self._build(key)
+        if self.cache_size > 0:
+            with self._lock:
+                self._cache[key] = mask
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return mask
@@ -1,20 +1,45 @@
 # файл с классом поиска городов
 # базовые импорты
+import copy
 import json
 import os
+import threading
 import numpy as np
 
-# импорты для работы векторами
-import torch
-from sentence_transformers import SentenceTransformer, util
+# импорт кодировщиков названий
+from encoders import encoder_name, make_encoder
 
 # импорты для коррекции ошибок
-from fuzzywuzzy import process
 from transliterate import translit
-from yaspeller import check
+
+# yaspeller нужен только для корректора 'yandex', без него доступен локальный корректор
+try:
+    from yaspeller import check
+except ImportError:
+    check = None
+
+# импорт индексов альтернативных имен и точных совпадений
+from alias_index import AliasIndex, ExactIndex, exact_key
+# импорт кэша векторов запросов
+from cache import EmbeddingCache, normalize_name
+# импорт локального корректора опечаток
+from speller import LocalSpeller
+# импорт индексов для поиска ближайших векторов
+from vector_index import NameGroups, count_allowed, make_index, normalize_rows, top_k_rows
+# импорт загрузки снимка данных
+from snapshot import load_snapshot
+# импорт подключения к данным в общей памяти
+from shared_store import attach_shared
+# импорт фильтров строк датасета
+from filters import RowFilter
+# импорт пространственного индекса координат городов
+from spatial_index import SpatialIndex
+# импорт лексического индекса символьных n-грамм
+from lexical_index import NgramIndex, sparse_values, top_k_sparse
+# импорт сходства по расстоянию редактирования
+from edit_distance import rerank, similarity
 
 RANDOM = 12345
-torch.manual_seed(RANDOM)
 np.random.seed(RANDOM)
 
 
@@ -23,7 +48,12 @@ class FindCity:
     Класс FindCity для поиска города по векторному представлению.
     """
 
-    def __init__(self, model_id=None, device="cpu", dataset=None, emb_col=None, cols_output=None):
+    def __init__(self, model_id=None, device="cpu", dataset=None, emb_col=None, cols_output=None,
+                 cache_size=10000, index="flat", index_params=None, index_path=None, emb_dtype="float32",
+                 embeddings=None, exact_match=True, unique_names=True, tie_break="population",
+                 tie_break_ascending=False, lexical_weight=0.0, semantic_weight=1.0, lexical_candidates=50,
+                 rerank_weight=0.0, rerank_candidates=100, edit_backend="auto", encoder="sentence_transformers",
+                 encoder_params=None):
         """
         Инициализация объекта класса FindCity для поиска города.
 
@@ -37,15 +67,194 @@ class FindCity:
             emb_col (str): наименование столбца с векторами представлений, по
                            умолчанию равно None,
             cols_output (list): список наименований столбцов для вывода результата, по
-                                умолчанию равно None.
+                                умолчанию равно None,
+            cache_size (int): максимальное количество векторов запросов в LRU кэше, если
+                              равно 0, то кэш отключен, по умолчанию равно 10000,
+            index (str): тип индекса для поиска по векторам городов:
+                         - 'flat' - точный поиск полным перебором,
+                         - 'ivf' - приближенный поиск по инвертированным спискам,
+                         - 'faiss' - приближенный поиск графом HNSW (нужен пакет faiss),
+                         по умолчанию равно 'flat',
+            index_params (dict): параметры индекса, например {"n_lists": 256, "n_probe": 8} для 'ivf'
+                                 или {"m": 32, "ef_search": 64} для 'faiss', по умолчанию равно None,
+            index_path (str): путь к файлу индекса, если файл есть, то индекс загружается с диска,
+                              иначе строится и сохраняется, при квантовании emb_dtype - путь к файлу .npy
+                              матрицы float32 для точного пересчета, по умолчанию равно None,
+            emb_dtype (str): тип хранения матрицы векторов городов для точного индекса 'flat':
+                             - 'float32' - без квантования,
+                             - 'float16' или 'int8' - квантованная матрица, матрица float32 в памяти
+                               процесса не хранится, лучшие кандидаты пересчитываются точно по матрице
+                               на диске: отображенной в память матрице снимка или файлу index_path,
+                               иначе сходство приближенное,
+                             по умолчанию равно 'float32',
+            embeddings (np.ndarray): готовая нормализованная матрица векторов городов в порядке строк
+                                     dataset или матрица уникальных названий в порядке их первого появления
+                                     в dataset, например отображенная в память из снимка, если задана,
+                                     то emb_col не используется, по умолчанию равно None,
+            exact_match (bool): флаг поиска точных совпадений с name, asciiname и alternatenames
+                                до корректора опечаток и модели, по умолчанию равно True,
+            unique_names (bool): флаг поиска по матрице уникальных названий: у городов с одинаковым
+                                 названием один вектор, найденное название раскрывается в свои города,
+                                 по умолчанию равно True,
+            tie_break (str): столбец для упорядочивания городов с одинаковым сходством (одного названия),
+                             по умолчанию равно 'population',
+            tie_break_ascending (bool): флаг упорядочивания по возрастанию tie_break, по умолчанию
+                                        равно False - сначала города с большим населением,
+            lexical_weight (float): вес лексического сходства по символьным 3-граммам в итоговой оценке,
+                                    если равно 0, то лексический индекс не строится и поиск только векторный,
+                                    веса lexical_weight и semantic_weight нормализуются к сумме 1,
+                                    по умолчанию равно 0.0,
+            semantic_weight (float): вес косинусного сходства векторов в итоговой оценке, по умолчанию равно 1.0,
+            lexical_candidates (int): количество кандидатов лексического и векторного поиска, из которых
+                                      отбираются города по итоговой оценке, по умолчанию равно 50,
+            rerank_weight (float): вес сходства по расстоянию редактирования (Дамерау-Левенштейна) названия
+                                   запроса и названия города при переупорядочивании лучших кандидатов поиска,
+                                   если равно 0, то переупорядочивание отключено, по умолчанию равно 0.0,
+            rerank_candidates (int): количество лучших кандидатов поиска для переупорядочивания,
+                                     по умолчанию равно 100,
+            edit_backend (str): способ расчета расстояния редактирования: 'numpy' - битово-параллельный
+                                алгоритм, 'rapidfuzz' - пакет rapidfuzz, 'auto' - rapidfuzz, если он установлен,
+                                по умолчанию равно 'auto',
+            encoder (str или Encoder): кодировщик запросов (функция make_encoder модуля encoders):
+                                       - 'sentence_transformers' - модель model_id,
+                                       - 'quantized' - модель model_id с квантованием int8 на CPU,
+                                       - 'hashing' - хэширование символьных n-грамм без torch,
+                                       или готовый объект Encoder, векторы городов должны быть созданы
+                                       таким же кодировщиком, по умолчанию равно 'sentence_transformers',
+            encoder_params (dict): параметры кодировщика, по умолчанию равно None.
         """
         self.model_id = model_id
         self.device = device
         self.dataset = dataset
         self.emb_col = emb_col
-        self.cities_emb = np.array(list(self.dataset[self.emb_col]), dtype=np.float32)
-        self.model = SentenceTransformer(self.model_id, device=self.device)
+        # группировка строк по названию, города одного названия упорядочены по tie_break
+        order = self.dataset[tie_break] if tie_break in self.dataset.columns else None
+        groups = NameGroups(names=self.dataset["name"], order=order, ascending=tie_break_ascending)
+        self.name_groups = groups if unique_names else None
+        if embeddings is not None:
+            # готовая нормализованная матрица используется без копирования
+            self.cities_emb = embeddings
+        else:
+            # нормализуем векторы городов, чтобы косинусное сходство считалось одним матричным умножением,
+            # при поиске по уникальным названиям берем по одному вектору на название
+            emb_col = self.dataset[self.emb_col]
+            emb_col = emb_col.iloc[groups.first_rows] if unique_names else emb_col
+            self.cities_emb = normalize_rows(np.array(list(emb_col), dtype=np.float32))
+        # матрица уникальных названий или по строкам датасета
+        self.cities_emb = groups.collapse(self.cities_emb) if unique_names else groups.expand_matrix(self.cities_emb)
+        self.model = make_encoder(kind=encoder, model_id=self.model_id, device=self.device, **(encoder_params or {}))
+        # векторы запросов и городов должны иметь одну размерность
+        if self.model.dim is not None and self.model.dim != self.cities_emb.shape[1]:
+            raise ValueError(f"Размерность векторов кодировщика {self.model.name} равна {self.model.dim}, "
+                             f"а размерность векторов городов - {self.cities_emb.shape[1]}.")
         self.cols_output = cols_output
+        # индекс альтернативных имен для расширенной проверки строится один раз
+        self.alias_index = AliasIndex(dataset=self.dataset)
+        # хэш-индекс точных совпадений названий строится один раз
+        self.exact_index = ExactIndex(dataset=self.dataset, order_col=tie_break,
+                                      ascending=tie_break_ascending) if exact_match else None
+        # кэш векторов запросов, общий для всех потоков приложения
+        self.emb_cache = EmbeddingCache(max_entries=cache_size)
+        # фильтры запроса по странам, населению, кодам объектов и координатам
+        self.row_filter = RowFilter(dataset=self.dataset)
+        # пространственный индекс для обратного геокодирования и упорядочивания по близости к точке,
+        # строится, только если в датасете есть координаты
+        self.spatial_index = SpatialIndex(
+            latitude=self.dataset["latitude"], longitude=self.dataset["longitude"]
+        ) if "latitude" in self.dataset.columns and "longitude" in self.dataset.columns else None
+        # лексический индекс символьных 3-грамм строится методом set_weights
+        self.lexical_candidates = lexical_candidates
+        self.lexical_index = None
+        # нормализованные названия городов (или уникальных названий) для переупорядочивания кандидатов
+        if not 0 <= rerank_weight <= 1:
+            raise ValueError("Вес rerank_weight должен быть в диапазоне от 0 до 1.")
+        self.rerank_weight = rerank_weight
+        self.rerank_candidates = rerank_candidates
+        self.edit_backend = edit_backend
+        names = self.dataset["name"].to_numpy(dtype=object)
+        names = names[groups.first_rows] if unique_names else names
+        self.rerank_names = np.array([exact_key(name) for name in names], dtype=object) if rerank_weight > 0 else None
+        self.set_weights(lexical_weight=lexical_weight, semantic_weight=semantic_weight)
+        # локальный корректор опечаток строится при первом обращении
+        self.local_speller = None
+        self._speller_lock = threading.Lock()
+        # индекс для поиска по векторам городов строится или загружается с диска
+        if emb_dtype != "float32":
+            if index != "flat":
+                raise ValueError(f"Квантование emb_dtype={emb_dtype} доступно только для индекса 'flat'.")
+            # для точного пересчета используется только матрица на диске: отображенная в память
+            # матрица снимка или файл index_path, матрица в памяти процесса не сохраняется
+            exact = self.cities_emb if isinstance(self.cities_emb, np.memmap) else None
+            self.index = make_index(kind="quantized", embeddings=self.cities_emb, dtype=emb_dtype, exact=exact,
+                                    path=index_path if exact is None else None, **(index_params or {}))
+            # вместо матрицы float32 храним только квантованную матрицу индекса
+            self.cities_emb = self.index.embeddings
+        else:
+            self.index = make_index(kind=index, embeddings=self.cities_emb, path=index_path,
+                                    **(index_params or {}))
+
+    @classmethod
+    def from_snapshot(cls, path=None, model_id=None, device="cpu", cols_output=None, **kwargs):
+        """
+        Метод from_snapshot класса FindCity.
+        Создание объекта FindCity из снимка данных, сохраненного функцией export_snapshot.
+        Матрица векторов отображается в память без копирования, поэтому запуск занимает
+        доли секунды, а процессы с одним снимком используют общий page cache.
+
+         Параметры:
+            path (str): директория версии снимка или директория снимков с файлом LATEST,
+                        по умолчанию равно None,
+            model_id (str): имя модели для векторизации, если равно None, то берется из снимка,
+                            по умолчанию равно None,
+            device (str): акселератор для создания векторов CPU или GPU, по умолчанию равно 'cpu',
+            cols_output (list): список наименований столбцов для вывода результата, по
+                                умолчанию равно None,
+            **kwargs: остальные параметры инициализации FindCity, в том числе encoder и encoder_params -
+                      кодировщик должен совпадать с кодировщиком векторов снимка.
+
+         Возвращаемое значение:
+            (FindCity): объект класса FindCity.
+        """
+        metadata, embeddings, manifest = load_snapshot(path=path)
+        model_id = model_id or manifest["model_id"]
+        # векторы запросов и городов должны быть созданы одним кодировщиком, в снимках без
+        # описания кодировщика векторы созданы моделью sentence-transformers manifest['model_id']
+        expected = manifest.get("encoder_name", manifest["model_id"])
+        current = encoder_name(kwargs.get("encoder", "sentence_transformers"), model_id=model_id,
+                               **(kwargs.get("encoder_params") or {}))
+        if expected and current != expected:
+            raise ValueError(
+                f"Снимок создан кодировщиком {expected}, а для поиска указан кодировщик {current}."
+            )
+        return cls(model_id=model_id, device=device, dataset=metadata, cols_output=cols_output,
+                   embeddings=embeddings, **kwargs)
+
+    @classmethod
+    def from_shared(cls, handle=None, model_id=None, device="cpu", cols_output=None, **kwargs):
+        """
+        Метод from_shared класса FindCity.
+        Создание объекта FindCity в рабочем процессе из матрицы векторов и метаданных,
+        размещенных родительским процессом в общей памяти функцией publish_shared.
+        Данные не копируются, поэтому объем памяти не растет с количеством рабочих процессов.
+
+         Параметры:
+            handle (dict): описание сегментов общей памяти, по умолчанию равно None -
+                           берется из переменной окружения GEONAMES_SHM,
+            model_id (str): имя модели для векторизации, по умолчанию равно None,
+            device (str): акселератор для создания векторов CPU или GPU, по умолчанию равно 'cpu',
+            cols_output (list): список наименований столбцов для вывода результата, по
+                                умолчанию равно None,
+            **kwargs: остальные параметры инициализации FindCity.
+
+         Возвращаемое значение:
+            (FindCity): объект класса FindCity.
+        """
+        metadata, embeddings, segments = attach_shared(handle=handle)
+        finder = cls(model_id=model_id, device=device, dataset=metadata, cols_output=cols_output,
+                     embeddings=embeddings, **kwargs)
+        # сегменты общей памяти должны жить, пока используется объект
+        finder.shared_segments = segments
+        return finder
 
     @staticmethod
     def spell_checker(city=None):
@@ -62,6 +271,8 @@ class FindCity:
              city (str): скорректированное название города или исходное значение,
                          в случае невозможности корректировки.
          """
+        if check is None:
+            raise ImportError("Для корректора speller='yandex' необходимо установить пакет YandexSpeller.")
         # в переменную res записывается True или False.
         # вызывается метод check из yaspeller, если нету ошибок res = True,
         # в противном случае res = False
@@ -78,7 +289,7 @@ class FindCity:
             return city
 
     @staticmethod
-    def advanced_spell_checker(city=None, dataset=None):
+    def advanced_spell_checker(city=None, dataset=None, alias_index=None, backend="auto"):
         """
         Статический метод advanced_spell_checker класса FindCity.
         Расширенная проверка названия города в случае невозможности исправить
@@ -87,50 +298,31 @@ class FindCity:
         совпадение найдено, возвращается имя города из поля name, если нет,
         то возвращается исходное значение. В процессе используются методы:
          - translit библиотеки transliterate,
-         - process библиотеки fuzzywuzzy.
+         - rerank модуля edit_distance (расстояние Дамерау-Левенштейна).
         В основном расширенная проверка нужна для сокращений:
          - МСК - Москва,
          - СПБ - Санкт-Петербург.
          Параметры:
               city (str): название города для проверки, по умолчанию равно None.
               dataset (pd.DataFrame): датасет с городами и альтернативными именами городов,
-                                      по умолчанию равно None.
+                                      по умолчанию равно None,
+              alias_index (AliasIndex): предварительно построенный индекс альтернативных имен,
+                                        если равно None, то индекс строится из dataset,
+                                        по умолчанию равно None,
+              backend (str): способ расчета расстояния редактирования 'numpy', 'rapidfuzz' или 'auto',
+                             по умолчанию равно 'auto'.
          Возвращаемое значение:
               city (str): скорректированное название города или исходное значение,
                         в случае невозможности корректировки.
         """
-        # создаем словарь из датасета, где ключ это значение из поля name, а значения
-        # это строка альтернативных имен.
-        cities_dict = (
-            dataset.groupby("name")["alternatenames"]
-            .apply(lambda x: ",".join(map(str, x)))
-            .to_dict()
-        )
+        # если индекс не передан, то строим его из датасета
+        if alias_index is None:
+            alias_index = AliasIndex(dataset=dataset)
         # транслитерация введенного на русском языке названия города
         city_t = translit(city, "ru", reversed=True)
-        # пустой список для найденных городов
-        key_lst = []
-        # цикл по словарю
-        for key, value in cities_dict.items():
-            # проверка наличия имени города в исходном или транслитном значении в разбитой на список строке
-            # c альтернативными названиями
-            if (city.lower() in value.lower().split(", ")) or (
-                    city_t.lower() in value.lower().split(", ")
-            ):
-                # если поиск успешен добавляем ключ - имя города в список
-                key_lst.append(key)
-            # если поиск безрезультатен
-            else:
-                # проходим циклом по списку из разделенной строки с альтернативными названиями
-                for item in value.lower().split(", "):
-                    # транслитерация названия
-                    item_t = translit(item, "ru", reversed=True)
-                    # альтернативное имя начинается с искомого слова в оригинале или транслите
-                    if item.startswith(city) or item_t.startswith(city_t):
-                        # то добавляем ключ в список имен
-                        key_lst.append(key)
-        # в списке может быть много городов и дублей городов, для этого через множество удалим дубли
-        key_lst = list(set(key_lst))
+        # список найденных имен городов без дублей, у которых альтернативное имя в исходном
+        # или транслитном значении совпадает с введенным или начинается с него
+        key_lst = alias_index.candidates(city=city, city_t=city_t)
         # если длина списка 1 значение
         if len(key_lst) == 1:
             # то в возвращаемую переменную присваиваем 0-й элемент списка
@@ -139,10 +331,12 @@ class FindCity:
             return city
         # если городов в списке больше двух
         elif len(key_lst) > 1:
-            # то методом process.extract библиотеки fuzzywuzzy вытаскиваем наиболее близкий по расстоянию Левенштейна
-            word = process.extractOne(city_t, key_lst)
-            # т.к. в word записан список кортежей, то берем из него только название города
-            city = word[0][0]
+            # упорядочиваем имена, чтобы при равном расстоянии результат не зависел от порядка кандидатов
+            key_lst = sorted(key_lst)
+            # выбираем имя, ближайшее к транслиту по расстоянию Дамерау-Левенштейна, для всех кандидатов сразу
+            order, _ = rerank(query=city_t.lower(), candidates=[key.lower() for key in key_lst], backend=backend)
+            # полное имя города из поля name
+            city = key_lst[order[0]]
             # возвращаемое значение
             return city
         # если ничего не найдено
@@ -151,6 +345,493 @@ class FindCity:
             # то возвращаем транслитное значение введенного слова
             return city
 
+    def get_local_speller(self):
+        """
+        Метод get_local_speller класса FindCity.
+        Возвращает локальный корректор опечаток, построенный по датасету,
+        при первом обращении корректор строится один раз для всех потоков.
+
+         Возвращаемое значение:
+            local_speller (LocalSpeller): локальный корректор опечаток.
+        """
+        if self.local_speller is None:
+            with self._speller_lock:
+                if self.local_speller is None:
+                    self.local_speller = LocalSpeller(dataset=self.dataset)
+        return self.local_speller
+
+    def correct_city(self, city=None, adv_spell_check=False, speller="yandex"):
+        """
+        Метод correct_city класса FindCity.
+        Исправление опечаток в названии города: первичная проверка выбранным корректором
+        и, при необходимости, расширенная проверка advanced_spell_checker.
+
+         Параметры:
+            city (str): название города для проверки, по умолчанию равно None,
+            adv_spell_check (bool): флаг использования расширенной проверки названия города,
+                                    по умолчанию равно False,
+            speller (str): корректор для первичной проверки:
+                           - 'yandex' - Яндекс Спеллер (запрос по сети),
+                           - 'local' - локальный корректор LocalSpeller по данным geonames,
+                           - None - без первичной проверки,
+                           по умолчанию равно 'yandex'.
+
+         Возвращаемое значение:
+            city (str): скорректированное название города.
+        """
+        # первичная проверка на исправление ошибок выбранным корректором
+        if speller == "yandex":
+            city = FindCity.spell_checker(city=city)
+        elif speller == "local":
+            city = self.get_local_speller().correct(city=city)
+        elif speller is not None:
+            raise ValueError(
+                f"Неизвестный корректор speller={speller}, допустимые значения: 'yandex', 'local', None."
+            )
+        # если True
+        if adv_spell_check:
+            # запускаем расширенную проверку опечаток или сокращений
+            city = FindCity.advanced_spell_checker(city=city, alias_index=self.alias_index,
+                                                   backend=self.edit_backend)
+        return city
+
+    def exact_search(self, city=None, top_k=1, mask=None, distances=None):
+        """
+        Метод exact_search класса FindCity.
+        Поиск точного совпадения названия с name, asciiname или одним из alternatenames.
+        Совпадения упорядочены по tie_break или по близости к точке, их косинусное сходство равно 1.0.
+        Если совпадений меньше top_k, то возвращаются все найденные, остальные города
+        добавляет векторный поиск (метод merge_exact).
+
+         Параметры:
+            city (str): название города, по умолчанию равно None,
+            top_k (int): количество городов для вывода, по умолчанию равно 1,
+            mask (np.ndarray): булева маска допустимых строк датасета, по умолчанию равно None - все,
+            distances (np.ndarray): расстояния от точки near до городов по строкам датасета,
+                                    по умолчанию равно None - без упорядочивания по близости.
+
+         Возвращаемое значение:
+            (tuple): косинусное сходство и индексы строк датасета (не больше top_k) или None,
+                     если индекс отключен или совпадений с учетом фильтров нет.
+        """
+        if self.exact_index is None:
+            return None
+        rows = self.exact_index.lookup(city=city)
+        if rows is not None and mask is not None:
+            rows = rows[mask[rows]]
+        if rows is None or len(rows) == 0:
+            return None
+        if distances is not None:
+            rows = rows[np.argsort(distances[rows], kind="stable")]
+        rows = rows[:top_k]
+        return np.ones(len(rows), dtype=np.float32), rows
+
+    def exact_complete(self, found=None, top_k=1, mask=None):
+        """
+        Метод exact_complete класса FindCity.
+        Проверка, что точных совпадений достаточно и векторный поиск не нужен:
+        найдено top_k городов или все допустимые фильтрами города.
+
+         Параметры:
+            found (tuple): результат exact_search, по умолчанию равно None,
+            top_k (int): количество городов для вывода, по умолчанию равно 1,
+            mask (np.ndarray): булева маска допустимых строк датасета, по умолчанию равно None - все.
+
+         Возвращаемое значение:
+            (bool): True, если векторный поиск не нужен.
+        """
+        return found is not None and len(found[1]) >= count_allowed(len(self.dataset), top_k, mask)
+
+    @staticmethod
+    def merge_exact(found=None, scores=None, indices=None, top_k=1, fused=None):
+        """
+        Статический метод merge_exact класса FindCity.
+        Объединение точных совпадений с результатом векторного поиска: сначала точные совпадения,
+        затем найденные векторным поиском города, которых нет среди точных совпадений.
+
+         Параметры:
+            found (tuple): результат exact_search или None, по умолчанию равно None,
+            scores (np.ndarray): сходство городов векторного поиска, по умолчанию равно None,
+            indices (np.ndarray): индексы строк датасета векторного поиска, по умолчанию равно None,
+            top_k (int): количество городов для вывода, по умолчанию равно 1,
+            fused (np.ndarray): итоговая оценка городов векторного поиска, по умолчанию равно None.
+
+         Возвращаемое значение:
+            scores (np.ndarray): сходство не больше чем top_k городов,
+            indices (np.ndarray): индексы строк датасета,
+            fused (np.ndarray): итоговая оценка (у точных совпадений равна 1.0), если задан fused.
+        """
+        if found is None:
+            return (scores, indices) if fused is None else (scores, indices, fused)
+        keep = ~np.isin(indices, found[1])
+        merged = (np.concatenate([found[0], scores[keep]])[:top_k],
+                  np.concatenate([found[1], indices[keep]])[:top_k])
+        if fused is None:
+            return merged
+        return (*merged, np.concatenate([found[0], fused[keep]])[:top_k])
+
+    def resolve(self, city=None, top_k=1, mask=None, adv_spell_check=False, speller="yandex", distances=None):
+        """
+        Метод resolve класса FindCity.
+        Поиск точного совпадения исходного названия, затем, если совпадений нет, исправление
+        опечаток и поиск точного совпадения исправленного названия. Если совпадение найдено,
+        то корректор не вызывается, а если найдено достаточно совпадений (exact_complete),
+        то не нужна и модель.
+
+         Параметры:
+            city (str): название города, по умолчанию равно None,
+            top_k (int): количество городов для вывода, по умолчанию равно 1,
+            mask (np.ndarray): булева маска допустимых строк датасета, по умолчанию равно None - все,
+            adv_spell_check (bool): флаг использования расширенной проверки названия города,
+                                    по умолчанию равно False,
+            speller (str): корректор для первичной проверки 'yandex', 'local' или None,
+                           по умолчанию равно 'yandex',
+            distances (np.ndarray): расстояния от точки near до городов по строкам датасета,
+                                    по умолчанию равно None.
+
+         Возвращаемое значение:
+            city (str): исходное или скорректированное название города,
+            found (tuple): результат exact_search или None, если совпадений нет.
+        """
+        found = self.exact_search(city=city, top_k=top_k, mask=mask, distances=distances)
+        if found is None:
+            city = self.correct_city(city=city, adv_spell_check=adv_spell_check, speller=speller)
+            found = self.exact_search(city=city, top_k=top_k, mask=mask, distances=distances)
+        if self.exact_index is not None:
+            self.exact_index.record(hit=self.exact_complete(found=found, top_k=top_k, mask=mask))
+        return city, found
+
+    def encode(self, cities=None, batch_size=64):
+        """
+        Метод encode класса FindCity.
+        Создание векторов для списка скорректированных названий городов с использованием
+        кэша: кодировщик вызывается одним батчем только для названий, которых нет в кэше.
+        Ключ кэша - идентификатор кодировщика и нормализованное название.
+
+         Параметры:
+            cities (list): список скорректированных названий городов, по умолчанию равно None,
+            batch_size (int): размер батча для создания векторов, по умолчанию равно 64.
+
+         Возвращаемое значение:
+            vectors (np.ndarray): матрица векторов в порядке входного списка.
+        """
+        keys = [(self.model.name, normalize_name(city)) for city in cities]
+        vectors = [self.emb_cache.get(key) for key in keys]
+        # названия, которых нет в кэше, без дублей
+        missed = list(dict.fromkeys(key for key, vector in zip(keys, vectors) if vector is None))
+        if missed:
+            encoded = self.model.encode(texts=[key[1] for key in missed], batch_size=batch_size)
+            # копия каждой строки, чтобы кэш не удерживал в памяти весь батч
+            encoded = {key: np.array(vector, dtype=np.float32) for key, vector in zip(missed, encoded)}
+            for key, vector in encoded.items():
+                # вектор в кэше доступен только для чтения
+                vector.setflags(write=False)
+                self.emb_cache.put(key, vector)
+            vectors = [encoded[key] if vector is None else vector for key, vector in zip(keys, vectors)]
+        return np.stack(vectors)
+
+    def filter_mask(self, countries=None, min_population=None, feature_codes=None, bbox=None):
+        """
+        Метод filter_mask класса FindCity.
+        Булева маска строк датасета, удовлетворяющих фильтрам запроса. Маска строится
+        по заранее подготовленным массивам RowFilter без фильтрации датафрейма
+        и кэшируется для повторных запросов с теми же фильтрами.
+
+         Параметры:
+            countries (str или list): страна или список стран (значения поля country или country_code_iso),
+                                      по умолчанию равно None - без фильтра,
+            min_population (int): минимальное население города, по умолчанию равно None - без фильтра,
+            feature_codes (str или list): код или список кодов объектов geonames, например 'PPLC',
+                                          по умолчанию равно None - без фильтра,
+            bbox (list): прямоугольник координат (min_lat, min_lon, max_lat, max_lon),
+                         по умолчанию равно None - без фильтра.
+
+         Возвращаемое значение:
+            mask (np.ndarray): булев массив по строкам датасета или None, если фильтры не заданы.
+        """
+        return self.row_filter.mask(countries=countries, min_population=min_population,
+                                    feature_codes=feature_codes, bbox=bbox)
+
+    def entity_vectors(self, ids=None):
+        """
+        Метод entity_vectors класса FindCity.
+        Векторы float32 городов (или уникальных названий) по номерам, для квантованной
+        матрицы векторы восстанавливаются методом dequantize индекса.
+
+         Параметры:
+            ids (np.ndarray): номера строк матрицы векторов любой формы, по умолчанию равно None.
+
+         Возвращаемое значение:
+            (np.ndarray): векторы размером ids.shape + (размерность,).
+        """
+        dequantize = getattr(self.index, "dequantize", None)
+        if dequantize is not None:
+            return dequantize(ids)
+        return np.asarray(self.cities_emb[ids], dtype=np.float32)
+
+    def set_weights(self, lexical_weight=0.0, semantic_weight=1.0):
+        """
+        Метод set_weights класса FindCity.
+        Установка весов гибридного поиска с проверкой и нормализацией к сумме 1, чтобы итоговая
+        оценка была не больше 1. Лексический индекс символьных 3-грамм по названиям (или по уникальным
+        названиям) строится один раз при первом положительном lexical_weight.
+
+         Параметры:
+            lexical_weight (float): вес лексического сходства, по умолчанию равно 0.0,
+            semantic_weight (float): вес косинусного сходства векторов, по умолчанию равно 1.0.
+        """
+        if lexical_weight < 0 or semantic_weight < 0 or lexical_weight + semantic_weight <= 0:
+            raise ValueError("Веса lexical_weight и semantic_weight должны быть неотрицательными, "
+                             "а их сумма - больше 0.")
+        if lexical_weight > 0 and self.lexical_index is None:
+            groups = self.name_groups
+            self.lexical_index = NgramIndex(
+                dataset=self.dataset,
+                entity_ids=None if groups is None else groups.name_ids,
+                n_entities=None if groups is None else groups.n_names,
+            )
+        self.lexical_weight = lexical_weight / (lexical_weight + semantic_weight)
+        self.semantic_weight = semantic_weight / (lexical_weight + semantic_weight)
+        # при гибридном поиске и переупорядочивании итоговая оценка выводится в столбце score,
+        # косинусное сходство - в cos_sim_score
+        self.fused_scores = self.lexical_index is not None or self.rerank_names is not None
+
+    def hybrid_search(self, vectors=None, cities=None, top_k=1, mask=None, chunk_size=64):
+        """
+        Метод hybrid_search класса FindCity.
+        Гибридный поиск: кандидаты векторного поиска объединяются с кандидатами лексического
+        индекса символьных 3-грамм, для всех кандидатов считается итоговая оценка
+        semantic_weight * косинусное сходство + lexical_weight * лексическое сходство,
+        отбираются top_k кандидатов с наибольшей оценкой. Лексические оценки считаются
+        произведением разреженных матриц для части запросов размером chunk_size и остаются
+        разреженными: из них берутся только lexical_candidates лучших допустимых объектов.
+
+         Параметры:
+            vectors (np.ndarray): нормализованные векторы запросов, по умолчанию равно None,
+            cities (list): названия запросов в порядке vectors, по умолчанию равно None,
+            top_k (int): количество кандидатов для каждого запроса, по умолчанию равно 1,
+            mask (np.ndarray): булева маска допустимых строк матрицы векторов, по умолчанию равно None - все,
+            chunk_size (int): количество запросов в одной части, по умолчанию равно 64.
+
+         Возвращаемое значение:
+            scores (np.ndarray): косинусное сходство размером (количество запросов, top_k),
+            indices (np.ndarray): номера строк матрицы векторов размером (количество запросов, top_k),
+                                  -1 - кандидат не найден,
+            fused (np.ndarray): итоговая оценка размером (количество запросов, top_k).
+        """
+        total = self.cities_emb.shape[0]
+        tops = count_allowed(total, top_k, mask)
+        # векторный поиск возвращает не меньше top_k допустимых кандидатов
+        sem_scores, sem_ids = self.index.search(vectors=vectors, top_k=max(top_k, self.lexical_candidates), mask=mask)
+        n_lexical = min(self.lexical_candidates, total)
+        scores = np.zeros((len(vectors), tops), dtype=np.float32)
+        fused_scores = np.zeros((len(vectors), tops), dtype=np.float32)
+        indices = np.zeros((len(vectors), tops), dtype=np.int64)
+        for start in range(0, len(vectors), chunk_size):
+            part = slice(start, start + chunk_size)
+            lexical = self.lexical_index.scores(cities=cities[part])
+            _, lex_ids = top_k_sparse(lexical, n_lexical, mask=mask)
+            # объединение кандидатов без дублей
+            candidates = np.sort(np.concatenate([sem_ids[part], lex_ids], axis=1), axis=1)
+            valid = candidates >= 0
+            valid[:, 1:] &= candidates[:, 1:] != candidates[:, :-1]
+            candidates = np.where(valid, candidates, 0)
+            if mask is not None:
+                valid &= mask[candidates]
+            cos_sim = np.einsum("qd,qkd->qk", vectors[part], self.entity_vectors(candidates))
+            fused = (self.semantic_weight * cos_sim
+                     + self.lexical_weight * sparse_values(lexical, candidates))
+            fused[~valid] = -np.inf
+            part_scores, positions = top_k_rows(fused, tops)
+            part_ids = np.take_along_axis(candidates, positions, axis=1)
+            found = np.isfinite(part_scores)
+            indices[part] = np.where(found, part_ids, -1)
+            fused_scores[part] = np.where(found, part_scores, 0)
+            scores[part] = np.where(found, np.take_along_axis(cos_sim, positions, axis=1), 0)
+        return scores, indices, fused_scores
+
+    def edit_rerank(self, cities=None, scores=None, indices=None, top_k=1, fused=None):
+        """
+        Метод edit_rerank класса FindCity.
+        Переупорядочивание лучших кандидатов поиска по итоговой оценке
+        (1 - rerank_weight) * оценка поиска + rerank_weight * сходство по расстоянию Дамерау-Левенштейна
+        между названием запроса (или его транслитом) и названием кандидата. Расстояния до всех
+        кандидатов запроса считаются одним вызовом битово-параллельного алгоритма или rapidfuzz.
+
+         Параметры:
+            cities (list): названия запросов, по умолчанию равно None,
+            scores (np.ndarray): оценки кандидатов размером (количество запросов, количество кандидатов),
+                                 по умолчанию равно None,
+            indices (np.ndarray): номера строк матрицы векторов кандидатов, -1 - кандидат не найден,
+                                  по умолчанию равно None,
+            top_k (int): количество кандидатов после переупорядочивания, по умолчанию равно 1,
+            fused (np.ndarray): итоговая оценка гибридного поиска, по умолчанию равно None - вместо нее
+                                используется косинусное сходство scores.
+
+         Возвращаемое значение:
+            scores (np.ndarray): косинусное сходство размером (количество запросов, top_k),
+            indices (np.ndarray): номера строк матрицы векторов размером (количество запросов, top_k),
+            fused (np.ndarray): итоговая оценка размером (количество запросов, top_k).
+        """
+        tops = min(top_k, indices.shape[1])
+        base = scores if fused is None else fused
+        out_scores = np.zeros((len(indices), tops), dtype=np.float32)
+        out_fused = np.zeros((len(indices), tops), dtype=np.float32)
+        out_indices = np.full((len(indices), tops), -1, dtype=np.int64)
+        for pos, city in enumerate(cities):
+            found = indices[pos][indices[pos] >= 0]
+            names = self.rerank_names[found]
+            key = exact_key(city)
+            # сходство с названием запроса или его транслитом
+            sim = np.maximum(similarity(query=key, candidates=names, backend=self.edit_backend),
+                             similarity(query=translit(key, "ru", reversed=True), candidates=names,
+                                        backend=self.edit_backend))
+            reranked = (1 - self.rerank_weight) * base[pos][:len(found)] + self.rerank_weight * sim
+            order = np.argsort(-reranked, kind="stable")[:tops]
+            out_scores[pos, :len(order)] = scores[pos][order]
+            out_fused[pos, :len(order)] = reranked[order]
+            out_indices[pos, :len(order)] = found[order]
+        return out_scores, out_indices, out_fused
+
+    def search(self, vectors=None, top_k=1, mask=None, distances=None, cities=None, return_fused=False):
+        """
+        Метод search класса FindCity.
+        Поиск наиболее похожих городов по косинусному сходству для пачки векторов
+        через индекс, выбранный при инициализации. Если построен лексический индекс и заданы
+        названия запросов, то выполняется гибридный поиск hybrid_search, если задан rerank_weight,
+        то лучшие кандидаты переупорядочиваются методом edit_rerank. При поиске по уникальным
+        названиям найденные названия раскрываются в города, города одного названия упорядочены
+        по tie_break или, если заданы distances, по близости к точке.
+
+         Параметры:
+            vectors (np.ndarray): матрица векторов запросов размером (количество запросов, размерность),
+                                  по умолчанию равно None,
+            top_k (int): количество наиболее похожих городов, по умолчанию равно 1,
+            mask (np.ndarray): булева маска допустимых строк датасета, по умолчанию равно None - все,
+            distances (np.ndarray): расстояния от точки near до городов по строкам датасета,
+                                    по умолчанию равно None,
+            cities (list): названия запросов в порядке vectors для лексического индекса и переупорядочивания
+                           по расстоянию редактирования, по умолчанию равно None - только векторный поиск,
+            return_fused (bool): флаг вывода итоговой оценки третьим значением,
+                                 по умолчанию равно False.
+
+         Возвращаемое значение:
+            scores (np.ndarray): косинусное сходство размером (количество запросов, top_k),
+            indices (np.ndarray): индексы строк датасета размером (количество запросов, top_k),
+            fused (np.ndarray): итоговая оценка, по которой упорядочены города, размером
+                                (количество запросов, top_k) или None без гибридного поиска и переупорядочивания,
+                                если return_fused=True.
+        """
+        # нормализуем векторы запросов
+        vectors = normalize_rows(np.asarray(vectors).reshape(-1, self.cities_emb.shape[1]))
+        # названий ищется не больше top_k, т.к. каждое допустимое название дает хотя бы один город
+        search_mask = self.name_groups.name_mask(mask) if self.name_groups is not None else mask
+        # для переупорядочивания ищется rerank_candidates лучших кандидатов
+        use_rerank = self.rerank_names is not None and cities is not None
+        width = max(top_k, self.rerank_candidates) if use_rerank else top_k
+        fused = None
+        if self.lexical_index is not None and cities is not None:
+            scores, indices, fused = self.hybrid_search(vectors=vectors, cities=list(cities), top_k=width,
+                                                        mask=search_mask)
+        else:
+            scores, indices = self.index.search(vectors=vectors, top_k=width, mask=search_mask)
+        if use_rerank:
+            scores, indices, fused = self.edit_rerank(cities=cities, scores=scores, indices=indices, top_k=top_k,
+                                                      fused=fused)
+        if self.name_groups is None:
+            if distances is not None:
+                # среди найденных городов с одинаковой оценкой ближе к точке идут первыми
+                rank = scores if fused is None else fused
+                order = np.lexsort((distances[indices], -np.round(rank, 6)), axis=1) if indices.size else indices
+                scores, indices = np.take_along_axis(scores, order, 1), np.take_along_axis(indices, order, 1)
+                fused = None if fused is None else np.take_along_axis(fused, order, 1)
+        elif fused is None:
+            scores, indices = self.name_groups.expand(scores=scores, indices=indices, top_k=top_k, mask=mask,
+                                                      order=distances)
+        else:
+            scores, indices, fused = self.name_groups.expand(scores=scores, indices=indices, top_k=top_k, mask=mask,
+                                                             order=distances, fused=fused)
+        return (scores, indices, fused) if return_fused else (scores, indices)
+
+    def near_distances(self, near=None):
+        """
+        Метод near_distances класса FindCity.
+        Расстояния от точки near до всех городов для упорядочивания городов с одинаковым сходством.
+
+         Параметры:
+            near (list): точка (широта, долгота) в градусах, по умолчанию равно None.
+
+         Возвращаемое значение:
+            (np.ndarray): расстояния в километрах по строкам датасета или None, если точка не задана.
+        """
+        if near is None:
+            return None
+        if len(near) != 2:
+            raise ValueError("Параметр near должен содержать 2 значения: широту и долготу.")
+        return self.get_spatial_index().distances(latitude=near[0], longitude=near[1])
+
+    def get_spatial_index(self):
+        """
+        Метод get_spatial_index класса FindCity.
+        Пространственный индекс координат городов.
+
+         Возвращаемое значение:
+            spatial_index (SpatialIndex): пространственный индекс.
+        """
+        if self.spatial_index is None:
+            raise ValueError("В датасете нет столбцов latitude и longitude для поиска по координатам.")
+        return self.spatial_index
+
+    def make_result(self, indices=None, scores=None, output_dict_json=False, score_col="cos_sim_score", fused=None):
+        """
+        Метод make_result класса FindCity.
+        Формирование результата по индексам строк датасета и косинусному сходству.
+
+         Параметры:
+            indices (np.ndarray): индексы строк датасета, по умолчанию равно None,
+            scores (np.ndarray): косинусное сходство, по умолчанию равно None,
+            output_dict_json (bool): флаг вывода результата в виде списка словарей,
+                                     по умолчанию равно False,
+            score_col (str): наименование столбца для scores, по умолчанию равно 'cos_sim_score',
+            fused (np.ndarray): итоговая оценка гибридного поиска для столбца score,
+                                по умолчанию равно None - без столбца.
+
+         Возвращаемое значение:
+            result_df (pd.DataFrame): если вывод таблицей,
+            output_dict (list): если вывод словарём.
+        """
+        # приближенный индекс может найти меньше городов, чем запрошено: позиции -1 отбрасываются
+        keep = np.asarray(indices) >= 0
+        # формируем результирующий датасет из входного по отобранным индексам
+        result_df = self.dataset[self.cols_output].iloc[np.asarray(indices)[keep]].copy()
+        # добавляем колонку со скорингом
+        result_df[score_col] = np.asarray(scores, dtype=np.float64)[keep]
+        if fused is not None:
+            result_df["score"] = np.asarray(fused, dtype=np.float64)[keep]
+        # если нужен вывод в виде словаря
+        if output_dict_json:
+            return result_df.to_dict(orient="records")
+        return result_df
+
+    def found_result(self, found=None, output_dict_json=False):
+        """
+        Метод found_result класса FindCity.
+        Формирование результата по точным совпадениям или по объединению с векторным поиском (merge_exact).
+        При гибридном поиске добавляется столбец score, у точных совпадений итоговая оценка равна 1.0.
+
+         Параметры:
+            found (tuple): косинусное сходство, индексы строк датасета и, при гибридном поиске,
+                           итоговая оценка, по умолчанию равно None,
+            output_dict_json (bool): флаг вывода результата в виде списка словарей,
+                                     по умолчанию равно False.
+
+         Возвращаемое значение:
+            result_df (pd.DataFrame): если вывод таблицей,
+            output_dict (list): если вывод словарём.
+        """
+        fused = (found[2] if len(found) > 2 else found[0]) if self.fused_scores else None
+        return self.make_result(indices=found[1], scores=found[0], output_dict_json=output_dict_json, fused=fused)
+
     def get_city(
             self,
             city=None,
@@ -159,6 +840,12 @@ class FindCity:
             output_dict_json=False,
             save_json_file=False,
             work_dir=None,
+            speller="yandex",
+            countries=None,
+            min_population=None,
+            feature_codes=None,
+            bbox=None,
+            near=None,
     ):
         """
         Получение информации о городе на основе введенного названия.
@@ -170,44 +857,251 @@ class FindCity:
                                     по умолчанию равно False,
             output_dict_json (bool): флаг вывода результата в формате JSON, по умолчанию равно False,
             save_json_file (bool): флаг сохранения результата в JSON-файл, по умолчанию равно False,
-            work_dir (str): каталог для сохранения JSON-файла, по умолчанию равно None/
+            work_dir (str): каталог для сохранения JSON-файла, по умолчанию равно None,
+            speller (str): корректор для первичной проверки 'yandex', 'local' или None,
+                           по умолчанию равно 'yandex',
+            countries (str или list): страна или список стран для поиска, по умолчанию равно None - все,
+            min_population (int): минимальное население города, по умолчанию равно None - без фильтра,
+            feature_codes (str или list): код или список кодов объектов geonames, по умолчанию равно None - все,
+            bbox (list): прямоугольник координат (min_lat, min_lon, max_lat, max_lon),
+                         по умолчанию равно None - без фильтра,
+            near (list): точка (широта, долгота), города с одинаковым сходством (например,
+                         с одинаковым названием) упорядочиваются по близости к ней, по умолчанию равно None.
 
          Возвращаемое значение:
             result_df (pd.DataFrame): если вывод таблицей,
             output_dict (dict): если вывод словарём.
                     """
-        # первичная проверка на исправление ошибок
-        city = FindCity.spell_checker(city=city)
-        # если True
-        if adv_spell_check:
-            # запускаем расширенную проверку опечаток или сокращений
-            city = FindCity.advanced_spell_checker(city=city, dataset=self.dataset)
-        # поучаем вектор имени города
-        full_city_vector = self.model.encode([city], device=self.device)
-        # выбираем количество схожих городов для вывода
-        tops = min(top_k, len(self.cities_emb))
-        # получаем результат при помощи метода util.semantic_search, где по дефолту косинусное сходство
-        score = util.semantic_search(full_city_vector, self.cities_emb, top_k=tops)[0]
-        # список индексов имен городов из датасета
-        lst_idx = [score[i]["corpus_id"] for i in range(len(score))]
-        # список с косинусным сходством по индексу
-        scores = [score[i]["score"] for i in range(len(score))]
-        # формируем результирующий датасет из входного по отобранным индексам
-        result_df = self.dataset[self.cols_output].iloc[lst_idx]
-        # добавляем колонку со скорингом
-        result_df["cos_sim_score"] = scores
+        mask = self.filter_mask(countries=countries, min_population=min_population, feature_codes=feature_codes,
+                                bbox=bbox)
+        # точное совпадение названия или проверка на исправление ошибок
+        distances = self.near_distances(near=near)
+        city, found = self.resolve(city=city, top_k=top_k, mask=mask, adv_spell_check=adv_spell_check,
+                                   speller=speller, distances=distances)
+        if not self.exact_complete(found=found, top_k=top_k, mask=mask):
+            # поучаем вектор имени города
+            full_city_vector = self.encode(cities=[city])
+            # получаем индексы и косинусное сходство наиболее похожих городов
+            scores, indices, fused = self.search(vectors=full_city_vector, top_k=top_k, mask=mask,
+                                                 distances=distances, cities=[city], return_fused=True)
+            # точные совпадения идут первыми, остальные города - из векторного поиска
+            found = self.merge_exact(found=found, scores=scores[0], indices=indices[0], top_k=top_k,
+                                     fused=None if fused is None else fused[0])
+        # формируем результат
+        result = self.found_result(found=found, output_dict_json=output_dict_json)
         # если нужен вывод в виде словаря
         if output_dict_json:
-            # формируем словарь из датафрейма
-            output_dict = result_df.to_dict(orient="records")
             # если нужно – то сохраняем json файл
             if save_json_file:
                 with open(os.path.join(work_dir, f"{city}.json"), "w") as fp:
-                    json.dump(output_dict, fp)
-            # возвращаем список словарей
-            return output_dict
-        # иначе
+                    json.dump(result, fp)
+        # возвращаем список словарей или датафрейм
+        return result
+
+    def cache_info(self):
+        """
+        Метод cache_info класса FindCity.
+        Статистика кэша векторов запросов: попадания, промахи и размер.
+
+         Возвращаемое значение:
+            (dict): словарь со статистикой кэша.
+        """
+        return self.emb_cache.info()
+
+    def exact_info(self):
+        """
+        Метод exact_info класса FindCity.
+        Статистика индекса точных совпадений: доля запросов, обработанных без корректора и модели.
+
+         Возвращаемое значение:
+            (dict): словарь со статистикой индекса или None, если индекс отключен.
+        """
+        return self.exact_index.info() if self.exact_index is not None else None
+
+    def get_cities(
+            self,
+            cities=None,
+            top_k=1,
+            adv_spell_check=False,
+            output_dict_json=False,
+            batch_size=64,
+            speller="yandex",
+            countries=None,
+            min_population=None,
+            feature_codes=None,
+            bbox=None,
+            near=None,
+    ):
+        """
+        Пакетное получение информации о городах для списка названий.
+        Названия с точным совпадением в индексе ExactIndex обрабатываются без корректора, а если
+        совпадений не меньше top_k, то и без модели, иначе точные совпадения дополняются векторным поиском.
+        Проверка опечаток выполняется один раз для каждого уникального названия,
+        векторы уникальных скорректированных названий создаются батчами модели,
+        поиск выполняется одним матричным умножением на матрицу городов.
+
+         Параметры:
+            cities (list): список названий городов для поиска, по умолчанию равно None,
+            top_k (int): количество наиболее похожих городов для вывода, по умолчанию равно 1,
+            adv_spell_check (bool): флаг использования расширенной проверки названия города,
+                                    по умолчанию равно False,
+            output_dict_json (bool): флаг вывода результата в виде списков словарей,
+                                     по умолчанию равно False,
+            batch_size (int): размер батча для создания векторов, по умолчанию равно 64,
+            speller (str): корректор для первичной проверки 'yandex', 'local' или None,
+                           по умолчанию равно 'yandex',
+            countries (str или list): страна или список стран для поиска, по умолчанию равно None - все,
+            min_population (int): минимальное население города, по умолчанию равно None - без фильтра,
+            feature_codes (str или list): код или список кодов объектов geonames, по умолчанию равно None - все,
+            bbox (list): прямоугольник координат (min_lat, min_lon, max_lat, max_lon),
+                         по умолчанию равно None - без фильтра,
+            near (list): точка (широта, долгота), города с одинаковым сходством (например,
+                         с одинаковым названием) упорядочиваются по близости к ней, по умолчанию равно None.
+
+         Возвращаемое значение:
+            results (list): список датафреймов или списков словарей, по одному на каждое
+                            входное название, в порядке входного списка.
+        """
+        # проверка типа переменной cities на тип list или tuple
+        if not isinstance(cities, (list, tuple)):
+            raise TypeError(
+                f"Не соответствует тип переменной cities, должен быть тип list или tuple."
+            )
+        mask = self.filter_mask(countries=countries, min_population=min_population, feature_codes=feature_codes,
+                                bbox=bbox)
+        # точные совпадения и проверка опечаток один раз для каждого уникального названия
+        distances = self.near_distances(near=near)
+        unique_results = {}
+        corrected = {}
+        # точные совпадения, которых меньше top_k, дополняются векторным поиском
+        partial = {}
+        for city in dict.fromkeys(cities):
+            name, found = self.resolve(city=city, top_k=top_k, mask=mask, adv_spell_check=adv_spell_check,
+                                       speller=speller, distances=distances)
+            if not self.exact_complete(found=found, top_k=top_k, mask=mask):
+                corrected[city] = name
+                partial[city] = found
+            else:
+                unique_results[city] = self.found_result(found=found, output_dict_json=output_dict_json)
+        # векторный поиск для скорректированных названий без достаточного количества точных совпадений
+        if corrected:
+            results = self.search_cities(names=list(corrected.values()), found=list(partial.values()), top_k=top_k,
+                                         mask=mask, distances=distances, output_dict_json=output_dict_json,
+                                         batch_size=batch_size)
+            unique_results.update(zip(corrected, results))
+        # результат в порядке входного списка, повторные названия получают копии результата,
+        # чтобы изменение одного результата не меняло другие
+        results, seen = [], set()
+        for city in cities:
+            results.append(copy.deepcopy(unique_results[city]) if city in seen else unique_results[city])
+            seen.add(city)
+        return results
+
+    def search_cities(self, names=None, found=None, top_k=1, mask=None, distances=None, output_dict_json=False,
+                      batch_size=64):
+        """
+        Метод search_cities класса FindCity.
+        Векторный поиск для списка уже скорректированных названий (результат resolve): векторы
+        уникальных названий создаются батчами модели, поиск выполняется для всех названий сразу,
+        точные совпадения каждого названия идут первыми.
+
+         Параметры:
+            names (list): скорректированные названия городов, по умолчанию равно None,
+            found (list): результаты exact_search (или None) в порядке names, по умолчанию равно None,
+            top_k (int): количество наиболее похожих городов для вывода, по умолчанию равно 1,
+            mask (np.ndarray): булева маска допустимых строк датасета, по умолчанию равно None - все,
+            distances (np.ndarray): расстояния от точки near до городов по строкам датасета,
+                                    по умолчанию равно None,
+            output_dict_json (bool): флаг вывода результата в виде списков словарей,
+                                     по умолчанию равно False,
+            batch_size (int): размер батча для создания векторов, по умолчанию равно 64.
+
+         Возвращаемое значение:
+            results (list): список датафреймов или списков словарей в порядке names.
+        """
+        found = found if found is not None else [None] * len(names)
+        unique_names = list(dict.fromkeys(names))
+        # векторы уникальных названий батчами модели
+        vectors = self.encode(cities=unique_names, batch_size=batch_size)
+        # поиск для всех уникальных названий сразу
+        scores, indices, fused = self.search(vectors=vectors, top_k=top_k, mask=mask, distances=distances,
+                                             cities=unique_names, return_fused=True)
+        positions = {name: pos for pos, name in enumerate(unique_names)}
+        results = []
+        for name, exact in zip(names, found):
+            pos = positions[name]
+            merged = self.merge_exact(found=exact, scores=scores[pos], indices=indices[pos], top_k=top_k,
+                                      fused=None if fused is None else fused[pos])
+            results.append(self.found_result(found=merged, output_dict_json=output_dict_json))
+        return results
+
+    def reverse_geocode_batch(
+            self,
+            latitudes=None,
+            longitudes=None,
+            top_k=1,
+            radius_km=None,
+            output_dict_json=False,
+            countries=None,
+            min_population=None,
+            feature_codes=None,
+            bbox=None,
+    ):
+        """
+        Пакетное обратное геокодирование: поиск ближайших городов для списка точек
+        по пространственному индексу, модель не используется.
+
+         Параметры:
+            latitudes (list): широты точек в градусах, по умолчанию равно None,
+            longitudes (list): долготы точек в градусах, по умолчанию равно None,
+            top_k (int): количество ближайших городов, если задан radius_km и top_k равно None,
+                         то выводятся все города в радиусе, по умолчанию равно 1,
+            radius_km (float): радиус поиска в километрах, по умолчанию равно None - без ограничения,
+            output_dict_json (bool): флаг вывода результата в виде списков словарей,
+                                     по умолчанию равно False,
+            countries (str или list): страна или список стран для поиска, по умолчанию равно None - все,
+            min_population (int): минимальное население города, по умолчанию равно None - без фильтра,
+            feature_codes (str или list): код или список кодов объектов geonames, по умолчанию равно None - все,
+            bbox (list): прямоугольник координат (min_lat, min_lon, max_lat, max_lon),
+                         по умолчанию равно None - без фильтра.
+
+         Возвращаемое значение:
+            results (list): список датафреймов или списков словарей со столбцом distance_km
+                            (расстояние в километрах), по одному на каждую точку.
+        """
+        if len(latitudes) != len(longitudes):
+            raise ValueError("Количество широт и долгот должно совпадать.")
+        if radius_km is None and top_k is None:
+            raise ValueError("Нужно задать top_k, radius_km или оба параметра.")
+        mask = self.filter_mask(countries=countries, min_population=min_population, feature_codes=feature_codes,
+                                bbox=bbox)
+        spatial_index = self.get_spatial_index()
+        if radius_km is None:
+            distances, indices = spatial_index.nearest(latitude=latitudes, longitude=longitudes, k=top_k, mask=mask)
+            found = zip(distances, indices)
         else:
-            # возвращаем датафрейм
-            return result_df
+            found = [
+                (distances[:top_k], indices[:top_k])
+                for distances, indices in spatial_index.within(latitude=latitudes, longitude=longitudes,
+                                                               radius_km=radius_km, mask=mask)
+            ]
+        return [
+            self.make_result(indices=indices, scores=distances, output_dict_json=output_dict_json,
+                             score_col="distance_km")
+            for distances, indices in found
+        ]
 
+    def reverse_geocode(self, latitude=None, longitude=None, **params):
+        """
+        Обратное геокодирование одной точки: поиск ближайших городов или городов в радиусе.
+
+         Параметры:
+            latitude (float): широта точки в градусах, по умолчанию равно None,
+            longitude (float): долгота точки в градусах, по умолчанию равно None,
+            **params: параметры метода reverse_geocode_batch (top_k, radius_km, фильтры).
+
+         Возвращаемое значение:
+            result_df (pd.DataFrame): если вывод таблицей,
+            output_dict (list): если вывод словарём.
+        """
+        return self.reverse_geocode_batch(latitudes=[latitude], longitudes=[longitude], **params)[0]
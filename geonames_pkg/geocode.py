@@ -0,0 +1,218 @@
+# скрипт для пакетного сопоставления названий городов из файла CSV/JSONL/Parquet
+# Пример запуска:
+#   python geocode.py input.csv output.csv --column city --top-k 1 --speller local
+#   python geocode.py input.csv output.csv --column city --resume
+import argparse
+import json
+import os
+import re
+import shutil
+import time
+import pandas as pd
+import pyarrow.parquet as pq
+from config import (CONN_STR_GEONAMES, QUERY, COUNTRIES_LST, POPULATION, COLS_OUTPUT, SNAPSHOT_DIR,
+                    SPELLER, FINDER_PARAMS)
+from database import DataFrameSQL
+from finder import FindCity
+from sqlalchemy import create_engine
+
+# поддерживаемые форматы файлов
+FORMATS = ("csv", "jsonl", "parquet")
+# имя файла части результата в формате parquet, ChunkWriter не трогает другие файлы директории
+PART_FILE = re.compile(r"^part-(\d{6})\.parquet$")
+
+
+def detect_format(path, file_format=None):
+    """
+    Функция определения формата файла по расширению, если формат не задан явно.
+    Параметры:
+            path (str): путь к файлу,
+            file_format (str): явно заданный формат, по умолчанию равно None.
+    Возвращаемое значение:
+            (str): формат файла 'csv', 'jsonl' или 'parquet'.
+    """
+    if file_format is None:
+        file_format = os.path.splitext(path)[1].lstrip(".").lower()
+        file_format = "jsonl" if file_format in ("json", "ndjson") else file_format
+    if file_format not in FORMATS:
+        raise ValueError(f"Неизвестный формат файла {path}, допустимые форматы: {FORMATS}.")
+    return file_format
+
+
+def read_chunks(path, column, chunk_size, file_format):
+    """
+    Функция чтения входного файла по частям, в памяти находится только одна часть.
+    Параметры:
+            path (str): путь к входному файлу,
+            column (str): столбец с названиями городов,
+            chunk_size (int): количество строк в части,
+            file_format (str): формат файла 'csv', 'jsonl' или 'parquet'.
+    Возвращаемое значение:
+            генератор списков названий городов.
+    """
+    if file_format == "csv":
+        for chunk in pd.read_csv(path, usecols=[column], dtype=str, chunksize=chunk_size, keep_default_na=False):
+            yield chunk[column].tolist()
+    elif file_format == "jsonl":
+        for chunk in pd.read_json(path, lines=True, dtype=False, chunksize=chunk_size):
+            yield chunk[column].fillna("").astype(str).tolist()
+    else:
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size, columns=[column]):
+            yield batch.column(0).to_pandas().fillna("").astype(str).tolist()
+
+
+class ChunkWriter:
+    """
+    Класс ChunkWriter для записи результата по частям с фиксацией прогресса.
+    После записи каждой части данные сбрасываются на диск, а в файл состояния
+    <output>.state.json записываются количество обработанных частей и строк и размер
+    выходного файла. При возобновлении выходной файл обрезается до зафиксированного размера.
+    """
+
+    def __init__(self, path=None, file_format=None, resume=False):
+        """
+        Инициализация объекта класса ChunkWriter.
+
+         Параметры:
+              path (str): путь к выходному файлу (для parquet - директория с частями),
+                          по умолчанию равно None,
+              file_format (str): формат 'csv', 'jsonl' или 'parquet', по умолчанию равно None,
+              resume (bool): флаг продолжения с последней зафиксированной части, по умолчанию равно False.
+        """
+        self.path = path
+        self.file_format = file_format
+        self.state_path = path.rstrip("/") + ".state.json"
+        self.state = {"chunks": 0, "rows": 0, "size": 0}
+        if resume and os.path.exists(self.state_path):
+            with open(self.state_path) as fp:
+                self.state = json.load(fp)
+        self._rollback()
+
+    def _rollback(self):
+        """
+        Метод _rollback класса ChunkWriter.
+        Удаление данных, записанных после последней зафиксированной части.
+        """
+        if self.file_format == "parquet":
+            if self.state["chunks"] == 0:
+                shutil.rmtree(self.path, ignore_errors=True)
+            os.makedirs(self.path, exist_ok=True)
+            for file in os.listdir(self.path):
+                match = PART_FILE.match(file)
+                if match is not None and int(match.group(1)) >= self.state["chunks"]:
+                    os.remove(os.path.join(self.path, file))
+        else:
+            with open(self.path, "ab") as fp:
+                fp.truncate(self.state["size"])
+
+    def write(self, result=None, rows=0):
+        """
+        Метод write класса ChunkWriter.
+        Запись результата одной части и фиксация прогресса.
+
+         Параметры:
+              result (pd.DataFrame): результат для части, по умолчанию равно None,
+              rows (int): количество входных строк в части, по умолчанию равно 0.
+        """
+        if self.file_format == "parquet":
+            result.to_parquet(os.path.join(self.path, f"part-{self.state['chunks']:06d}.parquet"), index=False)
+            size = 0
+        else:
+            with open(self.path, "a", encoding="utf-8", newline="") as fp:
+                if self.file_format == "csv":
+                    result.to_csv(fp, index=False, header=self.state["size"] == 0)
+                else:
+                    lines = result.to_json(orient="records", lines=True, force_ascii=False) if len(result) else ""
+                    fp.write(lines if lines.endswith("\n") or not lines else lines + "\n")
+                fp.flush()
+                os.fsync(fp.fileno())
+                size = fp.tell()
+        self.state = {"chunks": self.state["chunks"] + 1, "rows": self.state["rows"] + rows, "size": size}
+        # файл состояния заменяется атомарно
+        with open(self.state_path + ".tmp", "w") as fp:
+            json.dump(self.state, fp)
+        os.replace(self.state_path + ".tmp", self.state_path)
+
+
+def load_finder():
+    """
+    Функция создания объекта FindCity из снимка данных, если он есть, иначе из БД,
+    с теми же параметрами из config файла (FINDER_PARAMS), что и у веб-приложения.
+    Возвращаемое значение:
+            finder (FindCity): объект поиска городов.
+    """
+    if os.path.exists(SNAPSHOT_DIR):
+        return FindCity.from_snapshot(path=SNAPSHOT_DIR, **FINDER_PARAMS)
+    data_loader = DataFrameSQL(engine=create_engine(CONN_STR_GEONAMES))
+    data, embeddings = data_loader.from_sql_stream(query=QUERY, countries=COUNTRIES_LST, population=POPULATION)
+    return FindCity(dataset=data, embeddings=embeddings, **FINDER_PARAMS)
+
+
+def match_chunk(finder, names, first_row, top_k, adv_spell_check, speller, batch_size):
+    """
+    Функция сопоставления одной части названий: пустые названия пропускаются,
+    повторы внутри части обрабатываются один раз в FindCity.get_cities.
+    Параметры:
+            finder (FindCity): объект поиска городов,
+            names (list): названия городов части,
+            first_row (int): номер первой строки части во входном файле,
+            top_k (int): количество городов для каждого названия,
+            adv_spell_check (bool): флаг расширенной проверки названия города,
+            speller (str): корректор для первичной проверки 'yandex', 'local' или None,
+            batch_size (int): размер батча модели.
+    Возвращаемое значение:
+            (pd.DataFrame): строки результата с номером входной строки, запросом и рангом.
+    """
+    rows = [(first_row + i, name) for i, name in enumerate(names) if name.strip()]
+    results = finder.get_cities(cities=[name for _, name in rows], top_k=top_k, adv_spell_check=adv_spell_check,
+                                output_dict_json=True, batch_size=batch_size, speller=speller) if rows else []
+    records = [
+        {"row": row, "query": name, "rank": rank, **match}
+        for (row, name), matches in zip(rows, results)
+        for rank, match in enumerate(matches, start=1)
+    ]
+    # при гибридном поиске итоговая оценка выводится отдельным столбцом score
+    scores = ["cos_sim_score", "score"] if finder.fused_scores else ["cos_sim_score"]
+    return pd.DataFrame(records, columns=["row", "query", "rank", *COLS_OUTPUT, *scores])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Пакетное сопоставление названий городов с geonames.")
+    parser.add_argument("input", help="входной файл CSV, JSONL или Parquet")
+    parser.add_argument("output", help="выходной файл CSV, JSONL или директория для Parquet")
+    parser.add_argument("--column", default="city", help="столбец с названиями городов")
+    parser.add_argument("--input-format", choices=FORMATS, help="формат входного файла")
+    parser.add_argument("--output-format", choices=FORMATS, help="формат выходного файла")
+    parser.add_argument("--chunk-size", type=int, default=10000, help="количество строк в части")
+    parser.add_argument("--batch-size", type=int, default=64, help="размер батча модели")
+    parser.add_argument("--top-k", type=int, default=1, help="количество городов для каждого названия")
+    parser.add_argument("--adv-spell-check", action="store_true", help="расширенная проверка названий")
+    parser.add_argument("--speller", default=SPELLER, choices=["yandex", "local", "none"],
+                        help="корректор опечаток")
+    parser.add_argument("--resume", action="store_true", help="продолжить с последней зафиксированной части")
+    args = parser.parse_args()
+
+    input_format = detect_format(args.input, args.input_format)
+    output_format = detect_format(args.output, args.output_format)
+    speller = None if args.speller == "none" else args.speller
+    writer = ChunkWriter(path=args.output, file_format=output_format, resume=args.resume)
+    if writer.state["chunks"]:
+        print(f"Продолжаем с части {writer.state['chunks']}, обработано строк: {writer.state['rows']}.")
+    finder = load_finder()
+    start = time.perf_counter()
+    processed = 0
+    for number, names in enumerate(read_chunks(args.input, args.column, args.chunk_size, input_format)):
+        # зафиксированные части пропускаем
+        if number < writer.state["chunks"]:
+            continue
+        result = match_chunk(finder, names, writer.state["rows"], args.top_k, args.adv_spell_check, speller,
+                             args.batch_size)
+        writer.write(result=result, rows=len(names))
+        processed += len(names)
+        rate = processed / (time.perf_counter() - start)
+        print(f"Часть {number}: всего строк {writer.state['rows']}, {rate:.0f} строк/с")
+    print(f"Готово! Обработано строк: {writer.state['rows']}, результат в {args.output}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+# конфигурация gunicorn для запуска веб-приложения несколькими рабочими процессами:
+# gunicorn -c gunicorn.conf.py main:app
+# Родительский процесс один раз загружает матрицу векторов и метаданные и размещает их
+# в общей памяти при чтении этого файла, т.е. до загрузки приложения. preload_app загружает
+# main.py в родительском процессе уже после этого, поэтому FindCity подключается к общей памяти
+# (FindCity.from_shared), а не строит свою копию, и рабочие процессы после fork используют
+# те же страницы памяти. Веса модели, загруженные до fork, тоже общие.
+import os
+from config import CONN_STR_GEONAMES, QUERY, COUNTRIES_LST, POPULATION, SNAPSHOT_DIR
+from database import DataFrameSQL
+from shared_store import SHM_ENV, publish_shared, unlink_shared
+from snapshot import load_snapshot
+from vector_index import NameGroups
+from sqlalchemy import create_engine
+
+bind = "0.0.0.0:8000"
+workers = 4
+# потоки рабочего процесса: одновременные запросы проверяются корректором параллельно,
+# а векторный поиск для них выполняется одним пакетом планировщика BatchScheduler
+threads = 8
+preload_app = True
+
+
+def publish_data():
+    # загрузка данных из снимка, если он есть, иначе из БД
+    if os.path.exists(SNAPSHOT_DIR):
+        metadata, embeddings, _ = load_snapshot(path=SNAPSHOT_DIR, mmap=False)
+    else:
+        data_loader = DataFrameSQL(engine=create_engine(CONN_STR_GEONAMES))
+        metadata, embeddings = data_loader.from_sql_stream(query=QUERY, countries=COUNTRIES_LST,
+                                                           population=POPULATION)
+    # в общей памяти хранится матрица уникальных названий (снимок уже содержит ее)
+    embeddings = NameGroups(names=metadata["name"]).collapse(embeddings)
+    # размещение в общей памяти, описание сегментов передается через переменную окружения
+    publish_shared(metadata=metadata, embeddings=embeddings)
+
+
+# данные размещаются при чтении конфигурации, до preload_app; при перезагрузке конфигурации
+# (HUP) переменная окружения уже задана и сегменты не создаются повторно
+if SHM_ENV not in os.environ:
+    publish_data()
+
+
+def on_exit(server):
+    # удаление сегментов общей памяти при остановке
+    unlink_shared()
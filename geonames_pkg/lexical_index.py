@@ -0,0 +1,161 @@
+# файл с классом лексического индекса по символьным n-граммам названий городов
+# базовые импорты
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+# импорты для транслитерации
+from transliterate import translit
+
+# импорт ключа нормализации названий
+from alias_index import exact_key
+
+
+def transliterate_all(values=None):
+    """
+    Функция транслитерации списка строк с кириллицы в латиницу.
+    Параметр:
+            values (list): список строк, по умолчанию равно None.
+    Возвращаемое значение:
+            (list): список транслитераций в том же порядке.
+    """
+    return [translit(value, "ru", reversed=True) for value in values]
+
+
+class NgramIndex:
+    """
+    Класс NgramIndex - разреженный TF-IDF индекс символьных n-грамм названий городов.
+    Документы индекса - различные значения name, asciiname, alternatenames и их транслитерации,
+    каждое значение связано с объектами поиска (строками датасета или уникальными названиями).
+    Оценка объекта для запроса - максимальное косинусное сходство запроса с его значениями,
+    все оценки считаются произведениями разреженных матриц.
+    """
+
+    def __init__(self, dataset=None, entity_ids=None, n_entities=None,
+                 columns=("name", "asciiname", "alternatenames"), ngram=3):
+        """
+        Инициализация объекта класса NgramIndex.
+
+         Параметры:
+              dataset (pd.DataFrame): датасет с городами, по умолчанию равно None,
+              entity_ids (np.ndarray): номер объекта поиска для каждой строки датасета, например
+                                       номер уникального названия, по умолчанию равно None - номер строки,
+              n_entities (int): количество объектов поиска, по умолчанию равно None - количество строк,
+              columns (tuple): поля с названиями, значения alternatenames разделены запятыми,
+                               по умолчанию равно ('name', 'asciiname', 'alternatenames'),
+              ngram (int): длина n-граммы, по умолчанию равно 3.
+        """
+        positions = np.arange(len(dataset))
+        entity_ids = positions if entity_ids is None else np.asarray(entity_ids)
+        self.n_entities = len(dataset) if n_entities is None else n_entities
+        parts = []
+        for col in columns:
+            if col not in dataset.columns:
+                continue
+            values = pd.Series(dataset[col].to_numpy(dtype=object), index=positions).dropna().astype(str)
+            if col == "alternatenames":
+                values = values.str.split(",").explode()
+            parts.append(values)
+        aliases = pd.concat(parts)
+        # нормализуем и транслитерируем только уникальные значения
+        codes, uniques = pd.factorize(aliases.to_numpy())
+        keys = np.array([exact_key(value) for value in uniques], dtype=object)
+        keys_t = np.array(transliterate_all(keys), dtype=object)
+        rows = aliases.index.to_numpy(dtype=np.int64)
+        # пары (значение, объект) для исходных значений и транслитераций
+        variants = np.concatenate([keys[codes], keys_t[codes]])
+        entities = np.concatenate([entity_ids[rows], entity_ids[rows]])
+        filled = variants != ""
+        variant_codes, self.variants = pd.factorize(variants[filled])
+        pairs = pd.DataFrame({"variant": variant_codes, "entity": entities[filled]}).drop_duplicates()
+        # матрица связи значений и объектов поиска
+        self.variant_entities = sparse.csr_matrix(
+            (np.ones(len(pairs), dtype=np.float32), (pairs["variant"].to_numpy(), pairs["entity"].to_numpy())),
+            shape=(len(self.variants), self.n_entities),
+        )
+        # char_wb строит n-граммы внутри слов, дополненных пробелами, поэтому начало и конец слова учитываются
+        self.vectorizer = TfidfVectorizer(analyzer="char_wb", ngram_range=(ngram, ngram), lowercase=False,
+                                          sublinear_tf=True, dtype=np.float32)
+        # транспонированная матрица значений для умножения матрицы запросов справа
+        self.matrix_t = self.vectorizer.fit_transform(self.variants).T.tocsr()
+
+    def scores(self, cities=None):
+        """
+        Метод scores класса NgramIndex.
+        Лексические оценки объектов поиска для пачки запросов. Запрос сравнивается с
+        индексом в исходном виде и в транслитерации, берется максимум из двух оценок.
+        Результат разреженный: хранятся только объекты, имеющие общие n-граммы с запросом.
+
+         Параметры:
+              cities (list): список названий городов, по умолчанию равно None.
+         Возвращаемое значение:
+              scores (sparse.csr_matrix): оценки float32 размером (количество запросов, количество объектов),
+                                          отсутствующее значение - нет общих n-грамм.
+        """
+        keys = [exact_key(city) for city in cities]
+        queries = self.vectorizer.transform(keys + transliterate_all(keys))
+        sim = queries @ self.matrix_t
+        sim = sim[:len(keys)].maximum(sim[len(keys):]).tocoo()
+        # раскрываем каждое найденное значение во все его объекты
+        indptr = self.variant_entities.indptr
+        degrees = indptr[sim.col + 1] - indptr[sim.col]
+        offsets = np.arange(int(degrees.sum())) - np.repeat(np.cumsum(degrees) - degrees, degrees)
+        entities = self.variant_entities.indices[np.repeat(indptr[sim.col], degrees) + offsets]
+        rows = np.repeat(sim.row, degrees)
+        data = np.repeat(sim.data, degrees).astype(np.float32)
+        # максимум по значениям одного объекта: после сортировки первая пара (запрос, объект) - наибольшая
+        order = np.lexsort((-data, entities, rows))
+        rows, entities, data = rows[order], entities[order], data[order]
+        first = np.ones(len(rows), dtype=bool)
+        first[1:] = (rows[1:] != rows[:-1]) | (entities[1:] != entities[:-1])
+        return sparse.csr_matrix((data[first], (rows[first], entities[first])), shape=(len(keys), self.n_entities))
+
+
+def top_k_sparse(sim=None, top_k=1, mask=None):
+    """
+    Функция отбора top_k наибольших значений в каждой строке разреженной матрицы сходства
+    без перевода ее в плотную.
+    Параметры:
+            sim (sparse.csr_matrix): матрица сходства размером (количество запросов, количество объектов),
+                                     по умолчанию равно None,
+            top_k (int): количество отбираемых значений, по умолчанию равно 1,
+            mask (np.ndarray): булева маска допустимых объектов, по умолчанию равно None - все.
+    Возвращаемое значение:
+            scores (np.ndarray): отсортированные по убыванию значения размером (количество запросов, top_k),
+                                 0 - значений в строке меньше top_k,
+            indices (np.ndarray): номера объектов размером (количество запросов, top_k), -1 - объект не найден.
+    """
+    n_rows = sim.shape[0]
+    rows = np.repeat(np.arange(n_rows), np.diff(sim.indptr))
+    cols, data = sim.indices, sim.data
+    if mask is not None:
+        keep = mask[cols]
+        rows, cols, data = rows[keep], cols[keep], data[keep]
+    # порядок по строкам и убыванию значения, ранг значения внутри строки
+    order = np.lexsort((-data, rows))
+    rows, cols, data = rows[order], cols[order], data[order]
+    starts = np.searchsorted(rows, np.arange(n_rows))
+    ranks = np.arange(len(rows)) - starts[rows]
+    top = ranks < top_k
+    scores = np.zeros((n_rows, top_k), dtype=np.float32)
+    indices = np.full((n_rows, top_k), -1, dtype=np.int64)
+    scores[rows[top], ranks[top]] = data[top]
+    indices[rows[top], ranks[top]] = cols[top]
+    return scores, indices
+
+
+def sparse_values(sim=None, indices=None):
+    """
+    Функция выборки значений разреженной матрицы сходства для кандидатов каждой строки.
+    Параметры:
+            sim (sparse.csr_matrix): матрица сходства размером (количество запросов, количество объектов),
+                                     по умолчанию равно None,
+            indices (np.ndarray): номера объектов размером (количество запросов, количество кандидатов),
+                                  по умолчанию равно None.
+    Возвращаемое значение:
+            (np.ndarray): значения float32 размером indices, 0 - значения нет в матрице.
+    """
+    rows = np.repeat(np.arange(indices.shape[0]), indices.shape[1])
+    values = sim[rows, indices.ravel()]
+    return np.asarray(values, dtype=np.float32).reshape(indices.shape)
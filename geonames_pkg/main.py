@@ -1,7 +1,14 @@
 # главный исполняемый скрипт проекта
-from flask import Flask, render_template, request
-from config import CONN_STR_GEONAMES, QUERY, COUNTRIES_LST, POPULATION, COLS_OUTPUT, MODEL_ID, OUT_DIR
+import gzip
+import json
+import os
+from flask import Flask, Response, jsonify, render_template, request
+from config import (CONN_STR_GEONAMES, QUERY, COUNTRIES_LST, POPULATION, SPELLER, SNAPSHOT_DIR,
+                    BATCH_MAX_WAIT_MS, BATCH_MAX_SIZE, BATCH_TIMEOUT_S, FINDER_PARAMS,
+                    API_MAX_NAMES, API_GZIP_MIN_SIZE)
 from finder import FindCity
+from scheduler import BatchScheduler
+from shared_store import SHM_ENV
 from database import DataFrameSQL
 from sqlalchemy import create_engine
 
@@ -14,17 +21,30 @@ def get_data():
     engine = create_engine(CONN_STR_GEONAMES)
     # инициализируем объект класса DataFrameSQL
     data_loader = DataFrameSQL(engine=engine)
-    # формируем датасет с данными согласно запросу, списку стран и населению из config файла
-    df = data_loader.from_sql(query=QUERY, countries=COUNTRIES_LST, population=POPULATION)
-    # возврат датафрейма
-    return df
+    # формируем метаданные и нормализованную матрицу векторов согласно запросу, списку стран и населению
+    # из config файла, векторы читаются серверным курсором сразу в матрицу float32
+    metadata, embeddings = data_loader.from_sql_stream(query=QUERY, countries=COUNTRIES_LST, population=POPULATION)
+    # возврат датафрейма и матрицы векторов
+    return metadata, embeddings
 
 
-# вызов функции get_data()
-data = get_data()
-# инициализируем объект класса FindCity с параметрами из config файла
-finder = FindCity(model_id=MODEL_ID, device="cpu", dataset=data,
-                  emb_col="embeddings", cols_output=COLS_OUTPUT)
+# параметры FindCity берутся из config файла (FINDER_PARAMS)
+# если родительский процесс gunicorn разместил данные в общей памяти, то подключаемся к ним
+if SHM_ENV in os.environ:
+    finder = FindCity.from_shared(device="cpu", **FINDER_PARAMS)
+# если есть снимок данных, то матрица векторов отображается в память без запроса к БД
+elif os.path.exists(SNAPSHOT_DIR):
+    finder = FindCity.from_snapshot(path=SNAPSHOT_DIR, device="cpu", **FINDER_PARAMS)
+else:
+    # вызов функции get_data()
+    data, embeddings = get_data()
+    # инициализируем объект класса FindCity с параметрами из config файла
+    finder = FindCity(device="cpu", dataset=data, embeddings=embeddings, **FINDER_PARAMS)
+    # FindCity хранит матрицу уникальных названий, полная матрица больше не нужна
+    del embeddings
+# планировщик собирает одновременные запросы в пакеты для одного вызова модели,
+# фоновый поток запускается при первом запросе в каждом рабочем процессе
+scheduler = BatchScheduler(finder=finder, max_wait_ms=BATCH_MAX_WAIT_MS, max_batch_size=BATCH_MAX_SIZE)
 
 
 @app.route('/', methods=['GET', 'POST'])
@@ -40,9 +60,13 @@ def index():
         adv_spell_check = bool(request.form.get('adv_spell_check'))
         # получаем флаг нужен ли вывод в словарь из файла index.html
         output_dict_json = bool(request.form.get('output_dict_json'))
-        # методом get_city класса FindCity получаем результат
-        result = finder.get_city(city=city, top_k=top_k, adv_spell_check=adv_spell_check,
-                                 output_dict_json=output_dict_json, work_dir=OUT_DIR)
+        # получаем результат через планировщик, который обрабатывает одновременные запросы одним пакетом
+        try:
+            result = scheduler.match(city=city, top_k=top_k, adv_spell_check=adv_spell_check,
+                                     output_dict_json=output_dict_json, speller=SPELLER, timeout=BATCH_TIMEOUT_S)
+        except TimeoutError:
+            # результат не получен за BATCH_TIMEOUT_S секунд
+            return Response("Сервис перегружен, повторите запрос позже.", status=503, mimetype="text/plain")
         if isinstance(result, list) and all(isinstance(d, dict) for d in result):
             # если результат - список словарей, подготовим его для отображения в шаблоне
             return render_template('index.html', result_list=result)
@@ -52,5 +76,145 @@ def index():
             return render_template('index.html', tables=[result_html], titles=result.columns.values)
 
 
+# функция формирования JSON ответа API со сжатием gzip для больших ответов
+def json_response(payload, status=200):
+    # компактный JSON без пробелов и с кириллицей без экранирования
+    body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    headers = {"Vary": "Accept-Encoding"}
+    # если клиент принимает gzip и ответ большой, то сжимаем его
+    if len(body) >= API_GZIP_MIN_SIZE and "gzip" in request.headers.get("Accept-Encoding", ""):
+        body = gzip.compress(body, compresslevel=5)
+        headers["Content-Encoding"] = "gzip"
+    return Response(body, status=status, mimetype="application/json", headers=headers)
+
+
+@app.route('/api/v1/match', methods=['POST'])
+def api_match():
+    # тело запроса: {"names": [...], "top_k": 1, "adv_spell_check": false, "speller": "local",
+    #                "countries": [...], "min_population": 15000, "feature_codes": ["PPLC", "PPLA"],
+    #                "bbox": [min_lat, min_lon, max_lat, max_lon], "near": [lat, lon]}
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return json_response({"error": "Тело запроса должно быть JSON объектом."}, status=400)
+    names = payload.get("names")
+    if not isinstance(names, list) or not names or not all(isinstance(name, str) for name in names):
+        return json_response({"error": "Поле names должно быть непустым списком строк."}, status=400)
+    if len(names) > API_MAX_NAMES:
+        return json_response({"error": f"Не больше {API_MAX_NAMES} названий в одном запросе."}, status=400)
+    top_k = payload.get("top_k", 1)
+    if not is_positive_int(top_k):
+        return json_response({"error": "Поле top_k должно быть положительным целым числом."}, status=400)
+    speller = payload.get("speller", SPELLER)
+    if speller not in ("yandex", "local", None):
+        return json_response({"error": "Поле speller должно быть 'yandex', 'local' или null."}, status=400)
+    bbox = payload.get("bbox")
+    if bbox is not None and (not isinstance(bbox, list) or len(bbox) != 4
+                             or not all(is_number(value) for value in bbox)):
+        return json_response({"error": "Поле bbox должно быть списком [min_lat, min_lon, max_lat, max_lon]."},
+                             status=400)
+    near = payload.get("near")
+    if near is not None and not is_point(near):
+        return json_response({"error": "Поле near должно быть списком [lat, lon]."}, status=400)
+    error = filters_error(payload)
+    if error is not None:
+        return json_response({"error": error}, status=400)
+    # названия ставятся в очередь планировщика вместе с одиночными запросами, поэтому большой
+    # пакетный запрос ограничен тем же временем BATCH_TIMEOUT_S и при перегрузке получает 503
+    try:
+        results = scheduler.match_many(
+            cities=names,
+            timeout=BATCH_TIMEOUT_S,
+            top_k=top_k,
+            adv_spell_check=bool(payload.get("adv_spell_check", False)),
+            output_dict_json=True,
+            speller=speller,
+            countries=payload.get("countries"),
+            min_population=payload.get("min_population"),
+            feature_codes=payload.get("feature_codes"),
+            bbox=bbox,
+            near=near,
+        )
+    except TimeoutError:
+        return json_response({"error": "Сервис перегружен, повторите запрос позже."}, status=503)
+    return json_response({"results": [{"query": name, "matches": matches}
+                                      for name, matches in zip(names, results)]})
+
+
+# функция проверки числа из JSON: bool в Python - подкласс int, но числом не считается
+def is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+# функция проверки положительного целого числа
+def is_positive_int(value):
+    return isinstance(value, int) and not isinstance(value, bool) and value >= 1
+
+
+# функция проверки строки или списка строк
+def is_str_list(value):
+    return isinstance(value, str) or (isinstance(value, list) and all(isinstance(x, str) for x in value))
+
+
+# функция проверки точки [широта, долгота]
+def is_point(value):
+    return (isinstance(value, list) and len(value) == 2 and all(is_number(x) for x in value)
+            and -90 <= value[0] <= 90 and -180 <= value[1] <= 180)
+
+
+# функция проверки фильтров countries, min_population и feature_codes, возвращает текст ошибки или None
+def filters_error(payload):
+    if payload.get("countries") is not None and not is_str_list(payload["countries"]):
+        return "Поле countries должно быть строкой или списком строк."
+    min_population = payload.get("min_population")
+    if min_population is not None and (not is_number(min_population) or min_population < 0):
+        return "Поле min_population должно быть неотрицательным числом."
+    if payload.get("feature_codes") is not None and not is_str_list(payload["feature_codes"]):
+        return "Поле feature_codes должно быть строкой или списком строк."
+    return None
+
+
+@app.route('/api/v1/reverse', methods=['POST'])
+def api_reverse():
+    # тело запроса: {"points": [[lat, lon], ...], "top_k": 1, "radius_km": 50,
+    #                "countries": [...], "min_population": 15000, "feature_codes": [...]}
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return json_response({"error": "Тело запроса должно быть JSON объектом."}, status=400)
+    points = payload.get("points")
+    if not isinstance(points, list) or not points or not all(is_point(point) for point in points):
+        return json_response({"error": "Поле points должно быть непустым списком [lat, lon]."}, status=400)
+    if len(points) > API_MAX_NAMES:
+        return json_response({"error": f"Не больше {API_MAX_NAMES} точек в одном запросе."}, status=400)
+    radius_km = payload.get("radius_km")
+    if radius_km is not None and (not is_number(radius_km) or radius_km <= 0):
+        return json_response({"error": "Поле radius_km должно быть положительным числом."}, status=400)
+    top_k = payload.get("top_k", 1 if radius_km is None else None)
+    if top_k is not None and not is_positive_int(top_k):
+        return json_response({"error": "Поле top_k должно быть положительным целым числом."}, status=400)
+    error = filters_error(payload)
+    if error is not None:
+        return json_response({"error": error}, status=400)
+    # обратное геокодирование не использует модель и очередь планировщика: запрос к пространственному
+    # индексу для API_MAX_NAMES точек выполняется за миллисекунды и не требует ограничения по времени
+    results = finder.reverse_geocode_batch(
+        latitudes=[point[0] for point in points],
+        longitudes=[point[1] for point in points],
+        top_k=top_k,
+        radius_km=radius_km,
+        output_dict_json=True,
+        countries=payload.get("countries"),
+        min_population=payload.get("min_population"),
+        feature_codes=payload.get("feature_codes"),
+    )
+    return json_response({"results": [{"point": point, "matches": matches}
+                                      for point, matches in zip(points, results)]})
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    # метрики планировщика пакетов, кэша векторов запросов и индекса точных совпадений
+    return jsonify(scheduler=scheduler.metrics(), cache=finder.cache_info(), exact=finder.exact_info())
+
+
 if __name__ == '__main__':
     app.run(debug=True)
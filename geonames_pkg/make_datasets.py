@@ -13,20 +13,36 @@ from config import (
     ADMIN_CODE_FILE,
     ADMIN_COLS,
     USE_ADMIN_COLS,
-    MODEL_ID
+    MODEL_ID,
+    ENCODER,
+    ENCODER_PARAMS,
+    EMB_BATCH_SIZE,
+    EMB_PROCESSES,
+    EMB_CHECKPOINT_DIR,
+    EMB_INCREMENTAL,
+    DATASET_FORMAT,
+    CITY_FILTERS,
+    PARSE_PROCESSES,
+    ARROW_STRINGS,
 )
 from dataset import DatasetLoader, reduce_mem_usage, remove_difference, preprocess_data
+from encoders import embedding_info
 import gc
+import os
+import pandas as pd
 
 
 def main():
     # создаем объект loader класса DatasetLoader
     loader = DatasetLoader(work_dir=SRC_DIR)
-    # создаем датафрейм с городами, пропуская через функцию reduce_mem_usage
+    # создаем датафрейм с городами, пропуская через функцию reduce_mem_usage,
+    # файл читается блоками, и в памяти остаются только строки, прошедшие фильтры из config файла
     cities = reduce_mem_usage(
-        loader.load_dataset(
-            file=CITY_FILE, df_cols=CITY_COLS, use_cols=USE_CITY_COLS, col_types=COL_TYPES
-        )
+        loader.load_dataset_filtered(
+            file=CITY_FILE, df_cols=CITY_COLS, use_cols=USE_CITY_COLS, col_types=COL_TYPES,
+            processes=PARSE_PROCESSES, **CITY_FILTERS
+        ),
+        arrow_strings=ARROW_STRINGS,
     )
     # преодбработка датафрейма с городами
     cities = preprocess_data(dataset=cities, city_or_country="city")
@@ -47,13 +63,35 @@ def main():
     # преодбработка датафрейма с областями
     admin_codes = remove_difference(cities=cities, admin_codes=admin_codes)
     # создаем датафрейм с векторами имен городов
-    embeddings = loader.load_city_embeddings(
-        device=DEVICE, model_id=MODEL_ID, id_emb_col=cities["name"]
-    )
-    # сохраняем датафреймы на диск с zip компрессией
+    emb_file = os.path.join(DATA_DIR, "embeddings")
+    if EMB_INCREMENTAL and (os.path.exists(emb_file) or os.path.exists(emb_file + ".parquet")):
+        # векторизуем только новые названия, векторы остальных берем из сохраненного датасета
+        # если векторы созданы другим кодировщиком или моделью, то векторизуются все названия
+        previous = loader.load_dataset_from_file(file_name="embeddings", dir_to_load=DATA_DIR, mmap=False)
+        new_embeddings, orphans = loader.refresh_city_embeddings(
+            device=DEVICE, model_id=MODEL_ID, batch_size=EMB_BATCH_SIZE, id_emb_col=cities["name"],
+            existing=previous, processes=EMB_PROCESSES, checkpoint_dir=EMB_CHECKPOINT_DIR,
+            encoder=ENCODER, encoder_params=ENCODER_PARAMS,
+            existing_info=loader.load_embedding_info(file_name="embeddings", dir_to_load=DATA_DIR),
+        )
+        previous = previous[~previous["name"].isin(orphans) & ~previous["name"].isin(new_embeddings["name"])]
+        embeddings = pd.concat([previous, new_embeddings], ignore_index=True)
+    else:
+        embeddings = loader.load_city_embeddings(
+            device=DEVICE, model_id=MODEL_ID, batch_size=EMB_BATCH_SIZE, id_emb_col=cities["name"],
+            processes=EMB_PROCESSES, checkpoint_dir=EMB_CHECKPOINT_DIR,
+            encoder=ENCODER, encoder_params=ENCODER_PARAMS,
+        )
+    # сохраняем датафреймы на диск в формате из config файла
     for dataset, file_name in zip([cities, countries, admin_codes, embeddings],
                                   ["cities", "countries", "admin_codes", "embeddings"]):
-        loader.save_dataset_to_file(dataset=dataset, file_name=file_name, dir_to_save=DATA_DIR)
+        loader.save_dataset_to_file(dataset=dataset, file_name=file_name, dir_to_save=DATA_DIR,
+                                    file_format=DATASET_FORMAT)
+    # рядом с векторами сохраняем описание кодировщика, модели и размерности
+    loader.save_embedding_info(
+        info=embedding_info(ENCODER, model_id=MODEL_ID, dim=len(embeddings["embeddings"].iloc[0]), **ENCODER_PARAMS),
+        file_name="embeddings", dir_to_save=DATA_DIR,
+    )
     # очистка памяти
     del cities, countries, admin_codes, embeddings
     gc.collect()
@@ -0,0 +1,33 @@
+# скрипт для создания снимка данных для быстрого запуска FindCity
+from config import (CONN_STR_GEONAMES, QUERY, COUNTRIES_LST, POPULATION, MODEL_ID, SNAPSHOT_DIR, ENCODER,
+                    ENCODER_PARAMS)
+from database import DataFrameSQL
+from encoders import encoder_name
+from snapshot import export_snapshot
+from sqlalchemy import create_engine
+import gc
+
+
+def main():
+    # создаем подключение
+    engine = create_engine(CONN_STR_GEONAMES)
+    # инициализируем объект класса DataFrameSQL
+    data_loader = DataFrameSQL(engine=engine)
+    # векторы в БД должны быть созданы кодировщиком из config файла, который записывается в снимок
+    info = data_loader.get_embedding_info()
+    current = encoder_name(ENCODER, model_id=MODEL_ID, **ENCODER_PARAMS)
+    if info is not None and info["encoder_name"] != current:
+        raise ValueError(f"Векторы в БД созданы кодировщиком {info['encoder_name']}, "
+                         f"а в config файле указан кодировщик {current}.")
+    # формируем датасет с данными согласно запросу, списку стран и населению из config файла
+    dataset = data_loader.from_sql(query=QUERY, countries=COUNTRIES_LST, population=POPULATION)
+    # сохраняем снимок с матрицей векторов и метаданными
+    export_snapshot(dataset=dataset, emb_col="embeddings", snapshot_dir=SNAPSHOT_DIR, model_id=MODEL_ID,
+                    encoder=ENCODER, encoder_params=ENCODER_PARAMS)
+    # очистка памяти
+    del dataset
+    gc.collect()
+
+
+if __name__ == "__main__":
+    main()
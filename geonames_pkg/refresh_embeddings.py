@@ -0,0 +1,59 @@
+# скрипт для инкрементального обновления таблицы embeddings в БД:
+# векторы создаются только для новых названий городов, векторы удаленных названий удаляются
+from config import (
+    CONN_STR_GEONAMES,
+    SRC_DIR,
+    DEVICE,
+    CITY_FILE,
+    CITY_COLS,
+    USE_CITY_COLS,
+    COL_TYPES,
+    MODEL_ID,
+    ENCODER,
+    ENCODER_PARAMS,
+    EMB_BATCH_SIZE,
+    EMB_PROCESSES,
+    EMB_CHECKPOINT_DIR,
+    CITY_FILTERS,
+    PARSE_PROCESSES,
+    ARROW_STRINGS,
+)
+from database import DataFrameSQL
+from dataset import DatasetLoader, reduce_mem_usage, preprocess_data
+from encoders import embedding_info
+from sqlalchemy import create_engine
+
+
+def main():
+    # создаем датафрейм с городами так же, как в make_datasets.py: в памяти остаются только строки,
+    # прошедшие фильтры из config файла, иначе векторизуются и названия, которых нет в таблице city
+    loader = DatasetLoader(work_dir=SRC_DIR)
+    cities = reduce_mem_usage(
+        loader.load_dataset_filtered(
+            file=CITY_FILE, df_cols=CITY_COLS, use_cols=USE_CITY_COLS, col_types=COL_TYPES,
+            processes=PARSE_PROCESSES, **CITY_FILTERS
+        ),
+        arrow_strings=ARROW_STRINGS,
+    )
+    cities = preprocess_data(dataset=cities, city_or_country="city")
+    # загружаем из БД только названия и размерность векторов и описание кодировщика
+    data_sql = DataFrameSQL(create_engine(CONN_STR_GEONAMES))
+    existing = data_sql.get_embedding_names()
+    # векторизуем новые и измененные названия, все названия - если векторы созданы другим кодировщиком
+    embeddings, orphans = loader.refresh_city_embeddings(
+        device=DEVICE, model_id=MODEL_ID, batch_size=EMB_BATCH_SIZE, id_emb_col=cities["name"],
+        existing=existing, processes=EMB_PROCESSES, checkpoint_dir=EMB_CHECKPOINT_DIR,
+        encoder=ENCODER, encoder_params=ENCODER_PARAMS, existing_info=data_sql.get_embedding_info(),
+    )
+    # сначала добавляем новые векторы, затем удаляем векторы отсутствующих названий
+    if len(embeddings):
+        data_sql.upsert_embeddings(embeddings)
+        data_sql.set_embedding_info(
+            embedding_info(ENCODER, model_id=MODEL_ID, dim=len(embeddings["embeddings"].iloc[0]), **ENCODER_PARAMS)
+        )
+    data_sql.delete_embeddings(orphans)
+    print("Обновление векторов закончено!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+# файл с классом планировщика пакетной обработки запросов
+# базовые импорты
+import copy
+import os
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+# импорт приведения фильтров запроса к хэшируемому виду
+from filters import RowFilter
+
+
+class BatchScheduler:
+    """
+    Класс BatchScheduler - планировщик, собирающий одновременные запросы на поиск городов
+    в пакеты. Точное совпадение и проверка опечаток (в том числе запрос к Яндекс.Спеллеру)
+    выполняются в потоке запроса, поэтому медленный корректор не задерживает другие запросы.
+    Названия без достаточного количества точных совпадений накапливаются не дольше max_wait_ms
+    миллисекунд или до max_batch_size штук, затем для всего пакета выполняется один вызов
+    FindCity.search_cities с одним батчем модели и одним поиском по матрице.
+    Фоновый поток запускается при первом запросе в каждом процессе, поэтому планировщик,
+    созданный до fork (например, при preload_app в gunicorn), работает и в рабочих процессах.
+    """
+
+    def __init__(self, finder=None, max_wait_ms=5, max_batch_size=64):
+        """
+        Инициализация объекта класса BatchScheduler, фоновый поток запускается при первом запросе.
+
+         Параметры:
+              finder (FindCity): объект поиска городов, по умолчанию равно None,
+              max_wait_ms (float): максимальное время ожидания пакета в миллисекундах,
+                                   по умолчанию равно 5,
+              max_batch_size (int): максимальное количество запросов в пакете, по умолчанию равно 64.
+        """
+        self.finder = finder
+        self.max_wait_ms = max_wait_ms
+        self.max_batch_size = max_batch_size
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        # метрики пакетов
+        self._batches = 0
+        self._requests = 0
+        self._max_seen = 0
+        self._sizes = Counter()
+        self._closed = False
+        # процесс, в котором запущен фоновый поток: после fork поток в дочернем процессе не существует
+        self._pid = None
+        self._thread = None
+
+    def _ensure_worker(self):
+        """
+        Метод _ensure_worker класса BatchScheduler.
+        Запуск фонового потока в текущем процессе, если он еще не запущен. После fork очередь,
+        блокировки и метрики родительского процесса заменяются новыми.
+        """
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            if self._pid is not None:
+                self._queue = queue.Queue()
+                self._lock = threading.Lock()
+                self._batches, self._requests, self._max_seen, self._sizes = 0, 0, 0, Counter()
+            self._thread = threading.Thread(target=self._worker, name="batch-scheduler", daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def submit(self, city=None, top_k=1, adv_spell_check=False, output_dict_json=False, speller="yandex",
+               countries=None, min_population=None, feature_codes=None, bbox=None, near=None):
+        """
+        Метод submit класса BatchScheduler.
+        Поиск точного совпадения и проверка опечаток в потоке запроса (FindCity.resolve), затем,
+        если точных совпадений меньше top_k, постановка скорректированного названия в очередь.
+
+         Параметры:
+              city (str): название города для поиска, по умолчанию равно None,
+              top_k (int): количество наиболее похожих городов для вывода, по умолчанию равно 1,
+              adv_spell_check (bool): флаг использования расширенной проверки названия города,
+                                      по умолчанию равно False,
+              output_dict_json (bool): флаг вывода результата в виде списка словарей,
+                                       по умолчанию равно False,
+              speller (str): корректор для первичной проверки 'yandex', 'local' или None,
+                             по умолчанию равно 'yandex',
+              countries (str или list): страна или список стран, по умолчанию равно None - все,
+              min_population (int): минимальное население города, по умолчанию равно None - без фильтра,
+              feature_codes (str или list): код или список кодов объектов geonames, по умолчанию равно None - все,
+              bbox (list): прямоугольник координат (min_lat, min_lon, max_lat, max_lon),
+                           по умолчанию равно None - без фильтра,
+              near (list): точка (широта, долгота) для упорядочивания городов с одинаковым сходством,
+                           по умолчанию равно None.
+         Возвращаемое значение:
+              future (Future): объект, в который будет записан результат поиска.
+        """
+        if self._closed:
+            raise RuntimeError("Планировщик остановлен.")
+        future = Future()
+        # фильтры приводятся к хэшируемому виду, запросы с одинаковыми фильтрами попадают в одну группу
+        filters = RowFilter.make_key(countries=countries, min_population=min_population,
+                                     feature_codes=feature_codes, bbox=bbox)
+        near = tuple(float(value) for value in near) if near is not None else None
+        try:
+            countries, min_population, feature_codes, bbox = filters or (None, None, None, None)
+            mask = self.finder.filter_mask(countries=countries, min_population=min_population,
+                                           feature_codes=feature_codes, bbox=bbox)
+            distances = self.finder.near_distances(near=near)
+            # корректор вызывается в потоке запроса, одновременные запросы проверяются параллельно
+            name, found = self.finder.resolve(city=city, top_k=top_k, mask=mask, adv_spell_check=adv_spell_check,
+                                              speller=speller, distances=distances)
+            if self.finder.exact_complete(found=found, top_k=top_k, mask=mask):
+                future.set_result(self.finder.found_result(found=found, output_dict_json=output_dict_json))
+                return future
+        except Exception as exc:
+            future.set_exception(exc)
+            return future
+        self._ensure_worker()
+        params = (top_k, output_dict_json, filters, near)
+        self._queue.put((name, found, params, mask, distances, future))
+        return future
+
+    def match(self, city=None, timeout=None, **params):
+        """
+        Метод match класса BatchScheduler.
+        Постановка запроса в очередь и ожидание результата.
+
+         Параметры:
+              city (str): название города для поиска, по умолчанию равно None,
+              timeout (float): максимальное время ожидания результата в секундах,
+                               по умолчанию равно None - без ограничения,
+              **params: параметры поиска метода submit.
+         Возвращаемое значение:
+              result (pd.DataFrame или list): результат поиска для названия города.
+         Исключения:
+              TimeoutError: результат не получен за timeout секунд, запрос снимается с очереди.
+        """
+        future = self.submit(city=city, **params)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise TimeoutError(f"Результат поиска не получен за {timeout} с.") from None
+
+    def match_many(self, cities=None, timeout=None, **params):
+        """
+        Метод match_many класса BatchScheduler.
+        Постановка списка названий в очередь и ожидание всех результатов с общим ограничением
+        времени. Каждое уникальное название ставится в очередь один раз, повторные названия
+        получают копии результата.
+
+         Параметры:
+              cities (list): названия городов для поиска, по умолчанию равно None,
+              timeout (float): максимальное время ожидания всех результатов в секундах,
+                               по умолчанию равно None - без ограничения,
+              **params: параметры поиска метода submit.
+         Возвращаемое значение:
+              results (list): результаты поиска в порядке cities.
+         Исключения:
+              TimeoutError: результаты не получены за timeout секунд, оставшиеся запросы снимаются с очереди.
+        """
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        futures = {city: self.submit(city=city, **params) for city in dict.fromkeys(cities)}
+        unique_results = {}
+        try:
+            for city, future in futures.items():
+                remaining = None if deadline is None else max(deadline - time.perf_counter(), 0)
+                unique_results[city] = future.result(timeout=remaining)
+        except FutureTimeoutError:
+            for future in futures.values():
+                future.cancel()
+            raise TimeoutError(f"Результаты поиска не получены за {timeout} с.") from None
+        results, seen = [], set()
+        for city in cities:
+            results.append(copy.deepcopy(unique_results[city]) if city in seen else unique_results[city])
+            seen.add(city)
+        return results
+
+    def _collect(self):
+        """
+        Метод _collect класса BatchScheduler.
+        Ожидание первого запроса и добор пакета до max_batch_size запросов,
+        пока не истечет max_wait_ms миллисекунд.
+
+         Возвращаемое значение:
+              batch (list): список запросов (название, точные совпадения, параметры, маска, расстояния, future).
+        """
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait_ms / 1000
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(item)
+        return batch
+
+    def _process(self, batch):
+        """
+        Метод _process класса BatchScheduler.
+        Обработка пакета: запросы с одинаковыми параметрами обрабатываются одним вызовом
+        FindCity.search_cities, результаты передаются в future каждого запроса.
+        Запросы, снятые по таймауту до начала обработки, пропускаются.
+
+         Параметры:
+              batch (list): список запросов (название, точные совпадения, параметры, маска, расстояния, future).
+        """
+        groups = {}
+        for name, found, params, mask, distances, future in batch:
+            if future.set_running_or_notify_cancel():
+                groups.setdefault(params, []).append((name, found, mask, distances, future))
+        for (top_k, output_dict_json, _, _), items in groups.items():
+            # у запросов с одинаковыми фильтрами и точкой near одинаковые маска и расстояния
+            _, _, mask, distances, _ = items[0]
+            try:
+                results = self.finder.search_cities(
+                    names=[name for name, *_ in items],
+                    found=[found for _, found, *_ in items],
+                    top_k=top_k,
+                    mask=mask,
+                    distances=distances,
+                    output_dict_json=output_dict_json,
+                )
+            except Exception as exc:
+                for *_, future in items:
+                    future.set_exception(exc)
+                continue
+            for (*_, future), result in zip(items, results):
+                future.set_result(result)
+
+    def _worker(self):
+        """
+        Метод _worker класса BatchScheduler.
+        Цикл фонового потока: сбор пакета, обработка и обновление метрик.
+        """
+        while True:
+            batch = self._collect()
+            # пустой запрос - сигнал остановки от метода close
+            stop = any(item is None for item in batch)
+            batch = [item for item in batch if item is not None]
+            if batch:
+                with self._lock:
+                    self._batches += 1
+                    self._requests += len(batch)
+                    self._max_seen = max(self._max_seen, len(batch))
+                    self._sizes[len(batch)] += 1
+                self._process(batch)
+            if stop:
+                break
+
+    def metrics(self):
+        """
+        Метод metrics класса BatchScheduler.
+        Метрики планировщика.
+
+         Возвращаемое значение:
+              (dict): словарь с глубиной очереди, количеством пакетов и запросов,
+                      средним и максимальным размером пакета и распределением размеров пакетов.
+        """
+        with self._lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "batches": self._batches,
+                "requests": self._requests,
+                "avg_batch_size": self._requests / self._batches if self._batches else 0.0,
+                "max_batch_size": self._max_seen,
+                "batch_sizes": dict(sorted(self._sizes.items())),
+            }
+
+    def close(self):
+        """
+        Метод close класса BatchScheduler.
+        Остановка фонового потока после обработки уже поставленных в очередь запросов.
+        """
+        self._closed = True
+        if self._pid != os.getpid():
+            return
+        self._queue.put(None)
+        self._thread.join()
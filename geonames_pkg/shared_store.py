@@ -0,0 +1,111 @@
+# файл с функциями для размещения данных FindCity в общей памяти процессов
+# базовые импорты
+import json
+import os
+from multiprocessing import resource_tracker, shared_memory
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+# переменная окружения, через которую рабочие процессы получают описание общей памяти
+SHM_ENV = "GEONAMES_SHM"
+
+
+def _attach_segment(name):
+    """
+    Функция подключения к существующему сегменту общей памяти без регистрации
+    в resource_tracker, иначе сегмент будет удален при завершении рабочего процесса.
+    Параметр:
+            name (str): имя сегмента общей памяти.
+    Возвращаемое значение:
+            (shared_memory.SharedMemory): подключенный сегмент.
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # до Python 3.13 параметра track нет, снимаем регистрацию вручную
+        shm = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+def publish_shared(metadata=None, embeddings=None, prefix="geonames"):
+    """
+    Функция размещения матрицы векторов и метаданных городов в общей памяти.
+    Вызывается один раз в родительском процессе до запуска рабочих процессов:
+     - матрица float32 копируется в сегмент общей памяти,
+     - метаданные сериализуются в формат Arrow IPC во второй сегмент.
+    Описание сегментов записывается в переменную окружения GEONAMES_SHM,
+    которую наследуют рабочие процессы.
+    Параметры:
+            metadata (pd.DataFrame): метаданные городов без столбца с векторами, по умолчанию равно None,
+            embeddings (np.ndarray): нормализованная матрица векторов, по умолчанию равно None,
+            prefix (str): префикс имен сегментов, по умолчанию равно 'geonames'.
+    Возвращаемое значение:
+            handle (dict): описание сегментов общей памяти.
+    """
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    emb_shm = shared_memory.SharedMemory(name=f"{prefix}_emb_{os.getpid()}", create=True,
+                                         size=max(embeddings.nbytes, 1))
+    np.ndarray(embeddings.shape, dtype=np.float32, buffer=emb_shm.buf)[:] = embeddings
+    # метаданные в формате Arrow IPC читаются рабочими процессами без копирования
+    sink = pa.BufferOutputStream()
+    table = pa.Table.from_pandas(metadata.reset_index(drop=True), preserve_index=False)
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    meta_buf = sink.getvalue()
+    meta_shm = shared_memory.SharedMemory(name=f"{prefix}_meta_{os.getpid()}", create=True,
+                                          size=max(meta_buf.size, 1))
+    meta_shm.buf[:meta_buf.size] = meta_buf.to_pybytes()
+    handle = {
+        "emb": emb_shm.name,
+        "shape": list(embeddings.shape),
+        "meta": meta_shm.name,
+        "meta_size": meta_buf.size,
+    }
+    os.environ[SHM_ENV] = json.dumps(handle)
+    # сегменты закрываются в этом процессе, но остаются в системе до вызова unlink_shared
+    emb_shm.close()
+    meta_shm.close()
+    print(f"Данные размещены в общей памяти: {embeddings.nbytes / 1024 ** 2:.1f} MB векторов, "
+          f"{meta_buf.size / 1024 ** 2:.1f} MB метаданных.")
+    return handle
+
+
+def attach_shared(handle=None):
+    """
+    Функция подключения рабочего процесса к данным в общей памяти без копирования.
+    Параметр:
+            handle (dict): описание сегментов общей памяти, по умолчанию равно None -
+                           берется из переменной окружения GEONAMES_SHM.
+    Возвращаемое значение:
+            metadata (pd.DataFrame): метаданные городов со столбцами на буферах Arrow,
+            embeddings (np.ndarray): матрица векторов только для чтения,
+            segments (list): подключенные сегменты, их нужно хранить, пока используются данные.
+    """
+    handle = handle or json.loads(os.environ[SHM_ENV])
+    emb_shm = _attach_segment(handle["emb"])
+    meta_shm = _attach_segment(handle["meta"])
+    embeddings = np.ndarray(tuple(handle["shape"]), dtype=np.float32, buffer=emb_shm.buf)
+    embeddings.flags.writeable = False
+    reader = pa.ipc.open_stream(pa.py_buffer(meta_shm.buf)[:handle["meta_size"]])
+    # столбцы pd.ArrowDtype ссылаются на буферы общей памяти, а не копируются в объекты Python
+    metadata = reader.read_all().to_pandas(types_mapper=pd.ArrowDtype)
+    return metadata, embeddings, [emb_shm, meta_shm]
+
+
+def unlink_shared(handle=None):
+    """
+    Функция удаления сегментов общей памяти, вызывается родительским процессом при остановке.
+    Параметр:
+            handle (dict): описание сегментов общей памяти, по умолчанию равно None -
+                           берется из переменной окружения GEONAMES_SHM.
+    """
+    handle = handle or json.loads(os.environ[SHM_ENV])
+    for name in (handle["emb"], handle["meta"]):
+        try:
+            shm = shared_memory.SharedMemory(name=name)
+        except FileNotFoundError:
+            continue
+        shm.close()
+        shm.unlink()
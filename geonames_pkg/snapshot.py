@@ -0,0 +1,127 @@
+# файл с функциями для сохранения и загрузки снимка данных FindCity
+# базовые импорты
+import json
+import os
+import shutil
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+# импорт описания кодировщика векторов
+from encoders import embedding_info
+# импорт нормализации векторов и группировки строк по названию
+from vector_index import NameGroups, normalize_rows
+
+# версия формата снимка, увеличивается при несовместимых изменениях:
+# 1 - матрица векторов по строкам метаданных, 2 - матрица уникальных названий
+SNAPSHOT_FORMAT = 2
+SUPPORTED_FORMATS = (1, 2)
+# имена файлов снимка
+EMB_FILE = "embeddings.npy"
+META_FILE = "metadata.parquet"
+MANIFEST_FILE = "manifest.json"
+LATEST_FILE = "LATEST"
+
+
+def export_snapshot(dataset=None, emb_col="embeddings", snapshot_dir=None, model_id=None,
+                    encoder="sentence_transformers", encoder_params=None):
+    """
+    Функция сохранения снимка данных для быстрого запуска FindCity.
+    В директории snapshot_dir создается поддиректория с версией снимка, в которую записываются:
+     - embeddings.npy - нормализованная матрица векторов float32 уникальных названий
+       в порядке их первого появления в метаданных (у городов одного названия один вектор),
+     - metadata.parquet - остальные столбцы датасета в колоночном формате,
+     - manifest.json - версия формата, кодировщик и его параметры, модель, количество строк и названий,
+       размерность и список столбцов; FindCity.from_snapshot не загружает снимок с другим кодировщиком.
+    После записи в файл LATEST записывается имя новой версии.
+    Параметры:
+            dataset (pd.DataFrame): датасет с векторами городов, по умолчанию равно None,
+            emb_col (str): наименование столбца с векторами, по умолчанию равно 'embeddings',
+            snapshot_dir (str): директория для снимков, по умолчанию равно None,
+            model_id (str): имя модели, которой созданы векторы, по умолчанию равно None,
+            encoder (str): тип кодировщика, которым созданы векторы, по умолчанию равно 'sentence_transformers',
+            encoder_params (dict): параметры кодировщика, по умолчанию равно None.
+    Возвращаемое значение:
+            version_dir (str): путь к директории сохраненной версии снимка.
+    """
+    version = datetime.now().strftime("%Y%m%dT%H%M%S")
+    version_dir = os.path.join(snapshot_dir, version)
+    # снимок пишется во временную директорию и переименовывается после записи всех файлов,
+    # чтобы запускающиеся процессы не увидели частично записанный снимок
+    tmp_dir = version_dir + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    print(f"Сохраняем снимок данных в {version_dir} ...")
+    metadata = dataset.drop(columns=[emb_col]).reset_index(drop=True)
+    first_rows = NameGroups(names=metadata["name"]).first_rows
+    embeddings = normalize_rows(np.array(list(dataset[emb_col].iloc[first_rows]), dtype=np.float32))
+    np.save(os.path.join(tmp_dir, EMB_FILE), embeddings)
+    metadata.to_parquet(os.path.join(tmp_dir, META_FILE), index=False)
+    manifest = {
+        "format": SNAPSHOT_FORMAT,
+        "version": version,
+        # тип и идентификатор кодировщика, модель и размерность
+        **embedding_info(encoder, model_id=model_id, dim=embeddings.shape[1], **(encoder_params or {})),
+        "encoder_params": encoder_params or {},
+        "rows": len(metadata),
+        "names": int(embeddings.shape[0]),
+        "dtype": "float32",
+        "normalized": True,
+        "columns": list(metadata.columns),
+    }
+    with open(os.path.join(tmp_dir, MANIFEST_FILE), "w") as fp:
+        json.dump(manifest, fp, ensure_ascii=False, indent=2)
+    os.rename(tmp_dir, version_dir)
+    with open(os.path.join(snapshot_dir, LATEST_FILE), "w") as fp:
+        fp.write(version)
+    print(f"Снимок сохранен: {manifest['rows']} записей, {manifest['names']} названий, "
+          f"размерность {manifest['dim']}!")
+    return version_dir
+
+
+def resolve_snapshot(path=None):
+    """
+    Функция определения директории версии снимка.
+    Параметр:
+            path (str): директория версии снимка или директория снимков с файлом LATEST,
+                        по умолчанию равно None.
+    Возвращаемое значение:
+            (str): путь к директории версии снимка.
+    """
+    if os.path.exists(os.path.join(path, MANIFEST_FILE)):
+        return path
+    latest = os.path.join(path, LATEST_FILE)
+    if not os.path.exists(latest):
+        raise ValueError(f"В директории {path} нет снимка данных.")
+    with open(latest) as fp:
+        return os.path.join(path, fp.read().strip())
+
+
+def load_snapshot(path=None, mmap=True, columns=None):
+    """
+    Функция загрузки снимка данных.
+    Матрица векторов отображается в память (np.load с mmap_mode='r'), поэтому процессы,
+    загрузившие один снимок, используют общий page cache операционной системы.
+    Параметры:
+            path (str): директория версии снимка или директория снимков с файлом LATEST,
+                        по умолчанию равно None,
+            mmap (bool): флаг отображения матрицы в память вместо чтения, по умолчанию равно True,
+            columns (list): список загружаемых столбцов метаданных, по умолчанию равно None - все.
+    Возвращаемое значение:
+            metadata (pd.DataFrame): метаданные городов,
+            embeddings (np.ndarray): нормализованная матрица векторов уникальных названий
+                                     (для снимков формата 1 - по строкам метаданных),
+            manifest (dict): описание снимка.
+    """
+    version_dir = resolve_snapshot(path)
+    with open(os.path.join(version_dir, MANIFEST_FILE)) as fp:
+        manifest = json.load(fp)
+    if manifest["format"] not in SUPPORTED_FORMATS:
+        raise ValueError(
+            f"Формат снимка {manifest['format']} не поддерживается, ожидается {SUPPORTED_FORMATS}."
+        )
+    embeddings = np.load(os.path.join(version_dir, EMB_FILE), mmap_mode="r" if mmap else None)
+    metadata = pd.read_parquet(os.path.join(version_dir, META_FILE), columns=columns)
+    if len(metadata) != manifest["rows"] or embeddings.shape[0] != manifest.get("names", manifest["rows"]):
+        raise ValueError(f"Снимок {version_dir} поврежден: число строк метаданных и векторов различается.")
+    return metadata, embeddings, manifest
@@ -0,0 +1,194 @@
+# файл с классом пространственного индекса координат городов
+# базовые импорты
+import numpy as np
+
+# scipy - необязательная зависимость, без нее поиск выполняется полным перебором
+try:
+    from scipy.spatial import cKDTree
+except ImportError:
+    cKDTree = None
+
+# средний радиус Земли в километрах
+EARTH_RADIUS_KM = 6371.0088
+
+
+def to_xyz(latitude=None, longitude=None):
+    """
+    Функция перевода широты и долготы в точки на единичной сфере. Евклидово расстояние
+    между такими точками (хорда) монотонно связано с расстоянием по поверхности Земли,
+    поэтому ближайшие точки можно искать обычным KD-деревом.
+    Параметры:
+            latitude (np.ndarray): широты в градусах, по умолчанию равно None,
+            longitude (np.ndarray): долготы в градусах, по умолчанию равно None.
+    Возвращаемое значение:
+            (np.ndarray): координаты размером (количество точек, 3).
+    """
+    lat = np.radians(np.asarray(latitude, dtype=np.float64))
+    lon = np.radians(np.asarray(longitude, dtype=np.float64))
+    cos_lat = np.cos(lat)
+    return np.stack([cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)], axis=-1)
+
+
+def chord_to_km(chord=None):
+    """
+    Функция перевода длины хорды единичной сферы в расстояние по поверхности Земли.
+    Параметр:
+            chord (np.ndarray): длины хорд, по умолчанию равно None.
+    Возвращаемое значение:
+            (np.ndarray): расстояния в километрах.
+    """
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(np.asarray(chord) / 2, 0, 1))
+
+
+def km_to_chord(distance=None):
+    """
+    Функция перевода расстояния по поверхности Земли в длину хорды единичной сферы.
+    Параметр:
+            distance (float): расстояние в километрах, по умолчанию равно None.
+    Возвращаемое значение:
+            (float): длина хорды.
+    """
+    return 2 * np.sin(np.minimum(distance / (2 * EARTH_RADIUS_KM), np.pi / 2))
+
+
+class SpatialIndex:
+    """
+    Класс SpatialIndex - индекс координат городов для обратного геокодирования:
+    поиск ближайших городов к точке и городов в радиусе от точки.
+    Координаты переводятся в точки на единичной сфере, по которым строится KD-дерево
+    (scipy.spatial.cKDTree), без scipy поиск выполняется полным перебором.
+    """
+
+    def __init__(self, latitude=None, longitude=None):
+        """
+        Инициализация объекта класса SpatialIndex.
+        Строки без координат в индекс не попадают.
+
+         Параметры:
+              latitude (pd.Series): широты городов в градусах, по умолчанию равно None,
+              longitude (pd.Series): долготы городов в градусах, по умолчанию равно None.
+        """
+        latitude = np.asarray(latitude, dtype=np.float64)
+        longitude = np.asarray(longitude, dtype=np.float64)
+        self.n_rows = len(latitude)
+        # номера строк датасета, у которых есть координаты
+        self.rows = np.flatnonzero(~(np.isnan(latitude) | np.isnan(longitude)))
+        self.xyz = to_xyz(latitude[self.rows], longitude[self.rows])
+        self.tree = cKDTree(self.xyz) if cKDTree is not None else None
+
+    def __len__(self):
+        return len(self.rows)
+
+    def _query(self, points, k):
+        """
+        Метод _query класса SpatialIndex.
+        Поиск k ближайших точек индекса без учета маски.
+
+         Параметры:
+              points (np.ndarray): точки запросов на единичной сфере размером (количество запросов, 3),
+              k (int): количество ближайших точек.
+         Возвращаемое значение:
+              chords (np.ndarray): длины хорд размером (количество запросов, k),
+              positions (np.ndarray): позиции точек в индексе размером (количество запросов, k).
+        """
+        if self.tree is not None:
+            chords, positions = self.tree.query(points, k=k)
+            return chords.reshape(len(points), k), positions.reshape(len(points), k)
+        # полный перебор частями, хорда тем меньше, чем больше скалярное произведение
+        chords = np.empty((len(points), k))
+        positions = np.empty((len(points), k), dtype=np.int64)
+        for start in range(0, len(points), 256):
+            dots = points[start:start + 256] @ self.xyz.T
+            part = np.argpartition(-dots, k - 1, axis=1)[:, :k]
+            part_dots = np.take_along_axis(dots, part, axis=1)
+            order = np.argsort(-part_dots, axis=1, kind="stable")
+            positions[start:start + 256] = np.take_along_axis(part, order, axis=1)
+            chords[start:start + 256] = np.sqrt(np.maximum(2 - 2 * np.take_along_axis(part_dots, order, axis=1), 0))
+        return chords, positions
+
+    def nearest(self, latitude=None, longitude=None, k=1, mask=None):
+        """
+        Метод nearest класса SpatialIndex.
+        Поиск k ближайших городов для пачки точек. Если задана маска, то поиск повторяется
+        с увеличенным k, пока для каждой точки не найдется k допустимых городов.
+
+         Параметры:
+              latitude (np.ndarray): широты точек в градусах, по умолчанию равно None,
+              longitude (np.ndarray): долготы точек в градусах, по умолчанию равно None,
+              k (int): количество ближайших городов, по умолчанию равно 1,
+              mask (np.ndarray): булева маска допустимых строк датасета, по умолчанию равно None - все.
+         Возвращаемое значение:
+              distances (np.ndarray): расстояния в километрах размером (количество точек, k),
+              indices (np.ndarray): номера строк датасета размером (количество точек, k).
+        """
+        points = to_xyz(np.atleast_1d(latitude), np.atleast_1d(longitude))
+        allowed = np.ones(len(self.rows), dtype=bool) if mask is None else np.asarray(mask)[self.rows]
+        k = min(k, int(np.count_nonzero(allowed)))
+        distances = np.zeros((len(points), k), dtype=np.float64)
+        indices = np.zeros((len(points), k), dtype=np.int64)
+        if k == 0:
+            return distances, indices
+        pending = np.arange(len(points))
+        width = k if mask is None else min(len(self.rows), 2 * k)
+        while len(pending):
+            chords, positions = self._query(points[pending], width)
+            ok = allowed[positions]
+            # точки, для которых найдено k допустимых городов (или проверены все города)
+            done = (ok.sum(axis=1) >= k) | (width == len(self.rows))
+            for pos in np.flatnonzero(done):
+                keep = np.flatnonzero(ok[pos])[:k]
+                distances[pending[pos]] = chord_to_km(chords[pos, keep])
+                indices[pending[pos]] = self.rows[positions[pos, keep]]
+            pending = pending[~done]
+            width = min(len(self.rows), width * 4)
+        return distances, indices
+
+    def within(self, latitude=None, longitude=None, radius_km=None, mask=None):
+        """
+        Метод within класса SpatialIndex.
+        Поиск всех городов в радиусе radius_km от каждой точки пачки,
+        города упорядочены по возрастанию расстояния.
+
+         Параметры:
+              latitude (np.ndarray): широты точек в градусах, по умолчанию равно None,
+              longitude (np.ndarray): долготы точек в градусах, по умолчанию равно None,
+              radius_km (float): радиус в километрах, по умолчанию равно None,
+              mask (np.ndarray): булева маска допустимых строк датасета, по умолчанию равно None - все.
+         Возвращаемое значение:
+              (list): список пар (расстояния в километрах, номера строк датасета) для каждой точки.
+        """
+        points = to_xyz(np.atleast_1d(latitude), np.atleast_1d(longitude))
+        chord = km_to_chord(radius_km)
+        if self.tree is not None:
+            groups = self.tree.query_ball_point(points, r=chord)
+        else:
+            groups = [np.flatnonzero(np.linalg.norm(self.xyz - point, axis=1) <= chord) for point in points]
+        results = []
+        for point, positions in zip(points, groups):
+            positions = np.asarray(positions, dtype=np.int64)
+            rows = self.rows[positions]
+            if mask is not None:
+                keep = np.asarray(mask)[rows]
+                positions, rows = positions[keep], rows[keep]
+            distances = chord_to_km(np.linalg.norm(self.xyz[positions] - point, axis=1))
+            order = np.argsort(distances, kind="stable")
+            results.append((distances[order], rows[order]))
+        return results
+
+    def distances(self, latitude=None, longitude=None, rows=None):
+        """
+        Метод distances класса SpatialIndex.
+        Расстояния от одной точки до городов, используются для упорядочивания
+        городов с одинаковым сходством по близости к точке.
+
+         Параметры:
+              latitude (float): широта точки в градусах, по умолчанию равно None,
+              longitude (float): долгота точки в градусах, по умолчанию равно None,
+              rows (np.ndarray): номера строк датасета, по умолчанию равно None - все строки.
+         Возвращаемое значение:
+              (np.ndarray): расстояния в километрах, для строк без координат - inf.
+        """
+        point = to_xyz(latitude, longitude)
+        result = np.full(self.n_rows, np.inf)
+        result[self.rows] = chord_to_km(np.linalg.norm(self.xyz - point, axis=1))
+        return result if rows is None else result[rows]
@@ -0,0 +1,132 @@
+# файл с классом локального корректора опечаток
+# импорты для транслитерации
+from transliterate import translit
+
+# импорт расстояния Дамерау-Левенштейна для списка кандидатов
+from edit_distance import osa_distance
+
+
+class LocalSpeller:
+    """
+    Класс LocalSpeller - локальный корректор опечаток в названиях городов без обращения к сети.
+    Словарь строится из полей name, asciiname, alternatenames загруженного датасета и их
+    транслитераций. Поиск слов на расстоянии до max_distance выполняется по индексу удалений
+    (алгоритм SymSpell): для каждого слова словаря заранее сохраняются все варианты его
+    префикса с удаленными символами, поэтому при запросе сравниваются только слова,
+    имеющие общий вариант удаления с запросом.
+    """
+
+    def __init__(self, dataset=None, max_distance=2, prefix_length=7):
+        """
+        Инициализация объекта класса LocalSpeller.
+
+         Параметры:
+              dataset (pd.DataFrame): датасет с полями name, alternatenames и, при наличии,
+                                      asciiname и population, по умолчанию равно None,
+              max_distance (int): максимальное расстояние редактирования, по умолчанию равно 2,
+              prefix_length (int): длина префикса слова, по которому строится индекс удалений,
+                                   по умолчанию равно 7.
+        """
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        # словарь: слово -> (имя города из поля name, частота)
+        # частота - население города, а если его нет в датасете, то 1
+        terms = {}
+        asciinames = dataset["asciiname"] if "asciiname" in dataset else dataset["name"]
+        populations = dataset["population"] if "population" in dataset else [1] * len(dataset)
+        # кэш транслитераций, т.к. одни и те же альтернативные имена встречаются у многих городов
+        translit_cache = {}
+        for name, asciiname, alternatenames, population in zip(
+                dataset["name"], asciinames, dataset["alternatenames"], populations
+        ):
+            variants = {name, asciiname, *str(alternatenames).split(", ")}
+            for variant in variants:
+                if not isinstance(variant, str):
+                    continue
+                variant = variant.strip().lower()
+                if not variant or variant == "nan":
+                    continue
+                variant_t = translit_cache.get(variant)
+                if variant_t is None:
+                    variant_t = translit(variant, "ru", reversed=True)
+                    translit_cache[variant] = variant_t
+                for term in (variant, variant_t):
+                    # при совпадении слов у разных городов оставляем более крупный город
+                    if term not in terms or terms[term][1] < population:
+                        terms[term] = (name, population)
+        self.terms = list(terms.keys())
+        self.term_names = [terms[term][0] for term in self.terms]
+        self.term_freq = [terms[term][1] for term in self.terms]
+        self.term_pos = {term: pos for pos, term in enumerate(self.terms)}
+        # индекс удалений: вариант префикса с удаленными символами -> позиции слов
+        self.deletes = {}
+        for pos, term in enumerate(self.terms):
+            for delete in self._edits(term[:self.prefix_length]):
+                self.deletes.setdefault(delete, []).append(pos)
+
+    def _edits(self, word):
+        """
+        Метод _edits класса LocalSpeller.
+        Все варианты слова с удалением от 0 до max_distance символов.
+
+         Параметры:
+              word (str): слово.
+         Возвращаемое значение:
+              edits (set): множество вариантов слова.
+        """
+        edits = {word}
+        frontier = {word}
+        for _ in range(self.max_distance):
+            frontier = {item[:i] + item[i + 1:] for item in frontier for i in range(len(item))}
+            edits |= frontier
+        return edits
+
+    def lookup(self, word=None):
+        """
+        Метод lookup класса LocalSpeller.
+        Поиск ближайшего слова словаря на расстоянии не более max_distance.
+        При одинаковом расстоянии выбирается слово более крупного города.
+
+         Параметры:
+              word (str): слово для поиска, по умолчанию равно None.
+         Возвращаемое значение:
+              (tuple): имя города из поля name и расстояние или None, если ничего не найдено.
+        """
+        word = word.strip().lower()
+        pos = self.term_pos.get(word)
+        if pos is not None:
+            return self.term_names[pos], 0
+        best = None
+        for query in {word, translit(word, "ru", reversed=True)}:
+            candidates = set()
+            for delete in self._edits(query[:self.prefix_length]):
+                candidates.update(self.deletes.get(delete, ()))
+            candidates = sorted(candidates)
+            # расстояния до всех кандидатов считаются одним вызовом
+            distances = osa_distance(query=query, candidates=[self.terms[pos] for pos in candidates],
+                                     max_distance=self.max_distance)
+            for pos, distance in zip(candidates, distances):
+                if distance > self.max_distance:
+                    continue
+                rank = (int(distance), -self.term_freq[pos])
+                if best is None or rank < best[0]:
+                    best = (rank, pos)
+        if best is None:
+            return None
+        return self.term_names[best[1]], best[0][0]
+
+    def correct(self, city=None):
+        """
+        Метод correct класса LocalSpeller.
+        Исправление опечатки в названии города.
+
+         Параметры:
+              city (str): название города для проверки, по умолчанию равно None.
+         Возвращаемое значение:
+              city (str): имя найденного города из поля name или исходное значение,
+                          в случае невозможности корректировки.
+        """
+        found = self.lookup(word=city)
+        if found is None:
+            return city
+        return found[0]
@@ -50,6 +50,34 @@ class Vectors(Base):
         return f"{self.name} {self.embeddings}"
 
 
+class VectorsInfo(Base):
+    """
+    Класс VectorsInfo для хранения описания векторов таблицы embeddings: кодировщик, модель и размерность.
+    """
+    # имя таблицы
+    __tablename__ = "embeddings_info"
+    # комментарий с описанием таблицы
+    __table_args__ = {
+        "comment": "Описание векторов таблицы embeddings: кодировщик, модель и размерность."
+    }
+    # задаем в переменные параметры столбцов в таблице БД, имя переменной является именем столбца
+    id = Column(Integer, primary_key=True, comment="id записи, в таблице одна запись")
+    encoder = Column(String, comment="тип кодировщика")
+    encoder_name = Column(String, comment="идентификатор векторов кодировщика")
+    model_id = Column(String, comment="имя модели")
+    dim = Column(Integer, comment="размерность векторов")
+
+    def __repr__(self):
+        """
+        Метод __repr__.
+        Возвращает строковое представление объекта.
+
+        Возвращаемое значение:
+            Строка (str): строковое представление объекта с названиями столбцов в таблице.
+        """
+        return f"{self.encoder} {self.encoder_name} {self.model_id} {self.dim}"
+
+
 class Country(Base):
     """
     Класс Country для хранения информации о странах.
@@ -0,0 +1,761 @@
+# файл с классами индексов для поиска ближайших векторов
+# базовые импорты
+import hashlib
+import os
+import numpy as np
+import pandas as pd
+
+# faiss - необязательная зависимость, используется только для индекса FaissIndex
+try:
+    import faiss
+except ImportError:
+    faiss = None
+
+RANDOM = 12345
+
+
+def normalize_rows(vectors):
+    """
+    Функция нормализации строк матрицы векторов к единичной длине.
+    Параметр:
+            vectors (np.ndarray): матрица векторов.
+    Возвращаемое значение:
+            (np.ndarray): матрица нормализованных векторов типа float32.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=-1, keepdims=True), 1e-12)
+
+
+def count_allowed(total, top_k, mask=None):
+    """
+    Функция расчета количества возвращаемых векторов с учетом маски допустимых векторов.
+    Параметры:
+            total (int): количество векторов в индексе,
+            top_k (int): запрошенное количество ближайших векторов,
+            mask (np.ndarray): булев массив допустимых векторов, по умолчанию равно None - все.
+    Возвращаемое значение:
+            (int): количество возвращаемых векторов.
+    """
+    allowed = total if mask is None else int(np.count_nonzero(mask))
+    return min(top_k, allowed)
+
+
+def embeddings_checksum(embeddings=None, sample_size=4096):
+    """
+    Функция контрольной суммы матрицы векторов для проверки, что сохраненный индекс построен
+    по той же матрице. Хэшируются размер матрицы и равномерная выборка не больше sample_size строк,
+    поэтому матрица, отображенная в память, не читается целиком.
+    Параметры:
+            embeddings (np.ndarray): матрица векторов, по умолчанию равно None,
+            sample_size (int): количество строк в выборке, по умолчанию равно 4096.
+    Возвращаемое значение:
+            (str): контрольная сумма sha1.
+    """
+    rows = np.unique(np.linspace(0, len(embeddings) - 1, min(sample_size, len(embeddings))).astype(np.int64))
+    digest = hashlib.sha1(str(embeddings.shape).encode("utf-8"))
+    digest.update(np.ascontiguousarray(embeddings[rows], dtype=np.float32).tobytes())
+    return digest.hexdigest()
+
+
+def top_k_rows(sim, top_k):
+    """
+    Функция отбора top_k наибольших значений в каждой строке матрицы сходства
+    без полной сортировки строки.
+    Параметры:
+            sim (np.ndarray): матрица сходства размером (количество запросов, количество векторов),
+            top_k (int): количество отбираемых значений.
+    Возвращаемое значение:
+            scores (np.ndarray): отсортированные по убыванию значения сходства,
+            indices (np.ndarray): индексы столбцов отобранных значений.
+    """
+    if top_k == 0:
+        return np.empty((len(sim), 0), dtype=sim.dtype), np.empty((len(sim), 0), dtype=np.int64)
+    part = np.argpartition(-sim, top_k - 1, axis=1)[:, :top_k]
+    part_scores = np.take_along_axis(sim, part, axis=1)
+    order = np.argsort(-part_scores, axis=1, kind="stable")
+    return np.take_along_axis(part_scores, order, axis=1), np.take_along_axis(part, order, axis=1)
+
+
+def sort_key(values=None, ascending=False):
+    """
+    Функция построения ключа сортировки строк для np.lexsort по значениям столбца
+    любого типа (числа или строки), пропуски всегда упорядочиваются последними.
+    Параметры:
+            values (pd.Series): значения столбца, по умолчанию равно None,
+            ascending (bool): флаг сортировки по возрастанию, по умолчанию равно False.
+    Возвращаемое значение:
+            (np.ndarray): ранги значений, меньший ранг - выше в порядке сортировки.
+    """
+    ranks = pd.Series(values).rank(method="dense", ascending=ascending, na_option="bottom")
+    return ranks.to_numpy(dtype=np.float64)
+
+
+class NameGroups:
+    """
+    Класс NameGroups - группировка строк датасета по названию города.
+    Векторы создаются по названию, поэтому у городов с одинаковым названием они совпадают.
+    Поиск выполняется по матрице уникальных названий, а каждое найденное название
+    раскрывается в свои города через массив смещений.
+    """
+
+    def __init__(self, names=None, order=None, ascending=False):
+        """
+        Инициализация объекта класса NameGroups.
+        Номера уникальных названий присваиваются в порядке первого появления в датасете,
+        поэтому группировка одного датасета всегда одинакова.
+
+         Параметры:
+              names (pd.Series): названия городов по строкам датасета, по умолчанию равно None,
+              order (pd.Series): значения для упорядочивания городов одного названия,
+                                 например население, по умолчанию равно None - порядок строк,
+              ascending (bool): флаг упорядочивания по возрастанию order, по умолчанию равно False.
+        """
+        self.name_ids, uniques = pd.factorize(np.asarray(names, dtype=object))
+        self.n_rows = len(self.name_ids)
+        self.n_names = len(uniques)
+        # первая строка каждого названия
+        self.first_rows = np.unique(self.name_ids, return_index=True)[1]
+        # строки, упорядоченные по названию, внутри названия по order, затем по номеру строки
+        positions = np.arange(self.n_rows)
+        key = sort_key(order, ascending=ascending) if order is not None else np.zeros(self.n_rows)
+        self.rows = np.lexsort((positions, key, self.name_ids))
+        self.offsets = np.searchsorted(self.name_ids[self.rows], np.arange(self.n_names + 1))
+        # последняя маска строк и соответствующая ей маска названий
+        self._last_masks = (None, None)
+
+    def collapse(self, embeddings=None):
+        """
+        Метод collapse класса NameGroups.
+        Матрица векторов уникальных названий из матрицы по строкам датасета.
+        Если матрица уже содержит по одному вектору на название, то она возвращается без копирования.
+
+         Параметры:
+              embeddings (np.ndarray): матрица векторов, по умолчанию равно None.
+         Возвращаемое значение:
+              (np.ndarray): матрица размером (количество названий, размерность).
+        """
+        if embeddings.shape[0] == self.n_names:
+            return embeddings
+        if embeddings.shape[0] != self.n_rows:
+            raise ValueError(
+                f"Размер матрицы {embeddings.shape[0]} не совпадает ни с количеством строк {self.n_rows}, "
+                f"ни с количеством уникальных названий {self.n_names}."
+            )
+        return np.ascontiguousarray(embeddings[self.first_rows])
+
+    def expand_matrix(self, embeddings=None):
+        """
+        Метод expand_matrix класса NameGroups.
+        Матрица векторов по строкам датасета из матрицы уникальных названий.
+
+         Параметры:
+              embeddings (np.ndarray): матрица векторов, по умолчанию равно None.
+         Возвращаемое значение:
+              (np.ndarray): матрица размером (количество строк, размерность).
+        """
+        if embeddings.shape[0] == self.n_rows:
+            return embeddings
+        return embeddings[self.name_ids]
+
+    def name_mask(self, mask=None):
+        """
+        Метод name_mask класса NameGroups.
+        Маска уникальных названий: название допустимо, если допустим хотя бы один его город.
+
+         Параметры:
+              mask (np.ndarray): булева маска строк датасета, по умолчанию равно None.
+         Возвращаемое значение:
+              (np.ndarray): булева маска названий или None, если маска строк не задана.
+        """
+        if mask is None or self.n_names == 0:
+            return mask
+        # маски фильтров кэшируются, поэтому для повторного фильтра возвращается готовая маска названий
+        last_mask, last_name_mask = self._last_masks
+        if last_mask is mask:
+            return last_name_mask
+        name_mask = np.logical_or.reduceat(mask[self.rows], self.offsets[:-1])
+        self._last_masks = (mask, name_mask)
+        return name_mask
+
+    def expand(self, scores=None, indices=None, top_k=1, mask=None, order=None, fused=None):
+        """
+        Метод expand класса NameGroups.
+        Раскрытие найденных названий в города: города одного названия получают его
+        косинусное сходство и идут в порядке order, всего отбирается top_k городов.
+
+         Параметры:
+              scores (np.ndarray): косинусное сходство названий размером (количество запросов, k),
+                                   по умолчанию равно None,
+              indices (np.ndarray): номера названий размером (количество запросов, k), по умолчанию равно None,
+              top_k (int): количество городов для каждого запроса, по умолчанию равно 1,
+              mask (np.ndarray): булева маска допустимых строк датасета, по умолчанию равно None - все,
+              order (np.ndarray): значения по строкам датасета для упорядочивания городов одного названия
+                                  по возрастанию вместо order при инициализации, например расстояния до точки,
+                                  по умолчанию равно None,
+              fused (np.ndarray): итоговая оценка названий размером (количество запросов, k), раскрывается
+                                  так же, как scores, по умолчанию равно None.
+         Возвращаемое значение:
+              scores (np.ndarray): косинусное сходство размером (количество запросов, top_k),
+              rows (np.ndarray): индексы строк датасета размером (количество запросов, top_k),
+                                 -1 - городов меньше top_k (индекс нашел меньше названий),
+              fused (np.ndarray): итоговая оценка размером (количество запросов, top_k), если задан fused.
+        """
+        tops = count_allowed(self.n_rows, top_k, mask)
+        out_scores = np.zeros((len(indices), tops), dtype=np.float32)
+        out_rows = np.full((len(indices), tops), -1, dtype=np.int64)
+        out_fused = np.zeros((len(indices), tops), dtype=np.float32)
+        for query, (query_scores, query_names) in enumerate(zip(scores, indices)):
+            filled = 0
+            for position, (score, name) in enumerate(zip(query_scores, query_names)):
+                if filled == tops:
+                    break
+                if name < 0:
+                    continue
+                rows = self.rows[self.offsets[name]:self.offsets[name + 1]]
+                if mask is not None:
+                    rows = rows[mask[rows]]
+                if order is not None:
+                    rows = rows[np.argsort(order[rows], kind="stable")]
+                rows = rows[:tops - filled]
+                out_rows[query, filled:filled + len(rows)] = rows
+                out_scores[query, filled:filled + len(rows)] = score
+                if fused is not None:
+                    out_fused[query, filled:filled + len(rows)] = fused[query, position]
+                filled += len(rows)
+        if fused is not None:
+            return out_scores, out_rows, out_fused
+        return out_scores, out_rows
+
+
+class FlatIndex:
+    """
+    Класс FlatIndex - точный поиск по косинусному сходству полным перебором
+    одним матричным умножением на нормализованную матрицу векторов.
+    """
+
+    kind = "flat"
+
+    def __init__(self, embeddings=None, chunk_size=1024, subset_ratio=0.25):
+        """
+        Инициализация объекта класса FlatIndex.
+
+         Параметры:
+              embeddings (np.ndarray): нормализованная матрица векторов, по умолчанию равно None,
+              chunk_size (int): количество запросов, обрабатываемых за одно умножение, ограничивает
+                                размер матрицы сходства в памяти, по умолчанию равно 1024,
+              subset_ratio (float): максимальная доля допустимых строк маски, при которой умножение
+                                    выполняется только на допустимые строки, по умолчанию равно 0.25.
+        """
+        self.embeddings = embeddings
+        self.chunk_size = chunk_size
+        self.subset_ratio = subset_ratio
+
+    def __len__(self):
+        return len(self.embeddings)
+
+    @property
+    def nbytes(self):
+        """
+        Объем памяти, занимаемый матрицей векторов, в байтах.
+        """
+        return self.embeddings.nbytes
+
+    def search(self, vectors=None, top_k=1, mask=None):
+        """
+        Метод search класса FlatIndex.
+        Поиск top_k ближайших векторов для пачки нормализованных запросов.
+
+         Параметры:
+              vectors (np.ndarray): матрица нормализованных векторов запросов, по умолчанию равно None,
+              top_k (int): количество ближайших векторов, по умолчанию равно 1,
+              mask (np.ndarray): булев массив допустимых векторов, по умолчанию равно None - все.
+         Возвращаемое значение:
+              scores (np.ndarray): косинусное сходство размером (количество запросов, top_k),
+              indices (np.ndarray): индексы векторов размером (количество запросов, top_k).
+        """
+        tops = count_allowed(len(self.embeddings), top_k, mask)
+        # если фильтр оставляет малую часть матрицы, то сходство считается только для допустимых строк
+        if mask is not None and tops and np.count_nonzero(mask) <= self.subset_ratio * len(mask):
+            allowed = np.flatnonzero(mask)
+            scores, indices = FlatIndex(embeddings=self.embeddings[allowed], chunk_size=self.chunk_size).search(
+                vectors=vectors, top_k=tops
+            )
+            return scores, allowed[indices]
+        scores = np.empty((len(vectors), tops), dtype=np.float32)
+        indices = np.empty((len(vectors), tops), dtype=np.int64)
+        for start in range(0, len(vectors), self.chunk_size):
+            sim = vectors[start:start + self.chunk_size] @ self.embeddings.T
+            # недопустимые векторы исключаются из отбора
+            if mask is not None:
+                sim[:, ~mask] = -np.inf
+            scores[start:start + self.chunk_size], indices[start:start + self.chunk_size] = top_k_rows(sim, tops)
+        return scores, indices
+
+    def save(self, path=None):
+        """
+        Метод save класса FlatIndex.
+        Точному индексу нечего сохранять кроме самой матрицы, поэтому метод ничего не делает.
+        """
+        pass
+
+
+class IVFIndex:
+    """
+    Класс IVFIndex - приближенный поиск на основе инвертированных списков (IVF).
+    Векторы разбиваются на n_lists кластеров сферическим k-means, при поиске
+    проверяются только векторы из n_probe кластеров с ближайшими к запросу центроидами.
+    Чем больше n_probe, тем выше полнота и ниже скорость поиска.
+    """
+
+    kind = "ivf"
+
+    def __init__(self, embeddings=None, n_lists=None, n_probe=8, n_iter=10, train_size=None,
+                 centroids=None, order=None, offsets=None):
+        """
+        Инициализация объекта класса IVFIndex. Если центроиды и списки не переданы,
+        то индекс обучается на матрице векторов.
+
+         Параметры:
+              embeddings (np.ndarray): нормализованная матрица векторов, по умолчанию равно None,
+              n_lists (int): количество кластеров, по умолчанию равно 4 * sqrt(количество векторов),
+              n_probe (int): количество проверяемых кластеров при поиске, по умолчанию равно 8,
+              n_iter (int): количество итераций k-means, по умолчанию равно 10,
+              train_size (int): количество векторов для обучения k-means, по умолчанию
+                                равно 256 * n_lists,
+              centroids (np.ndarray): центроиды загруженного индекса, по умолчанию равно None,
+              order (np.ndarray): индексы векторов, упорядоченные по кластерам, по умолчанию равно None,
+              offsets (np.ndarray): границы кластеров в order, по умолчанию равно None.
+        """
+        self.embeddings = embeddings
+        self.n_probe = n_probe
+        if centroids is None:
+            n_lists = n_lists or max(1, int(4 * np.sqrt(len(embeddings))))
+            n_lists = min(n_lists, len(embeddings))
+            centroids = self._train(n_lists, n_iter, train_size or 256 * n_lists)
+            assign = self._assign(self.embeddings, centroids)
+            order = np.argsort(assign, kind="stable")
+            offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=n_lists))])
+        self.centroids = centroids
+        self.order = order
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.embeddings)
+
+    @staticmethod
+    def _assign(vectors, centroids, chunk_size=65536):
+        """
+        Статический метод _assign класса IVFIndex.
+        Назначение каждому вектору ближайшего центроида.
+
+         Параметры:
+              vectors (np.ndarray): матрица нормализованных векторов,
+              centroids (np.ndarray): матрица центроидов,
+              chunk_size (int): количество векторов за одно умножение, по умолчанию равно 65536.
+         Возвращаемое значение:
+              (np.ndarray): номер кластера для каждого вектора.
+        """
+        return np.concatenate([
+            np.argmax(vectors[start:start + chunk_size] @ centroids.T, axis=1)
+            for start in range(0, len(vectors), chunk_size)
+        ])
+
+    def _train(self, n_lists, n_iter, train_size):
+        """
+        Метод _train класса IVFIndex.
+        Обучение центроидов сферическим k-means на случайной выборке векторов.
+
+         Параметры:
+              n_lists (int): количество кластеров,
+              n_iter (int): количество итераций,
+              train_size (int): размер обучающей выборки.
+         Возвращаемое значение:
+              centroids (np.ndarray): нормализованная матрица центроидов.
+        """
+        rng = np.random.default_rng(RANDOM)
+        sample_idx = rng.choice(len(self.embeddings), size=min(train_size, len(self.embeddings)), replace=False)
+        sample = np.asarray(self.embeddings[np.sort(sample_idx)], dtype=np.float32)
+        centroids = sample[rng.choice(len(sample), size=n_lists, replace=False)].copy()
+        for _ in range(n_iter):
+            assign = self._assign(sample, centroids)
+            counts = np.bincount(assign, minlength=n_lists)
+            # суммы векторов по кластерам через сортировку по номеру кластера и np.add.reduceat
+            order = np.argsort(assign, kind="stable")
+            starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+            filled = counts > 0
+            sums = np.empty_like(centroids)
+            sums[filled] = np.add.reduceat(sample[order], starts[filled], axis=0)
+            # пустые кластеры заново инициализируем случайными векторами выборки
+            sums[~filled] = sample[rng.choice(len(sample), size=int((~filled).sum()))]
+            centroids = normalize_rows(sums)
+        return centroids
+
+    def search(self, vectors=None, top_k=1, mask=None):
+        """
+        Метод search класса IVFIndex.
+        Поиск top_k ближайших векторов в n_probe ближайших кластерах. Если в них
+        меньше top_k допустимых векторов, то проверяются следующие по близости кластеры.
+
+         Параметры:
+              vectors (np.ndarray): матрица нормализованных векторов запросов, по умолчанию равно None,
+              top_k (int): количество ближайших векторов, по умолчанию равно 1,
+              mask (np.ndarray): булев массив допустимых векторов, по умолчанию равно None - все.
+         Возвращаемое значение:
+              scores (np.ndarray): косинусное сходство размером (количество запросов, top_k),
+              indices (np.ndarray): индексы векторов размером (количество запросов, top_k).
+        """
+        tops = count_allowed(len(self.embeddings), top_k, mask)
+        sizes = np.diff(self.offsets)
+        if mask is not None:
+            # количество допустимых векторов в каждом кластере
+            list_ids = np.repeat(np.arange(len(sizes)), sizes)
+            sizes = np.bincount(list_ids[mask[self.order]], minlength=len(sizes))
+        scores = np.empty((len(vectors), tops), dtype=np.float32)
+        indices = np.empty((len(vectors), tops), dtype=np.int64)
+        # кластеры, упорядоченные по близости центроида к каждому запросу
+        lists_order = np.argsort(-(vectors @ self.centroids.T), axis=1)
+        for i, vector in enumerate(vectors):
+            lists = lists_order[i]
+            # количество проверяемых кластеров, чтобы в них было не меньше top_k векторов
+            n_probe = max(self.n_probe, int(np.searchsorted(np.cumsum(sizes[lists]), tops)) + 1)
+            candidates = np.concatenate([self.order[self.offsets[j]:self.offsets[j + 1]] for j in lists[:n_probe]])
+            if mask is not None:
+                candidates = candidates[mask[candidates]]
+            sim = (np.asarray(self.embeddings[candidates], dtype=np.float32) @ vector)[None, :]
+            part_scores, part = top_k_rows(sim, tops)
+            scores[i] = part_scores[0]
+            indices[i] = candidates[part[0]]
+        return scores, indices
+
+    def save(self, path=None):
+        """
+        Метод save класса IVFIndex.
+        Сохранение центроидов и списков индекса в файл npz вместе с размерностью
+        и контрольной суммой матрицы векторов.
+
+         Параметры:
+              path (str): путь к файлу индекса, по умолчанию равно None.
+        """
+        # файл открывается явно, чтобы np.savez не добавлял расширение .npz к пути
+        with open(path, "wb") as fp:
+            np.savez(fp, centroids=self.centroids, order=self.order, offsets=self.offsets,
+                     n_probe=self.n_probe, dim=self.embeddings.shape[1],
+                     checksum=embeddings_checksum(self.embeddings))
+
+    @classmethod
+    def load(cls, path=None, embeddings=None, n_probe=None):
+        """
+        Метод load класса IVFIndex.
+        Загрузка индекса из файла npz, сохраненного методом save. Количество векторов, размерность
+        и контрольная сумма матрицы должны совпадать с сохраненными.
+
+         Параметры:
+              path (str): путь к файлу индекса, по умолчанию равно None,
+              embeddings (np.ndarray): нормализованная матрица векторов, по которой строился индекс,
+                                       по умолчанию равно None,
+              n_probe (int): количество проверяемых кластеров, если равно None, то берется
+                             сохраненное значение, по умолчанию равно None.
+         Возвращаемое значение:
+              (IVFIndex): загруженный индекс.
+        """
+        data = np.load(path)
+        if int(data["offsets"][-1]) != len(embeddings):
+            raise ValueError(
+                f"Индекс {path} построен для {int(data['offsets'][-1])} векторов, "
+                f"а в матрице {len(embeddings)} векторов."
+            )
+        if "dim" not in data or int(data["dim"]) != embeddings.shape[1]:
+            raise ValueError(f"Индекс {path} построен для векторов другой размерности, "
+                             f"в матрице размерность {embeddings.shape[1]}.")
+        if str(data["checksum"]) != embeddings_checksum(embeddings):
+            raise ValueError(f"Индекс {path} построен для другой матрицы векторов, его нужно построить заново.")
+        return cls(embeddings=embeddings, n_probe=n_probe or int(data["n_probe"]),
+                   centroids=data["centroids"], order=data["order"], offsets=data["offsets"])
+
+
+class QuantizedIndex:
+    """
+    Класс QuantizedIndex - поиск по квантованной матрице векторов.
+    Нормализованная матрица хранится в float16 или в int8 с масштабом для каждой строки,
+    что в 2 или 4 раза меньше float32. Грубый проход выполняется по квантованной матрице,
+    затем top_k * rescore_factor лучших кандидатов пересчитываются точно по матрице float32
+    на диске: отображенной в память матрице exact или файлу path. Если матрицы на диске нет,
+    то пересчета нет и сходство приближенное (по восстановленным из квантованной матрицы векторам).
+    """
+
+    kind = "quantized"
+
+    def __init__(self, embeddings=None, dtype="int8", rescore_factor=4, exact=None, path=None, block_size=32768,
+                 chunk_size=64):
+        """
+        Инициализация объекта класса QuantizedIndex.
+
+         Параметры:
+              embeddings (np.ndarray): нормализованная матрица векторов float32, по умолчанию равно None,
+              dtype (str): тип хранения 'float16' или 'int8', по умолчанию равно 'int8',
+              rescore_factor (int): во сколько раз больше top_k кандидатов пересчитывается точно,
+                                    по умолчанию равно 4,
+              exact (np.ndarray): отображенная в память матрица float32 для точного пересчета (например,
+                                  матрица снимка), по умолчанию равно None,
+              path (str): файл .npy, в который сохраняется матрица float32 для точного пересчета, если exact
+                          не задана, матрица отображается из файла в память и не занимает память процесса,
+                          по умолчанию равно None - без пересчета,
+              block_size (int): количество строк матрицы, восстанавливаемых во float32 за один шаг
+                                грубого прохода, по умолчанию равно 32768,
+              chunk_size (int): количество запросов, обрабатываемых за один грубый проход,
+                                по умолчанию равно 64.
+        """
+        if dtype not in ("float16", "int8"):
+            raise ValueError(f"Неизвестный тип хранения {dtype}, допустимые значения: 'float16', 'int8'.")
+        self.dtype = dtype
+        self.rescore_factor = rescore_factor
+        if exact is None and path is not None:
+            exact = QuantizedIndex.save_exact(embeddings=embeddings, path=path)
+        self.exact = exact
+        self.block_size = block_size
+        self.chunk_size = chunk_size
+        if dtype == "float16":
+            self.embeddings = np.asarray(embeddings, dtype=np.float16)
+            self.scales = None
+        else:
+            # симметричное квантование строки: максимум модуля переходит в 127
+            scales = np.maximum(np.abs(embeddings).max(axis=1), 1e-12) / 127.0
+            self.embeddings = np.round(embeddings / scales[:, None]).astype(np.int8)
+            self.scales = scales.astype(np.float32)
+
+    def __len__(self):
+        return len(self.embeddings)
+
+    @staticmethod
+    def save_exact(embeddings=None, path=None):
+        """
+        Статический метод save_exact класса QuantizedIndex.
+        Сохранение матрицы float32 для точного пересчета в файл и отображение файла в память.
+        Файл записывается во временный файл и переименовывается, поэтому процессы, уже
+        отобразившие прежний файл в память, продолжают читать его без ошибок.
+
+         Параметры:
+              embeddings (np.ndarray): нормализованная матрица векторов float32, по умолчанию равно None,
+              path (str): путь к файлу .npy, по умолчанию равно None.
+         Возвращаемое значение:
+              (np.memmap): матрица, отображенная в память только для чтения.
+        """
+        path = path if path.endswith(".npy") else path + ".npy"
+        tmp_path = f"{path[:-len('.npy')]}.{os.getpid()}.tmp.npy"
+        np.save(tmp_path, np.asarray(embeddings, dtype=np.float32))
+        os.replace(tmp_path, path)
+        return np.load(path, mmap_mode="r")
+
+    @property
+    def nbytes(self):
+        """
+        Объем памяти, занимаемый квантованной матрицей и масштабами, в байтах.
+        """
+        return self.embeddings.nbytes + (0 if self.scales is None else self.scales.nbytes)
+
+    def dequantize(self, rows=None):
+        """
+        Метод dequantize класса QuantizedIndex.
+        Восстановление векторов float32 из квантованной матрицы.
+
+         Параметры:
+              rows (np.ndarray или slice): индексы или срез строк, по умолчанию равно None - все строки.
+         Возвращаемое значение:
+              (np.ndarray): матрица векторов float32.
+        """
+        rows = slice(None) if rows is None else rows
+        vectors = self.embeddings[rows].astype(np.float32)
+        if self.scales is not None:
+            vectors *= self.scales[rows][..., None]
+        return vectors
+
+    def search(self, vectors=None, top_k=1, mask=None):
+        """
+        Метод search класса QuantizedIndex.
+        Грубый поиск по квантованной матрице и точный пересчет лучших кандидатов по матрице
+        float32 на диске, если она задана.
+
+         Параметры:
+              vectors (np.ndarray): матрица нормализованных векторов запросов, по умолчанию равно None,
+              top_k (int): количество ближайших векторов, по умолчанию равно 1,
+              mask (np.ndarray): булев массив допустимых векторов, по умолчанию равно None - все.
+         Возвращаемое значение:
+              scores (np.ndarray): косинусное сходство размером (количество запросов, top_k),
+                                   без матрицы float32 - приближенное, не больше 1,
+              indices (np.ndarray): индексы векторов размером (количество запросов, top_k).
+        """
+        tops = count_allowed(len(self.embeddings), top_k, mask)
+        # без матрицы float32 пересчет по тем же восстановленным векторам ничего не уточняет
+        rescore = self.exact is not None
+        coarse_tops = count_allowed(len(self.embeddings), tops * self.rescore_factor, mask) if rescore else tops
+        scores = np.empty((len(vectors), tops), dtype=np.float32)
+        indices = np.empty((len(vectors), tops), dtype=np.int64)
+        for start in range(0, len(vectors), self.chunk_size):
+            chunk = vectors[start:start + self.chunk_size]
+            # грубый проход: матрица сходства по блокам строк, восстановленных во float32
+            sim = np.empty((len(chunk), len(self.embeddings)), dtype=np.float32)
+            for block in range(0, len(self.embeddings), self.block_size):
+                rows = slice(block, block + self.block_size)
+                sim[:, rows] = chunk @ self.dequantize(rows).T
+            # недопустимые векторы исключаются из отбора
+            if mask is not None:
+                sim[:, ~mask] = -np.inf
+            coarse_scores, candidates = top_k_rows(sim, coarse_tops)
+            if not rescore:
+                # ошибка квантования может дать сходство чуть больше 1
+                scores[start:start + len(chunk)] = np.minimum(coarse_scores, 1.0)
+                indices[start:start + len(chunk)] = candidates
+                continue
+            # точный пересчет кандидатов по строкам матрицы float32, прочитанным с диска
+            for i, vector in enumerate(chunk):
+                rows = np.sort(candidates[i])
+                exact = np.asarray(self.exact[rows], dtype=np.float32)
+                part_scores, part = top_k_rows((exact @ vector)[None, :], tops)
+                scores[start + i] = part_scores[0]
+                indices[start + i] = rows[part[0]]
+        return scores, indices
+
+    def save(self, path=None):
+        """
+        Метод save класса QuantizedIndex.
+        Квантованная матрица строится из матрицы float32 при инициализации, поэтому метод ничего не делает.
+        """
+        pass
+
+
+class FaissIndex:
+    """
+    Класс FaissIndex - приближенный поиск графовым индексом HNSW библиотеки faiss.
+    Доступен только при установленном пакете faiss.
+    """
+
+    kind = "faiss"
+
+    def __init__(self, embeddings=None, m=32, ef_construction=200, ef_search=64, index=None):
+        """
+        Инициализация объекта класса FaissIndex.
+
+         Параметры:
+              embeddings (np.ndarray): нормализованная матрица векторов, по умолчанию равно None,
+              m (int): количество связей вершины графа HNSW, по умолчанию равно 32,
+              ef_construction (int): ширина поиска при построении графа, по умолчанию равно 200,
+              ef_search (int): ширина поиска при запросе, чем больше, тем выше полнота,
+                               по умолчанию равно 64,
+              index (faiss.Index): загруженный индекс faiss, по умолчанию равно None.
+        """
+        if faiss is None:
+            raise ImportError("Для индекса FaissIndex необходимо установить пакет faiss-cpu.")
+        self.embeddings = embeddings
+        if index is None:
+            index = faiss.IndexHNSWFlat(embeddings.shape[1], m, faiss.METRIC_INNER_PRODUCT)
+            index.hnsw.efConstruction = ef_construction
+            index.add(np.ascontiguousarray(embeddings, dtype=np.float32))
+        index.hnsw.efSearch = ef_search
+        self.index = index
+
+    def __len__(self):
+        return self.index.ntotal
+
+    def search(self, vectors=None, top_k=1, mask=None):
+        """
+        Метод search класса FaissIndex.
+        Поиск top_k ближайших векторов графовым индексом.
+
+         Параметры:
+              vectors (np.ndarray): матрица нормализованных векторов запросов, по умолчанию равно None,
+              top_k (int): количество ближайших векторов, по умолчанию равно 1,
+              mask (np.ndarray): булев массив допустимых векторов, по умолчанию равно None - все.
+         Возвращаемое значение:
+              scores (np.ndarray): косинусное сходство размером (количество запросов, не больше top_k),
+                                   -inf - вектор не найден,
+              indices (np.ndarray): индексы векторов размером (количество запросов, не больше top_k),
+                                    -1 - вектор не найден.
+        """
+        tops = count_allowed(self.index.ntotal, top_k, mask)
+        if tops == 0:
+            return np.empty((len(vectors), 0), dtype=np.float32), np.empty((len(vectors), 0), dtype=np.int64)
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if mask is None:
+            scores, indices = self.index.search(vectors, tops)
+        else:
+            # поиск только среди допустимых векторов через селектор идентификаторов faiss
+            selector = faiss.IDSelectorBatch(np.flatnonzero(mask).astype(np.int64))
+            params = faiss.SearchParametersHNSW(sel=selector, efSearch=self.index.hnsw.efSearch)
+            scores, indices = self.index.search(vectors, tops, params=params)
+        # граф HNSW может найти меньше tops векторов, недостающие позиции faiss заполняет -1 в конце строки:
+        # столбцы без найденных векторов отбрасываются, в остальных оценка -inf, чтобы -1 не считался строкой
+        missing = indices < 0
+        width = int((~missing).sum(axis=1).max()) if len(indices) else 0
+        scores = np.where(missing, -np.inf, scores).astype(np.float32)[:, :width]
+        return scores, indices.astype(np.int64)[:, :width]
+
+    def save(self, path=None):
+        """
+        Метод save класса FaissIndex.
+        Сохранение индекса faiss в файл.
+
+         Параметры:
+              path (str): путь к файлу индекса, по умолчанию равно None.
+        """
+        faiss.write_index(self.index, path)
+
+    @classmethod
+    def load(cls, path=None, embeddings=None, ef_search=64):
+        """
+        Метод load класса FaissIndex.
+        Загрузка индекса faiss из файла.
+
+         Параметры:
+              path (str): путь к файлу индекса, по умолчанию равно None,
+              embeddings (np.ndarray): нормализованная матрица векторов, по умолчанию равно None,
+              ef_search (int): ширина поиска при запросе, по умолчанию равно 64.
+         Возвращаемое значение:
+              (FaissIndex): загруженный индекс.
+        """
+        if faiss is None:
+            raise ImportError("Для индекса FaissIndex необходимо установить пакет faiss-cpu.")
+        index = faiss.read_index(path)
+        if index.ntotal != len(embeddings):
+            raise ValueError(
+                f"Индекс {path} построен для {index.ntotal} векторов, а в матрице {len(embeddings)} векторов."
+            )
+        if index.d != embeddings.shape[1]:
+            raise ValueError(f"Индекс {path} построен для векторов размерности {index.d}, "
+                             f"в матрице размерность {embeddings.shape[1]}.")
+        return cls(embeddings=embeddings, ef_search=ef_search, index=index)
+
+
+# доступные типы индексов
+INDEX_TYPES = {index_cls.kind: index_cls for index_cls in (FlatIndex, QuantizedIndex, IVFIndex, FaissIndex)}
+
+
+def make_index(kind="flat", embeddings=None, path=None, **params):
+    """
+    Функция создания индекса для поиска ближайших векторов.
+    Если указан путь к существующему файлу индекса, то индекс загружается с диска,
+    иначе строится по матрице и, если указан путь, сохраняется на диск.
+    Параметры:
+            kind (str): тип индекса 'flat', 'quantized', 'ivf' или 'faiss', по умолчанию равно 'flat',
+            embeddings (np.ndarray): нормализованная матрица векторов, по умолчанию равно None,
+            path (str): путь к файлу индекса (для 'quantized' - к файлу матрицы float32 для точного пересчета),
+                        по умолчанию равно None,
+            **params: параметры индекса, например dtype и rescore_factor для 'quantized',
+                      n_lists и n_probe для 'ivf' или m, ef_search для 'faiss'.
+    Возвращаемое значение:
+            index: объект индекса с методом search.
+    """
+    if kind not in INDEX_TYPES:
+        raise ValueError(f"Неизвестный тип индекса {kind}, допустимые значения: {list(INDEX_TYPES)}.")
+    index_cls = INDEX_TYPES[kind]
+    if kind == "flat":
+        return index_cls(embeddings=embeddings, **params)
+    if kind == "quantized":
+        # для квантованного индекса в файл path сохраняется матрица float32 для точного пересчета
+        return index_cls(embeddings=embeddings, path=path, **params)
+    if path is not None and os.path.exists(path):
+        load_params = {key: value for key, value in params.items() if key in ("n_probe", "ef_search")}
+        return index_cls.load(path=path, embeddings=embeddings, **load_params)
+    index = index_cls(embeddings=embeddings, **params)
+    if path is not None:
+        index.save(path)
+    return index
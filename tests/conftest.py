@@ -0,0 +1,54 @@
+# общие данные для тестов: модули пакета импортируются так же, как в скриптах проекта (from finder import ...)
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "geonames_pkg"))
+
+from encoders import HashingEncoder  # noqa: E402
+
+# векторы городов и запросов создаются кодировщиком без torch
+ENCODER_PARAMS = {"n_features": 256}
+COLS_OUTPUT = ["geoname_id", "name", "country", "latitude", "longitude"]
+
+
+@pytest.fixture
+def cities():
+    """
+    Небольшой датасет городов: повторяющиеся названия, альтернативные имена на кириллице,
+    разные страны, коды объектов, население и координаты.
+    """
+    names = ["Moscow", "Moscow", "Saint Petersburg", "Monchegorsk", "Yerevan", "Almaty", "Kazan", "Sochi",
+             "Sovetsk", "Sovetsk", "Sovetsk", "Sovetskiy"]
+    dataset = pd.DataFrame({
+        "geoname_id": np.arange(len(names)),
+        "name": names,
+        "asciiname": names,
+        "alternatenames": ["Москва,Moskva,MSK", "Moskau", "Санкт-Петербург,СПб,Piter", "Мончегорск", "Ереван,Erevan",
+                           "Алматы,Алма-Ата", "Казань", "Сочи", "Советск", "Советск", "Советск", "Советский"],
+        "country": ["Russia"] * 4 + ["Armenia", "Kazakhstan"] + ["Russia"] * 6,
+        "country_code_iso": ["RU"] * 4 + ["AM", "KZ"] + ["RU"] * 6,
+        "feature_code": ["PPLC", "PPL", "PPLA", "PPL", "PPLC", "PPLA", "PPLA", "PPL", "PPL", "PPL", "PPL", "PPL"],
+        "population": [12000000, 3000, 5000000, 40000, 1000000, 2000000, 1200000, 400000, 40000, 5000, 20000, 25000],
+        "latitude": [55.75, 56.0, 59.94, 67.94, 40.18, 43.25, 55.79, 43.6, 54.5, 55.08, 57.6, 61.36],
+        "longitude": [37.62, 37.9, 30.31, 32.91, 44.51, 76.92, 49.12, 39.73, 21.0, 21.89, 48.9, 63.58],
+    })
+    dataset["embeddings"] = list(HashingEncoder(**ENCODER_PARAMS).encode(texts=dataset["name"]))
+    return dataset
+
+
+@pytest.fixture
+def make_finder(cities):
+    """
+    Фабрика FindCity по датасету cities (или другому датасету) с кодировщиком 'hashing'.
+    """
+    from finder import FindCity
+
+    def make(dataset=None, **params):
+        return FindCity(dataset=cities if dataset is None else dataset, emb_col="embeddings",
+                        cols_output=COLS_OUTPUT, encoder="hashing", encoder_params=ENCODER_PARAMS, **params)
+
+    return make
@@ -0,0 +1,29 @@
+import pandas as pd
+import pytest
+from transliterate import translit
+
+from alias_index import AliasIndex
+from benchmark import legacy_alias_candidates
+
+DATASET = pd.DataFrame({
+    "name": ["Moscow", "Moscow", "Saint Petersburg", "Almaty", "Sochi", "Yerevan", "Monchegorsk"],
+    "alternatenames": ["Москва, Moskva, MSK", "Moskau", "Санкт-Петербург, СПб, Piter", "Алматы, Алма-Ата",
+                       "Сочи", "Ереван, Erevan", None],
+})
+
+
+@pytest.mark.parametrize("city", ["москва", "Moskva", "мск", "спб", "алма", "Ер", "сочи", "Piter", "нет такого",
+                                  "Моченгорск"])
+def test_candidates_match_legacy_search(city):
+    city_t = translit(city, "ru", reversed=True)
+    found = AliasIndex(dataset=DATASET).candidates(city=city, city_t=city_t)
+    assert len(found) == len(set(found))
+    assert set(found) == set(legacy_alias_candidates(city=city, dataset=DATASET))
+
+
+def test_candidates_by_prefix_and_transliteration():
+    index = AliasIndex(dataset=DATASET)
+    assert set(index.candidates(city="алма", city_t="alma")) == {"Almaty"}
+    # транслит запроса совпадает с транслитом альтернативного имени
+    assert set(index.candidates(city="москва", city_t="moskva")) == {"Moscow"}
+    assert index.candidates(city="qwerty", city_t="qwerty") == []
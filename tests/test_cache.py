@@ -0,0 +1,54 @@
+import threading
+
+import numpy as np
+
+from cache import EmbeddingCache, normalize_name
+
+
+def test_hits_misses_and_lru_eviction():
+    cache = EmbeddingCache(max_entries=2)
+    cache.put(("model", "a"), np.array([1.0]))
+    cache.put(("model", "b"), np.array([2.0]))
+    assert cache.get(("model", "a"))[0] == 1.0
+    # "a" использован последним, поэтому вытесняется "b"
+    cache.put(("model", "c"), np.array([3.0]))
+    assert cache.get(("model", "b")) is None
+    assert cache.get(("model", "a")) is not None and cache.get(("model", "c")) is not None
+    assert cache.info() == {"hits": 3, "misses": 1, "hit_rate": 0.75, "size": 2, "max_entries": 2}
+    cache.clear()
+    assert cache.info()["size"] == 0 and cache.info()["hits"] == 0
+
+
+def test_disabled_cache_stores_nothing():
+    cache = EmbeddingCache(max_entries=0)
+    cache.put(("model", "a"), np.array([1.0]))
+    assert cache.get(("model", "a")) is None
+    assert cache.info()["size"] == 0
+
+
+def test_keys_of_different_models_do_not_collide():
+    cache = EmbeddingCache(max_entries=10)
+    cache.put(("model-1", "sochi"), np.array([1.0]))
+    assert cache.get(("model-2", "sochi")) is None
+
+
+def test_normalize_name_unifies_unicode_and_spaces():
+    # "й" из двух кодовых точек и лишние пробелы дают тот же ключ
+    assert normalize_name("  Советски\u0438\u0306   город ") == "Советский город"
+
+
+def test_concurrent_access_keeps_size_bound():
+    cache = EmbeddingCache(max_entries=50)
+
+    def work(offset):
+        for i in range(500):
+            cache.put(("model", str((offset + i) % 80)), np.array([i]))
+            cache.get(("model", str(i % 80)))
+
+    threads = [threading.Thread(target=work, args=(offset,)) for offset in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    info = cache.info()
+    assert info["size"] == 50 and info["hits"] + info["misses"] == 8 * 500
@@ -0,0 +1,105 @@
+import struct
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from database import (PG_BINARY_HEADER, _binary_copy_chunk, _binary_field, _decode_arrays, _decode_binary_arrays,
+                      _text_copy_chunk, _text_field)
+
+
+def unescape(value):
+    # обратное преобразование экранирования текстового формата COPY
+    if value == "\\N":
+        return None
+    replacements = {"\\\\": "\\", "\\t": "\t", "\\n": "\n", "\\r": "\r"}
+    out, pos = [], 0
+    while pos < len(value):
+        pair = value[pos:pos + 2]
+        if pair in replacements:
+            out.append(replacements[pair])
+            pos += 2
+        else:
+            out.append(value[pos])
+            pos += 1
+    return "".join(out)
+
+
+def test_text_copy_round_trip():
+    vectors = np.random.default_rng(0).standard_normal((3, 4)).astype(np.float32)
+    df = pd.DataFrame({
+        "geoname_id": [1, 2, 3],
+        "name": ["Moscow", "tab\there", None],
+        "population": [1.0, np.nan, 3.0],
+        "embeddings": list(vectors),
+    })
+    rows = _text_copy_chunk(df, ["int4", "text", "int8", "_float4"]).decode("utf-8").splitlines()
+    fields = [row.split("\t") for row in rows]
+    assert [int(row[0]) for row in fields] == [1, 2, 3]
+    assert [unescape(row[1]) for row in fields] == ["Moscow", "tab\there", None]
+    assert [row[2] for row in fields] == ["1", "\\N", "3"]
+    decoded = np.array([[float(x) for x in row[3].strip("{}").split(",")] for row in fields], dtype=np.float32)
+    np.testing.assert_array_equal(decoded, vectors)
+
+
+def test_text_field_escapes_special_characters():
+    values = _text_field(pd.Series(["a\\b", "line\nbreak", "cr\r"]), "text")
+    assert values == ["a\\\\b", "line\\nbreak", "cr\\r"]
+    assert [unescape(value) for value in values] == ["a\\b", "line\nbreak", "cr\r"]
+
+
+def test_binary_arrays_layout():
+    vectors = np.random.default_rng(1).standard_normal((5, 8)).astype(np.float32)
+    for field, vector in zip(_binary_field(pd.Series(list(vectors)), "_float4"), vectors):
+        # длина поля, заголовок массива (размерность, флаг пропусков, OID float4, длина, нижняя граница)
+        assert struct.unpack(">6i", field[:24]) == (len(field) - 4, 1, 0, 700, 8, 1)
+        items = np.frombuffer(field[24:], dtype=[("size", ">i4"), ("value", ">f4")])
+        assert (items["size"] == 4).all()
+        np.testing.assert_array_equal(items["value"], vector)
+
+
+def test_binary_scalars_and_nulls():
+    ints = _binary_field(pd.Series([7, None], dtype="Int64"), "int8")
+    assert struct.unpack(">iq", ints[0]) == (8, 7)
+    assert ints[1] == struct.pack(">i", -1)
+    texts = _binary_field(pd.Series(["Ереван", None]), "text")
+    assert texts[0] == struct.pack(">i", len("Ереван".encode("utf-8"))) + "Ереван".encode("utf-8")
+    assert texts[1] == struct.pack(">i", -1)
+
+
+def test_binary_copy_chunk_layout():
+    df = pd.DataFrame({"id": [1, 2], "score": [0.5, 0.25]})
+    chunk = _binary_copy_chunk(df, ["int4", "float8"])
+    # строка - количество полей int16, затем поля с длиной int32
+    row = struct.Struct(">hiiid")
+    assert len(chunk) == 2 * row.size
+    assert row.unpack(chunk[:row.size]) == (2, 4, 1, 8, 0.5)
+    assert row.unpack(chunk[row.size:]) == (2, 4, 2, 8, 0.25)
+    assert PG_BINARY_HEADER.startswith(b"PGCOPY\n\xff\r\n\x00")
+
+
+def test_stream_decodes_binary_arrays_with_null_rows():
+    # значения array_send - поля бинарного COPY без длины, NULL приходит как None
+    vectors = np.random.default_rng(2).standard_normal((4, 6)).astype(np.float32)
+    values = [memoryview(field[4:]) for field in _binary_field(pd.Series(list(vectors)), "_float4")]
+    values[2] = None
+    decoded = _decode_binary_arrays(values)
+    assert decoded.dtype == np.float32 and decoded.shape == (4, 6)
+    np.testing.assert_array_equal(decoded[[0, 1, 3]], vectors[[0, 1, 3]])
+    assert not decoded[2].any()
+
+
+def test_stream_decodes_float8_and_rejects_ragged_arrays():
+    vectors = np.random.default_rng(3).standard_normal((2, 3))
+    values = [field[4:] for field in _binary_field(pd.Series(list(vectors)), "_float8")]
+    np.testing.assert_allclose(_decode_binary_arrays(values), vectors.astype(np.float32))
+    short = _binary_field(pd.Series([vectors[0][:2]]), "_float8")[0][4:]
+    with pytest.raises(ValueError, match="одной длины"):
+        _decode_binary_arrays([values[0], short])
+    assert _decode_binary_arrays([None, None]).shape == (2, 0)
+
+
+def test_stream_decodes_text_arrays():
+    decoded = _decode_arrays([[0.5, 1.0], None, [2.0, -1.0]])
+    assert decoded.dtype == np.float32
+    assert decoded.tolist() == [[0.5, 1.0], [0.0, 0.0], [2.0, -1.0]]
@@ -0,0 +1,195 @@
+import csv
+import os
+import zipfile
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from config import CITY_COLS, COL_TYPES, USE_CITY_COLS
+from dataset import DatasetLoader, reduce_mem_usage
+from encoders import HashingEncoder, embedding_info
+
+NAMES = ["Moscow", "Sochi", "Kazan", "Yerevan"]
+
+
+def encode(names, n_features):
+    return DatasetLoader().load_city_embeddings(id_emb_col=list(names), encoder="hashing",
+                                                encoder_params={"n_features": n_features})
+
+
+def refresh(existing, existing_info, n_features=256):
+    return DatasetLoader().refresh_city_embeddings(id_emb_col=NAMES + ["Almaty"], existing=existing,
+                                                   existing_info=existing_info, encoder="hashing",
+                                                   encoder_params={"n_features": n_features})
+
+
+def test_refresh_encodes_only_new_names_with_same_encoder():
+    existing = encode(NAMES[:3] + ["Removed"], 256)
+    info = embedding_info("hashing", dim=256, n_features=256)
+    new, orphans = refresh(existing, info)
+    assert sorted(new["name"]) == ["Almaty", "Yerevan"] and orphans == ["Removed"]
+
+
+@pytest.mark.parametrize("info", [
+    embedding_info("hashing", dim=128, n_features=128),
+    embedding_info("sentence_transformers", model_id="sentence-transformers/LaBSE", dim=256),
+    None,
+])
+def test_refresh_rebuilds_vectors_of_other_encoder(tmp_path, info):
+    loader = DatasetLoader()
+    existing = encode(NAMES, 128 if info is None else info["dim"])
+    new, orphans = refresh(existing, info)
+    # все названия векторизуются заново, поэтому в сохраненном датасете одна размерность
+    assert sorted(new["name"]) == sorted(NAMES + ["Almaty"]) and orphans == []
+    kept = existing[~existing["name"].isin(orphans) & ~existing["name"].isin(new["name"])]
+    dataset = pd.concat([kept, new], ignore_index=True)
+    loader.save_dataset_to_file(dataset=dataset, file_name="embeddings", dir_to_save=str(tmp_path),
+                                file_format="parquet")
+    loaded = loader.load_dataset_from_file(file_name="embeddings", dir_to_load=str(tmp_path))
+    assert {len(vector) for vector in loaded["embeddings"]} == {256}
+
+
+def test_embedding_info_round_trip(tmp_path):
+    loader = DatasetLoader()
+    assert loader.load_embedding_info(file_name="embeddings", dir_to_load=str(tmp_path)) is None
+    info = embedding_info("hashing", model_id="unused", dim=256, n_features=256)
+    loader.save_embedding_info(info=info, file_name="embeddings", dir_to_save=str(tmp_path))
+    assert loader.load_embedding_info(file_name="embeddings", dir_to_load=str(tmp_path)) == info
+    assert info["encoder_name"] == "hashing-char-2-3-256-translit"
+
+
+def test_parquet_countries_filter_keeps_vectors_aligned(tmp_path, cities):
+    loader = DatasetLoader()
+    loader.save_dataset_to_file(dataset=cities, file_name="cities", dir_to_save=str(tmp_path), file_format="parquet",
+                                row_group_size=3)
+    loaded = loader.load_dataset_from_file(file_name="cities", dir_to_load=str(tmp_path), countries=["AM", "KZ"],
+                                           columns=["geoname_id", "embeddings"])
+    assert sorted(loaded["geoname_id"]) == [4, 5]
+    for geoname_id, vector in zip(loaded["geoname_id"], loaded["embeddings"]):
+        np.testing.assert_array_equal(vector, cities["embeddings"].iloc[geoname_id])
+
+
+class FailingEncoder(HashingEncoder):
+    # кодировщик, который считает вызовы и падает на вызове с номером fail_on
+    def __init__(self, fail_on=None):
+        super().__init__(n_features=64)
+        self.calls = 0
+        self.fail_on = fail_on
+
+    def encode(self, texts=None, batch_size=64, show_progress_bar=False):
+        self.calls += 1
+        if self.calls == self.fail_on:
+            raise RuntimeError("сбой векторизации")
+        return super().encode(texts=texts)
+
+
+def test_checkpoint_resumes_after_failure(tmp_path):
+    loader = DatasetLoader()
+    names = NAMES + ["Almaty"]
+    checkpoint_dir = str(tmp_path / "checkpoint")
+    with pytest.raises(RuntimeError):
+        loader.load_city_embeddings(id_emb_col=names, encoder=FailingEncoder(fail_on=2), checkpoint_dir=checkpoint_dir,
+                                    checkpoint_size=2)
+    # первая часть сохранена, повторный запуск векторизует только две оставшиеся части
+    assert sorted(os.listdir(checkpoint_dir)) == ["manifest.json", "part_00000.npy"]
+    encoder = FailingEncoder()
+    resumed = loader.load_city_embeddings(id_emb_col=names, encoder=encoder, checkpoint_dir=checkpoint_dir,
+                                          checkpoint_size=2)
+    assert encoder.calls == 2
+    full = loader.load_city_embeddings(id_emb_col=names, encoder=FailingEncoder(), checkpoint_size=2)
+    assert resumed["name"].tolist() == full["name"].tolist()
+    np.testing.assert_array_equal(np.stack(resumed["embeddings"]), np.stack(full["embeddings"]))
+    # после сборки всех частей контрольные точки удаляются
+    assert not os.path.exists(checkpoint_dir)
+
+
+def test_checkpoint_of_other_names_is_discarded(tmp_path):
+    loader = DatasetLoader()
+    checkpoint_dir = str(tmp_path / "checkpoint")
+    with pytest.raises(RuntimeError):
+        loader.load_city_embeddings(id_emb_col=NAMES, encoder=FailingEncoder(fail_on=2), checkpoint_dir=checkpoint_dir,
+                                    checkpoint_size=2)
+    encoder = FailingEncoder()
+    loader.load_city_embeddings(id_emb_col=NAMES[:3], encoder=encoder, checkpoint_dir=checkpoint_dir, checkpoint_size=2)
+    assert encoder.calls == 2
+
+
+def write_dump(path, n_rows=40):
+    # строки в формате cities500.txt: страна и население меняются по номеру строки, в названиях есть кавычки
+    lines = []
+    for i in range(n_rows):
+        row = dict.fromkeys(CITY_COLS, "")
+        row.update(city_geoname_id=str(i), name=f'"Town" {i}', asciiname=f"Town {i}", latitude="55.5",
+                   longitude="37.5", feature_class="P" if i % 4 else "A", feature_code="PPL",
+                   country_code_iso=["RU", "KZ", "AM"][i % 3], admin_1_code="01", population=str(i * 100),
+                   timezone="Europe/Moscow", modification_date="2024-01-01")
+        lines.append("\t".join(row[col] for col in CITY_COLS))
+    with open(path, "w", encoding="utf-8") as fp:
+        fp.write("\n".join(lines) + "\n")
+
+
+@pytest.mark.parametrize("processes", [0, 2])
+@pytest.mark.parametrize("archive", [False, True])
+def test_load_dataset_filtered_matches_full_read(tmp_path, processes, archive):
+    write_dump(tmp_path / "cities.txt")
+    file = "cities.txt"
+    if archive:
+        with zipfile.ZipFile(tmp_path / "cities.zip", "w") as zf:
+            zf.write(tmp_path / "cities.txt", arcname="cities.txt")
+        file = "cities.zip"
+    loader = DatasetLoader(work_dir=str(tmp_path))
+    filtered = loader.load_dataset_filtered(file=file, df_cols=CITY_COLS, use_cols=USE_CITY_COLS, col_types=COL_TYPES,
+                                            countries=["RU", "KZ"], feature_classes=["P"], min_population=1000,
+                                            block_size=512, processes=processes)
+    full = pd.read_csv(tmp_path / "cities.txt", header=None, names=CITY_COLS, usecols=USE_CITY_COLS, dtype=COL_TYPES,
+                       delimiter="\t", quoting=csv.QUOTE_NONE)
+    expected = full[full["country_code_iso"].isin(["RU", "KZ"]) & (full["feature_class"] == "P")
+                    & (full["population"] >= 1000)].reset_index(drop=True)
+    assert len(expected) > 0
+    assert filtered.columns.tolist() == USE_CITY_COLS
+    pd.testing.assert_frame_equal(filtered, expected)
+
+
+def test_load_dataset_filtered_reads_filter_columns_outside_use_cols(tmp_path):
+    write_dump(tmp_path / "cities.txt")
+    loader = DatasetLoader(work_dir=str(tmp_path))
+    filtered = loader.load_dataset_filtered(file="cities.txt", df_cols=CITY_COLS, use_cols=["name"],
+                                            col_types=COL_TYPES, countries=["AM"])
+    assert filtered.columns.tolist() == ["name"]
+    assert filtered["name"].tolist() == [f'"Town" {i}' for i in range(2, 40, 3)]
+
+
+def make_frame(n_rows=200):
+    return pd.DataFrame({
+        "latitude": np.linspace(40.0, 60.0, n_rows),
+        "longitude": np.linspace(30.0, 50.0, n_rows),
+        "elevation": np.linspace(0.0, 100.0, n_rows),
+        "population": np.arange(n_rows, dtype=np.int64) * 1000,
+        "country_code_iso": ["RU", "KZ"] * (n_rows // 2),
+        "alternatenames": [f"Town {i},Город {i}" for i in range(n_rows)],
+    })
+
+
+def test_reduce_mem_usage_keeps_coordinates_float32():
+    df = reduce_mem_usage(make_frame())
+    assert df["latitude"].dtype == np.float32
+    assert df["longitude"].dtype == np.float32
+    # остальные дробные столбцы опускаются до float16
+    assert df["elevation"].dtype == np.float16
+    assert df["population"].dtype == np.int32
+
+
+def test_reduce_mem_usage_converts_low_cardinality_strings_to_category():
+    df = reduce_mem_usage(make_frame())
+    assert isinstance(df["country_code_iso"].dtype, pd.CategoricalDtype)
+    assert df["alternatenames"].dtype == object
+    assert df["country_code_iso"].tolist()[:2] == ["RU", "KZ"]
+
+
+def test_reduce_mem_usage_arrow_strings():
+    pytest.importorskip("pyarrow")
+    frame = make_frame()
+    df = reduce_mem_usage(frame.copy(), arrow_strings=True)
+    assert df["alternatenames"].dtype == "string[pyarrow]"
+    assert df["alternatenames"].tolist() == frame["alternatenames"].tolist()
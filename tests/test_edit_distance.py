@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from edit_distance import osa_distance, rerank, rapidfuzz_process, similarity
+
+
+def osa_reference(left, right):
+    rows = [[i + j if i * j == 0 else 0 for j in range(len(right) + 1)] for i in range(len(left) + 1)]
+    for i in range(1, len(left) + 1):
+        for j in range(1, len(right) + 1):
+            cost = left[i - 1] != right[j - 1]
+            rows[i][j] = min(rows[i - 1][j] + 1, rows[i][j - 1] + 1, rows[i - 1][j - 1] + cost)
+            if i > 1 and j > 1 and left[i - 1] == right[j - 2] and left[i - 2] == right[j - 1]:
+                rows[i][j] = min(rows[i][j], rows[i - 2][j - 2] + 1)
+    return rows[-1][-1]
+
+
+def random_names(count, seed=0):
+    rng = np.random.default_rng(seed)
+    alphabet = list("abcdeмскваё- ")
+    return ["".join(rng.choice(alphabet, rng.integers(0, 12))) for _ in range(count)]
+
+
+@pytest.mark.parametrize("query", ["moskva", "ca", "масква", "a" * 70, ""])
+def test_osa_distance_matches_reference(query):
+    # кандидаты длиннее 64 символов считаются построчно
+    candidates = random_names(300) + ["b" * 80, "a" * 66 + "ba", "ac", "moksva"]
+    expected = [osa_reference(query, candidate) for candidate in candidates]
+    np.testing.assert_array_equal(osa_distance(query=query, candidates=candidates), expected)
+
+
+def test_osa_distance_is_capped_by_max_distance():
+    candidates = random_names(300, seed=2) + ["moskva", "mosvka", "m"]
+    expected = np.minimum([osa_reference("moskva", candidate) for candidate in candidates], 3)
+    np.testing.assert_array_equal(osa_distance(query="moskva", candidates=candidates, max_distance=2), expected)
+
+
+@pytest.mark.skipif(rapidfuzz_process is None, reason="нужен пакет rapidfuzz")
+def test_similarity_backends_agree():
+    candidates = random_names(200, seed=1)
+    np.testing.assert_allclose(similarity(query="moskva", candidates=candidates, backend="numpy"),
+                               similarity(query="moskva", candidates=candidates, backend="rapidfuzz"))
+
+
+def test_rerank_prefers_closer_names():
+    order, scores = rerank(query="sovetsk", candidates=["sochi", "sovetskiy", "sovetsk"], scores=[0.9, 0.8, 0.7],
+                           weight=0.5, backend="numpy")
+    assert order.tolist() == [2, 1, 0]
+    assert np.all(np.diff(scores) <= 0)
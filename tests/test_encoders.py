@@ -0,0 +1,60 @@
+import string
+
+import numpy as np
+import pytest
+
+from encoders import HashingEncoder, encoder_name, make_encoder
+
+NAMES = ["Moscow", "Москва", "Saint Petersburg", "Sochi"]
+
+
+def test_hashing_encoder_vectors():
+    encoder = make_encoder(kind="hashing", n_features=256)
+    vectors = encoder.encode(texts=NAMES)
+    assert vectors.shape == (4, 256) and encoder.dim == 256
+    np.testing.assert_allclose(np.linalg.norm(vectors, axis=1), 1.0, rtol=1e-6)
+    # транслитерация сближает названия на кириллице и латинице
+    assert vectors[0] @ vectors[1] > vectors[0] @ vectors[3]
+    np.testing.assert_array_equal(vectors, HashingEncoder(n_features=256).encode(texts=NAMES))
+
+
+def test_encoder_name_matches_encoder():
+    for params in [{}, {"n_features": 128, "transliterate": False}, {"ngram_range": (1, 4)}]:
+        assert encoder_name("hashing", model_id="ignored", **params) == make_encoder(kind="hashing", **params).name
+    assert encoder_name("sentence_transformers", model_id="a/b") == encoder_name("quantized", model_id="a/b") == "a/b"
+    with pytest.raises(ValueError):
+        encoder_name("unknown")
+
+
+@pytest.fixture(scope="module")
+def tiny_model(tmp_path_factory):
+    # небольшая случайная модель BERT без загрузки из сети
+    pytest.importorskip("torch")
+    pytest.importorskip("sentence_transformers")
+    from sentence_transformers import SentenceTransformer, models
+    from transformers import BertConfig, BertModel, BertTokenizerFast
+    path = tmp_path_factory.mktemp("tiny")
+    chars = list(string.ascii_letters + "абвгдежзийклмнопрстуфхцчшщъыьэюяАБВГДЕЖЗИЙКЛМНОПРСТУФХЦЧШЩЪЫЬЭЮЯ- ")
+    (path / "vocab.txt").write_text("\n".join(["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + chars
+                                              + ["##" + char for char in chars]))
+    BertTokenizerFast(str(path / "vocab.txt"), do_lower_case=False).save_pretrained(str(path / "bert"))
+    config = BertConfig(vocab_size=5 + 2 * len(chars), hidden_size=64, num_hidden_layers=2, num_attention_heads=2,
+                        intermediate_size=128, max_position_embeddings=64)
+    BertModel(config).save_pretrained(str(path / "bert"))
+    transformer = models.Transformer(str(path / "bert"), max_seq_length=32)
+    model = SentenceTransformer(modules=[transformer, models.Pooling(transformer.get_word_embedding_dimension())])
+    model.save(str(path / "st"))
+    return str(path / "st")
+
+
+def test_sentence_transformer_and_quantized_encoders(tiny_model):
+    encoder = make_encoder(kind="sentence_transformers", model_id=tiny_model, device="cpu")
+    quantized = make_encoder(kind="quantized", model_id=tiny_model)
+    vectors, q_vectors = encoder.encode(texts=NAMES), quantized.encode(texts=NAMES)
+    assert vectors.shape == q_vectors.shape == (4, 64) and encoder.dim == quantized.dim == 64
+    assert encoder.name == quantized.name == encoder_name("quantized", model_id=tiny_model)
+    # квантованная модель дает векторы, близкие к векторам исходной модели
+    cos = np.sum(vectors * q_vectors, axis=1) / np.linalg.norm(vectors, axis=1) / np.linalg.norm(q_vectors, axis=1)
+    assert cos.min() > 0.95
+    with pytest.raises(ValueError, match="CPU"):
+        make_encoder(kind="quantized", model_id=tiny_model, device="cuda:0")
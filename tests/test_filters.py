@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from filters import RowFilter
+
+
+def expected_mask(dataset, countries=None, min_population=None, feature_codes=None, bbox=None):
+    mask = np.ones(len(dataset), dtype=bool)
+    if countries is not None:
+        mask &= (dataset["country"].isin(countries) | dataset["country_code_iso"].isin(countries)).to_numpy()
+    if min_population is not None:
+        mask &= (dataset["population"] >= min_population).to_numpy()
+    if feature_codes is not None:
+        mask &= dataset["feature_code"].isin(feature_codes).to_numpy()
+    if bbox is not None:
+        min_lat, min_lon, max_lat, max_lon = bbox
+        mask &= dataset["latitude"].between(min_lat, max_lat).to_numpy()
+        mask &= dataset["longitude"].between(min_lon, max_lon).to_numpy()
+    return mask
+
+
+@pytest.mark.parametrize("params", [
+    {"countries": ["Russia"]},
+    {"countries": ["AM", "Kazakhstan"]},
+    {"min_population": 40000},
+    {"feature_codes": ["PPLC", "PPLA"]},
+    {"bbox": [50, 20, 60, 50]},
+    {"countries": ["RU"], "min_population": 20000, "bbox": [40, 20, 70, 70]},
+])
+def test_mask_matches_dataframe_filter(cities, params):
+    mask = RowFilter(dataset=cities).mask(**params)
+    np.testing.assert_array_equal(mask, expected_mask(cities, **params))
+
+
+def test_mask_is_cached_and_read_only(cities):
+    row_filter = RowFilter(dataset=cities)
+    first = row_filter.mask(countries="Russia", min_population=1000)
+    assert row_filter.mask(countries=["Russia"], min_population=1000) is first
+    assert not first.flags.writeable
+    assert row_filter.mask() is None
+
+
+def test_bbox_across_antimeridian(cities):
+    dataset = cities.copy()
+    dataset.loc[0, "longitude"] = 179.5
+    dataset.loc[1, "longitude"] = -179.5
+    mask = RowFilter(dataset=dataset).mask(bbox=[50, 179, 60, -179])
+    assert np.flatnonzero(mask).tolist() == [0, 1]
+
+
+def test_missing_columns_fail_only_when_filter_is_requested(cities):
+    row_filter = RowFilter(dataset=cities.drop(columns=["population", "feature_code", "latitude", "longitude"]))
+    assert row_filter.mask(countries="Armenia").sum() == 1
+    with pytest.raises(ValueError, match="population"):
+        row_filter.mask(min_population=1000)
+    with pytest.raises(ValueError, match="feature_code"):
+        row_filter.mask(feature_codes="PPLC")
+    with pytest.raises(ValueError, match="latitude"):
+        row_filter.mask(bbox=[0, 0, 1, 1])
@@ -0,0 +1,175 @@
+import numpy as np
+import pytest
+
+from conftest import COLS_OUTPUT, ENCODER_PARAMS
+from finder import FindCity
+from lexical_index import NgramIndex, top_k_sparse
+from snapshot import export_snapshot
+
+
+def test_quantized_finder_keeps_no_float32_matrix(make_finder, cities):
+    finder = make_finder(emb_dtype="int8", exact_match=False)
+    assert finder.cities_emb.dtype == np.int8
+    assert finder.index.exact is None
+    result = finder.get_city(city="Sovetsk", speller=None)
+    assert result["name"].iloc[0] == "Sovetsk"
+    assert result["cos_sim_score"].iloc[0] <= 1.0
+
+
+def test_quantized_finder_rescores_from_snapshot(make_finder, cities, tmp_path):
+    export_snapshot(dataset=cities, snapshot_dir=str(tmp_path), model_id=None, encoder="hashing",
+                    encoder_params=ENCODER_PARAMS)
+    finder = FindCity.from_snapshot(path=str(tmp_path), cols_output=COLS_OUTPUT, emb_dtype="int8", exact_match=False,
+                                    encoder="hashing", encoder_params=ENCODER_PARAMS)
+    assert isinstance(finder.index.exact, np.memmap)
+    queries = ["Sovetsky", "Moskow", "Kazan city"]
+    quantized = finder.get_cities(cities=queries, top_k=3, speller=None)
+    full = make_finder(exact_match=False).get_cities(cities=queries, top_k=3, speller=None)
+    for left, right in zip(quantized, full):
+        assert left["geoname_id"].tolist() == right["geoname_id"].tolist()
+        np.testing.assert_allclose(left["cos_sim_score"], right["cos_sim_score"], atol=1e-6)
+
+
+def test_quantized_finder_rescores_from_index_path(make_finder, tmp_path):
+    finder = make_finder(emb_dtype="int8", exact_match=False, index_path=str(tmp_path / "exact.npy"))
+    assert isinstance(finder.index.exact, np.memmap)
+    assert finder.cities_emb.dtype == np.int8
+
+
+def test_exact_hit_is_kept_when_top_k_exceeds_exact_rows(make_finder):
+    finder = make_finder()
+    # у названия Москва одна строка с точным совпадением в alternatenames
+    result = finder.get_city(city="Москва", top_k=3, speller=None)
+    assert len(result) == 3
+    assert result["geoname_id"].iloc[0] == 0
+    assert result["cos_sim_score"].iloc[0] == 1.0
+    assert result["geoname_id"].is_unique
+
+
+def test_exact_hits_come_first_in_batch(make_finder):
+    finder = make_finder()
+    single = finder.get_city(city="Sovetsk", top_k=5, speller=None)
+    batch = finder.get_cities(cities=["Sovetsk", "Sovetsk", "Moskow"], top_k=5, speller=None)
+    # три города Sovetsk упорядочены по населению, затем города из векторного поиска
+    assert single["geoname_id"].tolist()[:3] == [8, 10, 9]
+    assert (single["cos_sim_score"].iloc[:3] == 1.0).all()
+    assert len(single) == 5 and single["geoname_id"].is_unique
+    assert batch[0]["geoname_id"].tolist() == single["geoname_id"].tolist()
+    assert batch[1]["geoname_id"].tolist() == single["geoname_id"].tolist()
+    # повторное название получает отдельную копию результата
+    assert batch[1] is not batch[0]
+    batch[1].loc[:, "name"] = "changed"
+    assert batch[0]["name"].iloc[0] == "Sovetsk"
+    dicts = finder.get_cities(cities=["Moskow", "Moskow"], top_k=2, output_dict_json=True, speller=None)
+    assert dicts[0] == dicts[1] and dicts[0][0] is not dicts[1][0]
+
+
+def test_exact_complete_skips_vector_search(make_finder):
+    finder = make_finder()
+    finder.get_cities(cities=["Sovetsk"], top_k=3, speller=None)
+    finder.get_cities(cities=["Sovetsk"], top_k=4, speller=None)
+    # при top_k=3 хватает точных совпадений, при top_k=4 нужна модель
+    assert finder.exact_info()["hits"] == 1
+    assert finder.cache_info()["misses"] == 1
+
+
+def test_exact_hits_respect_filters(make_finder):
+    finder = make_finder()
+    result = finder.get_city(city="Sovetsk", top_k=2, speller=None, min_population=10000)
+    assert result["geoname_id"].tolist() == [8, 10]
+
+
+def test_finder_without_population_and_coordinates(cities):
+    # столбцы запроса QUERY до добавления населения и кодов объектов, без координат
+    dataset = cities[["geoname_id", "name", "alternatenames", "country", "embeddings"]]
+    finder = FindCity(dataset=dataset, emb_col="embeddings", cols_output=["geoname_id", "name", "country"],
+                      encoder="hashing", encoder_params=ENCODER_PARAMS)
+    assert finder.get_city(city="Sochi", speller=None)["geoname_id"].iloc[0] == 7
+    assert len(finder.get_city(city="Sovetsk", top_k=3, speller=None, countries="Russia")) == 3
+    with pytest.raises(ValueError, match="population"):
+        finder.get_city(city="Sochi", speller=None, min_population=1000)
+    with pytest.raises(ValueError, match="latitude"):
+        finder.get_city(city="Sochi", speller=None, near=[55, 37])
+    with pytest.raises(ValueError, match="latitude"):
+        finder.reverse_geocode(latitude=55, longitude=37)
+
+
+def test_hybrid_search_is_off_by_default(make_finder):
+    finder = make_finder()
+    assert finder.lexical_index is None
+    assert "score" not in finder.get_city(city="Moskow", speller=None).columns
+
+
+def test_hybrid_scores_are_normalized_and_reported_separately(make_finder, cities):
+    finder = make_finder(lexical_weight=0.3, exact_match=False)
+    assert finder.lexical_weight + finder.semantic_weight == pytest.approx(1.0)
+    queries = ["Moskow", "Sovetskiy", "Kazan city", "Sochy"]
+    vectors = finder.encode(cities=queries)
+    embeddings = np.stack(cities["embeddings"].to_numpy())
+    embeddings = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    for query, vector, result in zip(queries, vectors, finder.get_cities(cities=queries, top_k=4, speller=None)):
+        # в cos_sim_score - косинусное сходство, в score - итоговая оценка не больше 1
+        cos_sim = embeddings[result["geoname_id"].to_numpy()] @ vector
+        np.testing.assert_allclose(result["cos_sim_score"], cos_sim, atol=1e-5)
+        assert (result["score"] <= 1.0 + 1e-6).all()
+        assert result["score"].is_monotonic_decreasing
+        single = finder.get_city(city=query, top_k=4, speller=None)
+        assert single["geoname_id"].tolist() == result["geoname_id"].tolist()
+
+
+def test_exact_hits_have_full_hybrid_score(make_finder):
+    result = make_finder(lexical_weight=0.5, semantic_weight=0.5).get_city(city="Sovetsk", top_k=4, speller=None)
+    assert (result[["cos_sim_score", "score"]].iloc[:3] == 1.0).all().all()
+    assert result["score"].iloc[3] < 1.0
+
+
+def test_lexical_scores_stay_sparse_and_masked(cities):
+    index = NgramIndex(dataset=cities)
+    queries = ["Sovetskiy", "Moskow", "Qwzx"]
+    sim = index.scores(cities=queries)
+    assert sim.format == "csr" and sim.shape == (len(queries), len(cities))
+    dense = sim.toarray()
+    assert not dense[2].any()
+    mask = np.ones(len(cities), dtype=bool)
+    mask[[8, 9]] = False
+    scores, ids = top_k_sparse(sim, top_k=3, mask=mask)
+    for row in range(len(queries)):
+        allowed = np.flatnonzero(mask & (dense[row] > 0))
+        expected = allowed[np.argsort(-dense[row, allowed], kind="stable")][:3]
+        found = ids[row][ids[row] >= 0]
+        np.testing.assert_allclose(np.sort(dense[row, found]), np.sort(dense[row, expected]))
+        np.testing.assert_allclose(scores[row][:len(found)], dense[row, found])
+    assert ids[2].tolist() == [-1, -1, -1]
+
+
+def test_invalid_hybrid_weights(make_finder):
+    with pytest.raises(ValueError, match="lexical_weight"):
+        make_finder(lexical_weight=0.5, semantic_weight=-0.5)
+
+
+def test_rerank_is_off_by_default(make_finder):
+    finder = make_finder()
+    assert finder.rerank_names is None and not finder.fused_scores
+
+
+def test_rerank_reports_cosine_and_fused_score_separately(make_finder, cities):
+    finder = make_finder(rerank_weight=0.5, exact_match=False)
+    vector = finder.encode(cities=["Sovetskk"])[0]
+    embeddings = np.stack(cities["embeddings"].to_numpy())
+    embeddings = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    result = finder.get_city(city="Sovetskk", top_k=4, speller=None)
+    np.testing.assert_allclose(result["cos_sim_score"], embeddings[result["geoname_id"].to_numpy()] @ vector,
+                               atol=1e-5)
+    assert result["score"].is_monotonic_decreasing and (result["score"] <= 1.0).all()
+    assert result["name"].iloc[0] == "Sovetsk"
+
+
+def test_invalid_rerank_weight(make_finder):
+    with pytest.raises(ValueError, match="rerank_weight"):
+        make_finder(rerank_weight=1.5)
+
+
+def test_missing_candidates_are_dropped(make_finder):
+    finder = make_finder(unique_names=False)
+    result = finder.make_result(indices=np.array([4, -1]), scores=np.array([0.9, -np.inf]))
+    assert result["geoname_id"].tolist() == [4]
@@ -0,0 +1,40 @@
+import os
+
+import pandas as pd
+
+import geocode
+from config import FINDER_PARAMS
+from finder import FindCity
+from geocode import ChunkWriter, match_chunk
+
+
+def test_load_finder_uses_shared_params(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(geocode, "SNAPSHOT_DIR", str(tmp_path))
+    monkeypatch.setattr(FindCity, "from_snapshot", classmethod(lambda cls, **params: calls.append(params)))
+    geocode.load_finder()
+    # параметры индекса, точных совпадений, уникальных названий, гибридного поиска и кодировщика
+    assert calls == [dict(path=str(tmp_path), **FINDER_PARAMS)]
+    assert {"index", "exact_match", "unique_names", "lexical_weight", "rerank_weight", "encoder"} <= calls[0].keys()
+
+
+def test_parquet_resume_skips_foreign_files(tmp_path):
+    path = str(tmp_path / "out")
+    writer = ChunkWriter(path=path, file_format="parquet")
+    for chunk in range(2):
+        writer.write(result=pd.DataFrame({"row": [chunk]}), rows=1)
+    # незафиксированная часть и посторонние файлы в директории результата
+    pd.DataFrame({"row": [2]}).to_parquet(os.path.join(path, "part-000002.parquet"))
+    for name in ["_SUCCESS", "part-000001.parquet.crc", "notes-v2.txt"]:
+        open(os.path.join(path, name), "w").close()
+    ChunkWriter(path=path, file_format="parquet", resume=True)
+    assert sorted(os.listdir(path)) == ["_SUCCESS", "notes-v2.txt", "part-000000.parquet", "part-000001.parquet",
+                                        "part-000001.parquet.crc"]
+
+
+def test_match_chunk_adds_fused_score_column(make_finder):
+    names = ["Moskow", "", "Sovetsk"]
+    plain = match_chunk(make_finder(), names, 10, 2, False, None, 64)
+    hybrid = match_chunk(make_finder(lexical_weight=0.3), names, 10, 2, False, None, 64)
+    assert plain["row"].tolist() == [10, 10, 12, 12]
+    assert "score" not in plain.columns and "score" in hybrid.columns
@@ -0,0 +1,112 @@
+import os
+import pickle
+import threading
+import time
+
+import pytest
+
+from scheduler import BatchScheduler
+
+
+def run_in_child(target):
+    # результат функции target в дочернем процессе после fork
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        try:
+            payload = pickle.dumps(target())
+        except BaseException as exc:
+            payload = pickle.dumps(repr(exc))
+        with os.fdopen(write_fd, "wb") as stream:
+            stream.write(payload)
+        os._exit(0)
+    os.close(write_fd)
+    with os.fdopen(read_fd, "rb") as stream:
+        payload = stream.read()
+    os.waitpid(pid, 0)
+    return pickle.loads(payload)
+
+
+def test_results_match_finder(make_finder):
+    finder = make_finder()
+    scheduler = BatchScheduler(finder=finder)
+    for city, top_k in [("Moskow", 2), ("Sovetsk", 3), ("Sovetsk", 5)]:
+        result = scheduler.match(city=city, top_k=top_k, speller=None, timeout=5)
+        assert result["geoname_id"].tolist() == finder.get_city(city=city, top_k=top_k,
+                                                                speller=None)["geoname_id"].tolist()
+    scheduler.close()
+
+
+def test_exact_hits_skip_batch_thread(make_finder):
+    scheduler = BatchScheduler(finder=make_finder())
+    assert scheduler.match(city="Sovetsk", top_k=3, speller=None, timeout=5)["geoname_id"].tolist() == [8, 10, 9]
+    assert scheduler._thread is None and scheduler.metrics()["batches"] == 0
+
+
+@pytest.mark.parametrize("started_in_parent", [False, True])
+def test_worker_thread_is_started_after_fork(make_finder, started_in_parent):
+    scheduler = BatchScheduler(finder=make_finder())
+    if started_in_parent:
+        scheduler.match(city="Moskow", speller=None, timeout=5)
+    # поток родительского процесса в дочернем процессе не существует
+    result = run_in_child(lambda: scheduler.match(city="Kazan city", speller=None, timeout=5)["name"].tolist())
+    assert result == ["Kazan"]
+
+
+def test_timeout_cancels_request(make_finder, monkeypatch):
+    finder = make_finder()
+    release = threading.Event()
+    search_cities = finder.search_cities
+    monkeypatch.setattr(finder, "search_cities", lambda **params: release.wait(5) and search_cities(**params))
+    scheduler = BatchScheduler(finder=finder)
+    with pytest.raises(TimeoutError):
+        scheduler.match(city="Moskow", speller=None, timeout=0.1)
+    release.set()
+    assert scheduler.match(city="Moskow", speller=None, timeout=5)["name"].iloc[0] == "Moscow"
+
+
+def test_match_many_returns_copies_in_order(make_finder):
+    finder = make_finder()
+    scheduler = BatchScheduler(finder=finder)
+    names = ["Moskow", "Sovetsk", "Moskow", "Kazan city"]
+    results = scheduler.match_many(cities=names, top_k=2, speller=None, output_dict_json=True, timeout=5)
+    assert results == finder.get_cities(cities=names, top_k=2, speller=None, output_dict_json=True)
+    assert results[0] == results[2] and results[0][0] is not results[2][0]
+    scheduler.close()
+
+
+def test_match_many_timeout_cancels_all(make_finder, monkeypatch):
+    finder = make_finder()
+    release = threading.Event()
+    search_cities = finder.search_cities
+    monkeypatch.setattr(finder, "search_cities", lambda **params: release.wait(5) and search_cities(**params))
+    scheduler = BatchScheduler(finder=finder)
+    with pytest.raises(TimeoutError):
+        scheduler.match_many(cities=["Moskow", "Kazan city"], speller=None, timeout=0.1)
+    release.set()
+    assert scheduler.match(city="Sochy", speller=None, timeout=5)["name"].iloc[0] == "Sochi"
+
+
+def test_spelling_runs_outside_batch_thread(make_finder, monkeypatch):
+    finder = make_finder()
+    threads = set()
+
+    def slow_correct_city(city=None, **params):
+        threads.add(threading.current_thread().name)
+        time.sleep(0.3)
+        return city
+
+    monkeypatch.setattr(finder, "correct_city", slow_correct_city)
+    scheduler = BatchScheduler(finder=finder)
+    results = {}
+    callers = [threading.Thread(target=lambda city=city: results.update({city: scheduler.match(
+        city=city, speller="yandex", timeout=5)})) for city in ["Moskow", "Kazan city", "Sochy", "Yerevann"]]
+    start = time.perf_counter()
+    for caller in callers:
+        caller.start()
+    for caller in callers:
+        caller.join()
+    # четыре медленные проверки выполняются одновременно, а не одна за другой в потоке пакетов
+    assert time.perf_counter() - start < 0.9
+    assert len(results) == 4 and "batch-scheduler" not in threads
@@ -0,0 +1,99 @@
+import os
+import runpy
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import config
+from conftest import ENCODER_PARAMS
+from encoders import HashingEncoder
+from finder import FindCity
+from shared_store import SHM_ENV, attach_shared, publish_shared, unlink_shared
+from snapshot import export_snapshot
+
+GUNICORN_CONF = os.path.join(os.path.dirname(config.__file__), "gunicorn.conf.py")
+
+
+def private_memory():
+    # USS: страницы, которые есть только у этого процесса
+    fields = {}
+    with open("/proc/self/smaps_rollup") as stream:
+        for line in stream:
+            parts = line.split()
+            if len(parts) >= 2 and parts[1].isdigit():
+                fields[parts[0].rstrip(":")] = int(parts[1]) * 1024
+    return fields["Private_Clean"] + fields["Private_Dirty"]
+
+
+def fork_workers(finder, modes):
+    # рабочие процессы измеряют память, когда все они запущены и выполнили поиск
+    go_read, go_write = os.pipe()
+    workers = []
+    for mode in modes:
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            os.close(go_write)
+            if mode == "search":
+                finder.get_cities(cities=["city5", "cty77", "Moskow"], top_k=3, speller=None)
+            else:
+                # рабочий процесс со своей копией матрицы, как при загрузке данных в каждом процессе
+                finder.cities_emb = np.array(finder.cities_emb)
+            os.write(write_fd, b"r")
+            os.read(go_read, 1)
+            os.write(write_fd, str(private_memory()).encode())
+            os._exit(0)
+        os.close(write_fd)
+        workers.append((pid, read_fd))
+    for _, read_fd in workers:
+        os.read(read_fd, 1)
+    os.write(go_write, b"g" * len(workers))
+    result = []
+    for pid, read_fd in workers:
+        result.append(int(os.read(read_fd, 64)))
+        os.close(read_fd)
+        os.waitpid(pid, 0)
+    return result
+
+
+@pytest.mark.skipif(not os.path.exists("/proc/self/smaps_rollup"), reason="нужен /proc/self/smaps_rollup")
+def test_forked_workers_share_embeddings():
+    names = [f"city{i}" for i in range(20000)]
+    metadata = pd.DataFrame({"geoname_id": np.arange(len(names)), "name": names, "alternatenames": "",
+                             "country": "Russia"})
+    embeddings = HashingEncoder(n_features=1024).encode(texts=names)
+    handle = publish_shared(metadata=metadata, embeddings=embeddings, prefix="geonames_test")
+    try:
+        finder = FindCity.from_shared(handle=handle, cols_output=["geoname_id", "name"], encoder="hashing",
+                                      encoder_params={"n_features": 1024})
+        usage = fork_workers(finder, ["search", "search", "search", "copy"])
+    finally:
+        unlink_shared(handle)
+    # рабочие процессы используют матрицу из общей памяти, своя копия - около embeddings.nbytes
+    assert max(usage[:3]) < 0.25 * embeddings.nbytes
+    assert usage[3] > 0.8 * embeddings.nbytes
+
+
+def test_gunicorn_config_publishes_before_app_import(cities, tmp_path, monkeypatch):
+    export_snapshot(dataset=cities, snapshot_dir=str(tmp_path), model_id=None, encoder="hashing",
+                    encoder_params=ENCODER_PARAMS)
+    monkeypatch.setattr(config, "SNAPSHOT_DIR", str(tmp_path))
+    monkeypatch.delenv(SHM_ENV, raising=False)
+    settings = runpy.run_path(GUNICORN_CONF)
+    try:
+        # main.py, загруженный preload_app после конфигурации, видит описание сегментов
+        assert settings["preload_app"] and SHM_ENV in os.environ
+        metadata, embeddings, segments = attach_shared()
+        assert len(metadata) == len(cities)
+        assert embeddings.shape[0] == cities["name"].nunique()
+        del metadata, embeddings
+        for segment in segments:
+            segment.close()
+        # повторное чтение конфигурации не создает новые сегменты
+        handle = os.environ[SHM_ENV]
+        runpy.run_path(GUNICORN_CONF)
+        assert os.environ[SHM_ENV] == handle
+    finally:
+        unlink_shared()
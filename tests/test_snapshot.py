@@ -0,0 +1,60 @@
+import json
+import os
+
+import pytest
+
+from conftest import COLS_OUTPUT, ENCODER_PARAMS
+from finder import FindCity
+from snapshot import MANIFEST_FILE, export_snapshot, resolve_snapshot
+
+
+@pytest.fixture
+def snapshot_dir(cities, tmp_path):
+    export_snapshot(dataset=cities, snapshot_dir=str(tmp_path), model_id="sentence-transformers/LaBSE",
+                    encoder="hashing", encoder_params=ENCODER_PARAMS)
+    return str(tmp_path)
+
+
+def test_manifest_records_encoder(snapshot_dir):
+    with open(os.path.join(resolve_snapshot(snapshot_dir), MANIFEST_FILE)) as fp:
+        manifest = json.load(fp)
+    assert manifest["encoder"] == "hashing"
+    assert manifest["encoder_params"] == ENCODER_PARAMS
+    assert manifest["encoder_name"] == "hashing-char-2-3-256-translit"
+    assert manifest["dim"] == ENCODER_PARAMS["n_features"]
+
+
+def test_snapshot_loads_with_same_encoder(snapshot_dir):
+    finder = FindCity.from_snapshot(path=snapshot_dir, cols_output=COLS_OUTPUT, encoder="hashing",
+                                    encoder_params=ENCODER_PARAMS)
+    assert finder.get_city(city="Kazan city", speller=None)["name"].iloc[0] == "Kazan"
+
+
+@pytest.mark.parametrize("params", [
+    {"encoder": "hashing", "encoder_params": {"n_features": 256, "transliterate": False}},
+    {"encoder": "hashing", "encoder_params": {"n_features": 128}},
+    # кодировщик sentence-transformers с моделью из снимка не загружается: векторы созданы другим кодировщиком
+    {"encoder": "sentence_transformers"},
+])
+def test_snapshot_refuses_other_encoder(snapshot_dir, params):
+    with pytest.raises(ValueError, match="кодировщик"):
+        FindCity.from_snapshot(path=snapshot_dir, cols_output=COLS_OUTPUT, **params)
+
+
+def test_legacy_manifest_is_checked_by_model(snapshot_dir):
+    manifest_file = os.path.join(resolve_snapshot(snapshot_dir), MANIFEST_FILE)
+    with open(manifest_file) as fp:
+        manifest = json.load(fp)
+    for key in ("encoder", "encoder_name", "encoder_params"):
+        del manifest[key]
+    with open(manifest_file, "w") as fp:
+        json.dump(manifest, fp)
+    with pytest.raises(ValueError, match="LaBSE"):
+        FindCity.from_snapshot(path=snapshot_dir, model_id="intfloat/multilingual-e5-large",
+                               cols_output=COLS_OUTPUT)
+
+
+def test_finder_refuses_encoder_of_other_dimension(cities):
+    with pytest.raises(ValueError, match="Размерность"):
+        FindCity(dataset=cities, emb_col="embeddings", cols_output=COLS_OUTPUT, encoder="hashing",
+                 encoder_params={"n_features": 128})
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+import spatial_index
+from spatial_index import EARTH_RADIUS_KM, SpatialIndex
+
+
+def haversine(lat, lon, lats, lons):
+    lat, lon, lats, lons = map(np.radians, (lat, lon, lats, lons))
+    a = np.sin((lats - lat) / 2) ** 2 + np.cos(lat) * np.cos(lats) * np.sin((lons - lon) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+@pytest.fixture(params=["kdtree", "brute"])
+def make_index(request, monkeypatch):
+    if request.param == "brute":
+        monkeypatch.setattr(spatial_index, "cKDTree", None)
+    return SpatialIndex
+
+
+@pytest.fixture
+def points():
+    rng = np.random.default_rng(0)
+    lat = rng.uniform(-80, 80, 3000)
+    lon = rng.uniform(-180, 180, 3000)
+    # строки без координат в индекс не попадают
+    lat[::100] = np.nan
+    return lat, lon
+
+
+def test_nearest_matches_haversine(make_index, points):
+    lat, lon = points
+    index = make_index(latitude=lat, longitude=lon)
+    queries = [(55.75, 37.62), (-33.9, 151.2), (0.0, 179.9)]
+    distances, rows = index.nearest(latitude=[q[0] for q in queries], longitude=[q[1] for q in queries], k=5)
+    for (q_lat, q_lon), q_distances, q_rows in zip(queries, distances, rows):
+        expected = haversine(q_lat, q_lon, lat, lon)
+        expected[np.isnan(expected)] = np.inf
+        assert set(q_rows) == set(np.argsort(expected)[:5])
+        np.testing.assert_allclose(q_distances, np.sort(expected)[:5], rtol=1e-6)
+
+
+def test_nearest_with_mask(make_index, points):
+    lat, lon = points
+    mask = np.zeros(len(lat), dtype=bool)
+    mask[1::50] = True
+    _, rows = make_index(latitude=lat, longitude=lon).nearest(latitude=10, longitude=10, k=3, mask=mask)
+    assert mask[rows].all() and rows.shape == (1, 3)
+
+
+def test_within_radius(make_index, points):
+    lat, lon = points
+    distances, rows = make_index(latitude=lat, longitude=lon).within(latitude=45, longitude=10, radius_km=1500)[0]
+    expected = haversine(45, 10, lat, lon)
+    assert set(rows) == set(np.flatnonzero(expected <= 1500))
+    assert np.all(np.diff(distances) >= 0)
+
+
+def test_finder_reverse_geocode(make_finder):
+    result = make_finder().reverse_geocode(latitude=55.7, longitude=37.6, top_k=2, countries="RU")
+    assert result["geoname_id"].tolist() == [0, 1]
+    assert result["distance_km"].iloc[0] < 10
@@ -0,0 +1,41 @@
+import pandas as pd
+import pytest
+
+from speller import LocalSpeller
+
+DATASET = pd.DataFrame({
+    "name": ["Moscow", "Saint Petersburg", "Monchegorsk", "Sovetsk", "Sovetskiy", "Sochi"],
+    "asciiname": ["Moscow", "Saint Petersburg", "Monchegorsk", "Sovetsk", "Sovetskiy", "Sochi"],
+    "alternatenames": ["Москва, Moskva", "Санкт-Петербург, Piter", "Мончегорск", "Советск", "Советский", "Сочи"],
+    "population": [12000000, 5000000, 40000, 40000, 25000, 400000],
+})
+
+
+@pytest.fixture(scope="module")
+def speller():
+    return LocalSpeller(dataset=DATASET)
+
+
+@pytest.mark.parametrize("city, expected", [
+    ("Moskwa", "Moscow"),
+    ("масква", "Moscow"),
+    ("Моченгорск", "Monchegorsk"),
+    ("Sochy", "Sochi"),
+    ("Saint Petrsburg", "Saint Petersburg"),
+])
+def test_corrects_typos_and_transliteration(speller, city, expected):
+    assert speller.correct(city=city) == expected
+
+
+def test_exact_word_has_zero_distance(speller):
+    assert speller.lookup(word="советск") == ("Sovetsk", 0)
+
+
+def test_larger_city_wins_on_equal_distance(speller):
+    # "Sovetsky" на расстоянии 1 от "sovetskiy" и 1 от "sovetsk", выбирается более крупный город
+    assert speller.lookup(word="Sovetsky") == ("Sovetsk", 1)
+
+
+def test_unknown_word_is_returned_unchanged(speller):
+    assert speller.lookup(word="Qwertyuiop") is None
+    assert speller.correct(city="Qwertyuiop") == "Qwertyuiop"
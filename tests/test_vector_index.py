@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+from vector_index import FlatIndex, NameGroups, QuantizedIndex, make_index, normalize_rows
+
+
+def random_matrix(rows, dim, seed=0):
+    return normalize_rows(np.random.default_rng(seed).standard_normal((rows, dim)))
+
+
+def near_queries(embeddings, count, noise=0.3, seed=1):
+    rng = np.random.default_rng(seed)
+    return normalize_rows(embeddings[:count] + noise * rng.standard_normal((count, embeddings.shape[1])) / 8)
+
+
+def test_quantized_without_float32_matrix_is_approximate():
+    embeddings = random_matrix(2000, 64)
+    queries = near_queries(embeddings, 50)
+    index = QuantizedIndex(embeddings=embeddings, dtype="int8")
+    scores, indices = index.search(vectors=queries, top_k=5)
+    _, flat_indices = FlatIndex(embeddings=embeddings).search(vectors=queries, top_k=1)
+    assert index.exact is None
+    assert scores.max() <= 1.0
+    assert np.mean(indices[:, 0] == flat_indices[:, 0]) >= 0.95
+
+
+def test_quantized_rescoring_reads_float32_rows_from_disk(tmp_path):
+    embeddings = random_matrix(2000, 64)
+    queries = near_queries(embeddings, 50)
+    path = str(tmp_path / "exact.npy")
+    index = make_index(kind="quantized", embeddings=embeddings, path=path, dtype="int8")
+    scores, indices = index.search(vectors=queries, top_k=5)
+    flat_scores, flat_indices = FlatIndex(embeddings=embeddings).search(vectors=queries, top_k=5)
+    # матрица float32 не хранится в памяти процесса, а отображается из файла
+    assert isinstance(index.exact, np.memmap)
+    assert index.exact.filename.endswith("exact.npy")
+    np.testing.assert_array_equal(indices, flat_indices)
+    np.testing.assert_allclose(scores, flat_scores, atol=1e-6)
+
+
+def test_quantized_mask_limits_candidates():
+    embeddings = random_matrix(500, 32)
+    mask = np.zeros(len(embeddings), dtype=bool)
+    mask[::7] = True
+    _, indices = QuantizedIndex(embeddings=embeddings, dtype="float16").search(vectors=embeddings[:10], top_k=3,
+                                                                              mask=mask)
+    assert mask[indices].all()
+
+
+def test_ivf_index_is_rebuilt_only_for_same_matrix(tmp_path):
+    embeddings = random_matrix(1000, 32)
+    path = str(tmp_path / "ivf.npz")
+    built = make_index(kind="ivf", embeddings=embeddings, path=path, n_lists=16)
+    loaded = make_index(kind="ivf", embeddings=embeddings, path=path)
+    np.testing.assert_array_equal(loaded.order, built.order)
+    # та же длина, но другие векторы или другая размерность
+    with pytest.raises(ValueError, match="другой матрицы"):
+        make_index(kind="ivf", embeddings=random_matrix(1000, 32, seed=5), path=path)
+    with pytest.raises(ValueError, match="размерности"):
+        make_index(kind="ivf", embeddings=random_matrix(1000, 16), path=path)
+
+
+def test_name_groups_mark_missing_cities():
+    groups = NameGroups(names=["a", "b", "b"])
+    # индекс нашел одно название из двух запрошенных, второе -1
+    scores, rows = groups.expand(scores=np.array([[0.9, -np.inf]]), indices=np.array([[0, -1]]), top_k=3)
+    assert rows.tolist() == [[0, -1, -1]]